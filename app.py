@@ -2,10 +2,10 @@ import os
 import logging
 from datetime import datetime
 
-from flask import Flask, flash, redirect, url_for
+from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy.orm import DeclarativeBase
-from flask_login import LoginManager, current_user
+from flask_login import LoginManager
 
 # Set up logging
 logging.basicConfig(level=logging.DEBUG)
@@ -20,8 +20,8 @@ db = SQLAlchemy(model_class=Base)
 app = Flask(__name__)
 app.secret_key = os.environ.get("SESSION_SECRET", "dev_secret_key")
 
-# Configure SQLite database
-app.config["SQLALCHEMY_DATABASE_URI"] = "mysql://root:@localhost/disaster_risk_db"
+# Configure the database (DATABASE_URL overrides the local MySQL default; the tests use sqlite://)
+app.config["SQLALCHEMY_DATABASE_URI"] = os.environ.get("DATABASE_URL", "mysql://root:@localhost/disaster_risk_db")
 app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
     "pool_recycle": 300,
     "pool_pre_ping": True,
@@ -31,6 +31,10 @@ app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
 # Initialize database with app
 db.init_app(app)
 
+# Dashboard statistics cache (STATS_CACHE_BACKEND: 'sqlite' shared by workers, or 'lru')
+from services.cache import stats_cache
+stats_cache.init_app(app)
+
 # Configure Flask-Login
 login_manager = LoginManager()
 login_manager.init_app(app)
@@ -43,51 +47,18 @@ with app.app_context():
     # Import models here to avoid circular imports
     from models import User, EvacuationCenter, Evacuee, Family, Donation, InventoryItem
     
-    # Create all tables
-    db.create_all()
-    
-    # Function to load user for Flask-Login
-    @login_manager.user_loader
-    def load_user(user_id):
-        return User.query.get(int(user_id))
+    # Create missing tables; existing databases are upgraded with "flask upgrade-schema"
+    from migrations import init_schema
+    init_schema()
+
+    # Full-text search index (built from existing rows the first time)
+    from services.search import init_search_index
+    init_search_index()
     
-    # Access control middleware
-    @app.before_request
-    def check_user_role():
-        from flask import request
-        
-        # Skip authentication for auth routes and static files
-        if (request.endpoint and 
-            (request.endpoint.startswith('auth.') or 
-             request.endpoint.startswith('static') or 
-             request.endpoint == 'common.index')):
-            return None
-        
-        # Check if user is authenticated
-        if current_user.is_authenticated:
-            # Admin can access all routes
-            if current_user.role == 'admin':
-                return None
-                
-            # Volunteer can access volunteer routes and some common routes
-            if current_user.role == 'volunteer':
-                if (request.endpoint and 
-                    (request.endpoint.startswith('volunteer.') or 
-                     request.endpoint.startswith('common.'))):
-                    return None
-                else:
-                    flash('You do not have permission to access this page', 'danger')
-                    return redirect(url_for('volunteer.dashboard'))
-                    
-            # Donor can access donor routes and some common routes
-            if current_user.role == 'donor':
-                if (request.endpoint and 
-                    (request.endpoint.startswith('donor.') or 
-                     request.endpoint.startswith('common.'))):
-                    return None
-                else:
-                    flash('You do not have permission to access this page', 'danger')
-                    return redirect(url_for('donor.dashboard'))
+    # Function to load user for Flask-Login (cached snapshots; see services/users.py)
+    from services.users import load_user, DEFAULT_TTL as USER_CACHE_TTL
+    app.config.setdefault('USER_CACHE_TTL', int(os.environ.get('USER_CACHE_TTL', USER_CACHE_TTL)))
+    login_manager.user_loader(load_user)
     
     # Register blueprints
     from routes.auth import auth_bp
@@ -95,12 +66,37 @@ with app.app_context():
     from routes.volunteer import volunteer_bp
     from routes.donor import donor_bp
     from routes.common import common_bp
+    from routes.lookup import lookup_bp
     
     app.register_blueprint(auth_bp)
     app.register_blueprint(admin_bp)
     app.register_blueprint(volunteer_bp)
     app.register_blueprint(donor_bp)
     app.register_blueprint(common_bp)
+    app.register_blueprint(lookup_bp)
+    
+    # Per-request SQL/render timings, slow-query log and /admin/perf (see services/perf.py)
+    from services import perf
+    perf.init_app(app)
+    
+    # Repeated lazy loads (N+1 queries): logged in debug mode, errors when testing
+    from services import nplusone
+    nplusone.init_app(app)
+    
+    # List views declare their relationship loading; undeclared loads raise in development (see loading.py)
+    import loading
+    loading.init_app(app)
+    
+    # Access control: one policy lookup per request (see permissions.py)
+    import permissions
+    permissions.init_app(app)
+    
+    # Register CLI commands
+    import commands
+    
+    # Background expiry sweep, when EXPIRY_SWEEP_INTERVAL (seconds) is set
+    from services import expiry
+    expiry.init_app(app)
     
     # Create admin user if it doesn't exist (for testing purposes)
     admin = User.query.filter_by(username='admin').first()
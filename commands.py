@@ -0,0 +1,228 @@
+import time
+
+import click
+
+from app import app, db
+from migrations import migration_status, upgrade_schema
+from models import EvacuationCenter
+from permissions import PUBLIC, missing_policies
+from services.allocation import AllocationError, benchmark_allocation
+from services.benchmark import DEFAULT_SCALES, benchmark_pages
+from services.dedup import scan_duplicates
+from services.expiry import sweep_expired
+from services.importer import EvacueeImporter, ImportFileError
+from services.ledger import open_balances
+from services.nplusone import check_n_plus_one
+from services.placement import place_evacuees
+from services.query_plans import check_query_plans
+from services import route_benchmark
+from services.search import rebuild_search_index
+from services.seed import DEFAULT_COUNTS, SEED_PASSWORD, Seeder, SeedError, reset_data
+
+@app.cli.command('recount-occupancy')
+def recount_occupancy():
+    """Recompute evacuation center occupancy counters from the evacuee table."""
+    changed = EvacuationCenter.recompute_occupancy()
+    click.echo(f'Occupancy counters rebuilt ({changed} value(s) corrected).')
+
+@app.cli.command('rebuild-search-index')
+def rebuild_search():
+    """Rebuild the full-text search index from the searchable tables."""
+    written = rebuild_search_index()
+    click.echo(f'Search index rebuilt ({written} document(s)).')
+
+@app.cli.command('rebuild-stock-levels')
+def rebuild_stock_levels():
+    """Enter unrecorded available inventory in the ledger and recompute every stock level."""
+    opened = open_balances()
+    db.session.commit()
+    click.echo(f'Stock levels rebuilt ({opened} opening ledger entr{"y" if opened == 1 else "ies"} added).')
+
+@app.cli.command('place-evacuees')
+@click.option('--family', 'family_ids', type=int, multiple=True, help='Only place this family (repeatable).')
+@click.option('--dry-run', is_flag=True, help='Show the placement without assigning anyone.')
+def place_evacuees_command(family_ids, dry_run):
+    """Assign present evacuees without a center to active centers, keeping families together."""
+    started = time.perf_counter()
+    report = place_evacuees(family_ids=family_ids or None, dry_run=dry_run)
+    click.echo(f'{"Would place" if dry_run else "Placed"} {report.evacuees} evacuee(s) in {len(report.placed)} '
+               f'group(s) across {report.centers} center(s) in {time.perf_counter() - started:.2f}s.')
+    if report.unplaced:
+        click.echo(f'{len(report.unplaced)} group(s) fit in no active center.', err=True)
+
+@app.cli.command('find-duplicates')
+@click.option('--workers', type=click.IntRange(min=1), default=None,
+              help='Worker processes comparing records (default: one per CPU).')
+def find_duplicates_command(workers):
+    """Queue likely duplicate evacuee registrations for review."""
+    started = time.perf_counter()
+    found, queued, skipped = scan_duplicates(workers)
+    click.echo(f'Found {found} likely duplicate pair(s), {queued} newly queued for review, '
+               f'in {time.perf_counter() - started:.2f}s.')
+    if skipped:
+        click.echo(f'{skipped} block(s) of very common names were too large to compare.', err=True)
+
+@app.cli.command('sweep-expired')
+def sweep_expired_command():
+    """Mark food inventory past its expiry date as expired and rebuild the expiring-soon watchlist."""
+    swept = sweep_expired()
+    click.echo(f'Marked {swept} inventory item(s) expired.')
+
+@app.cli.command('import-evacuees')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+def import_evacuees(path):
+    """Import evacuees and families from a CSV or XLSX file."""
+    with open(path, 'rb') as stream:
+        try:
+            report = EvacueeImporter().run(stream, path)
+        except ImportFileError as error:
+            if error.report is None:
+                raise click.ClickException(str(error))
+            report = error.report
+    for line, messages in report.errors:
+        click.echo(f'Row {line}: ' + '; '.join(messages), err=True)
+    click.echo(f'Imported {report.imported} of {report.rows} evacuee(s); '
+               f'new families: {report.families_created}, rejected rows: {len(report.errors)}, '
+               f'possible duplicates: {report.possible_duplicates}.')
+    if report.file_error:
+        raise click.ClickException(f'Stopped after row {report.rows}: {report.file_error}')
+
+def _parse_counts(ctx, param, values):
+    counts = {}
+    for value in values:
+        name, _, number = value.partition('=')
+        if name not in DEFAULT_COUNTS or not number.isdigit():
+            raise click.BadParameter(f'expected NAME=NUMBER with NAME one of {", ".join(DEFAULT_COUNTS)}')
+        counts[name] = int(number)
+    return counts
+
+@app.cli.command('seed')
+@click.option('--seed', 'seed_value', type=int, default=1, show_default=True,
+              help='Random seed; the same seed always generates the same data.')
+@click.option('--scale', type=float, default=1.0, show_default=True,
+              help='Multiply every count, e.g. 0.01 for a quick run.')
+@click.option('--count', 'counts', multiple=True, callback=_parse_counts, metavar='NAME=NUMBER',
+              help=f'Override one count ({", ".join(f"{name}={count}" for name, count in DEFAULT_COUNTS.items())}).')
+@click.option('--reset', is_flag=True, help='Delete all centers, evacuees, donations, inventory and non-admin accounts first.')
+def seed_command(seed_value, scale, counts, reset):
+    """Fill the database with a reproducible synthetic data set."""
+    if reset:
+        reset_data()
+    started = time.perf_counter()
+    try:
+        written = Seeder(seed_value, counts, scale).run()
+    except SeedError as error:
+        raise click.ClickException(str(error))
+    for table, count in written.items():
+        click.echo(f'{table:<20}{count:>10}')
+    click.echo(f'Seeded in {time.perf_counter() - started:.1f}s; every account\'s password is "{SEED_PASSWORD}".')
+
+@app.cli.command('benchmark-pages')
+@click.option('--rows', 'scales', type=int, multiple=True, default=DEFAULT_SCALES, show_default=True,
+              help='Evacuee count to measure at; repeat for several scales.')
+@click.option('--repeat', type=int, default=5, show_default=True, help='Requests per page (the median is shown).')
+def benchmark_pages_command(scales, repeat):
+    """Measure list page size and render time with synthetic evacuees loaded."""
+    click.echo(f'{"rows":>7}  {"role":<10}{"url":<40}{"status":>6}{"bytes":>10}{"ms":>9}')
+    for result in benchmark_pages(scales, repeat):
+        click.echo(f'{result["rows"]:>7}  {result["role"]:<10}{result["url"]:<40}'
+                   f'{result["status"]:>6}{result["bytes"]:>10}{result["ms"]:>9.1f}')
+
+@app.cli.command('benchmark-allocation')
+@click.option('--centers', type=int, default=1000, show_default=True, help='Number of synthetic centers.')
+@click.option('--items', type=int, default=500, show_default=True, help='Number of synthetic item lines.')
+@click.option('--repeat', type=int, default=5, show_default=True, help='Planning runs to time.')
+@click.option('--budget', type=float, default=1.0, show_default=True, help='Fail if the slowest run takes longer (seconds).')
+def benchmark_allocation_command(centers, items, repeat, budget):
+    """Time the stock allocation planner on synthetic data (no database access)."""
+    try:
+        timings, proposals = benchmark_allocation(centers, items, repeat)
+    except AllocationError as error:
+        raise click.ClickException(str(error))
+    click.echo(f'{centers} centers x {items} items: {proposals} transfer(s) proposed; '
+               f'fastest {min(timings) * 1000:.0f} ms, slowest {max(timings) * 1000:.0f} ms.')
+    if max(timings) > budget:
+        raise click.ClickException(f'Slowest run exceeded the {budget:.2f}s budget.')
+
+@app.cli.command('benchmark-routes')
+@click.option('--rows', 'scales', type=int, multiple=True, default=route_benchmark.DEFAULT_SCALES, show_default=True,
+              help='Evacuee count to seed and measure at; repeat for several scales.')
+@click.option('--repeat', type=int, default=10, show_default=True, help='Requests per page for the latency figures.')
+@click.option('--no-seed', is_flag=True, help='Measure the data already in the database instead of seeding.')
+@click.option('--output', type=click.Path(dir_okay=False), default='benchmark-routes.json', show_default=True,
+              help='JSON file the results are written to.')
+@click.option('--baseline', type=click.Path(exists=True, dir_okay=False),
+              help='Results of an earlier run to compare with; regressions fail the command.')
+@click.option('--threshold', type=float, default=route_benchmark.DEFAULT_THRESHOLD, show_default=True,
+              help='Allowed growth of p95 latency and response size, as a fraction.')
+def benchmark_routes_command(scales, repeat, no_seed, output, baseline, threshold):
+    """Seed the database at each scale and measure every page (replaces the data: scratch databases only)."""
+    if not no_seed:
+        click.confirm('This deletes all centers, evacuees, donations, inventory and non-admin accounts. Continue?',
+                      abort=True)
+    click.echo(f'{"rows":>7}  {"role":<10}{"endpoint":<40}{"p50":>8}{"p95":>8}{"sql":>5}{"peak kB":>9}{"bytes":>9}')
+    results = []
+    for result in route_benchmark.benchmark_routes(scales, repeat, seed=not no_seed):
+        results.append(result)
+        click.echo(f'{result["rows"]:>7}  {result["role"]:<10}{result["endpoint"]:<40}{result["p50_ms"]:>8.1f}'
+                   f'{result["p95_ms"]:>8.1f}{result["queries"]:>5}{result["peak_kb"]:>9.0f}{result["bytes"]:>9}')
+    route_benchmark.save_results(output, results)
+    click.echo(f'Results written to {output}.')
+    if baseline:
+        found = route_benchmark.regressions(results, route_benchmark.load_results(baseline), threshold)
+        for result, before, reasons in found:
+            click.echo(f'{result["rows"]:>7}  {result["role"]:<10}{result["endpoint"]}: ' + ', '.join(reasons), err=True)
+        if found:
+            raise click.ClickException(f'{len(found)} page(s) regressed against {baseline}.')
+        click.echo(f'No regressions against {baseline}.')
+
+@app.cli.command('upgrade-schema')
+def upgrade_schema_command():
+    """Apply pending schema migrations (safe to run while the app is serving)."""
+    applied = upgrade_schema()
+    for version, name in applied:
+        click.echo(f'Applied migration {version}: {name}')
+    click.echo(f'Schema is up to date ({len(applied)} migration(s) applied).')
+
+@app.cli.command('schema-status')
+def schema_status():
+    """List schema migrations and whether each has been applied."""
+    for version, name, applied in migration_status():
+        click.echo(f'{version:>4}  {"applied" if applied else "PENDING":<8} {name}')
+
+@app.cli.command('check-query-plans')
+def check_query_plans_command():
+    """EXPLAIN the queries of every page and fail on full scans of large tables."""
+    checked, problems = check_query_plans()
+    for endpoint, url, tables, statement, plan in problems:
+        click.echo(f'{endpoint} ({url}): full scan of {", ".join(tables)}', err=True)
+        click.echo('    ' + ' '.join(statement.split()), err=True)
+        for line in plan:
+            click.echo(f'      {line}', err=True)
+    if problems:
+        raise click.ClickException(f'{len(problems)} statement(s) scan a large table ({checked} page(s) checked).')
+    click.echo(f'No full scans of large tables ({checked} page(s) checked).')
+
+@app.cli.command('check-n-plus-one')
+def check_n_plus_one_command():
+    """Request every page and fail on relationships lazy-loaded once per row."""
+    checked, found = check_n_plus_one()
+    for endpoint, url, message in found:
+        click.echo(message, err=True)
+    if found:
+        raise click.ClickException(f'{len(found)} page(s) with N+1 lazy loads ({checked} page(s) checked).')
+    click.echo(f'No N+1 lazy loads ({checked} page(s) checked).')
+
+@app.cli.command('check-permissions')
+def check_permissions_command():
+    """List the access policy of every endpoint and fail if an endpoint has none."""
+    policies = app.extensions['permissions']
+    for endpoint in sorted(policies):
+        policy = policies[endpoint]
+        click.echo(f'{endpoint:<45} {"public" if policy is PUBLIC else ", ".join(sorted(policy))}')
+    missing = missing_policies(app)
+    for endpoint in missing:
+        click.echo(f'{endpoint:<45} NO POLICY', err=True)
+    if missing:
+        raise click.ClickException(f'{len(missing)} endpoint(s) have no access policy.')
+    click.echo(f'Every endpoint has an access policy ({len(policies)} endpoint(s)).')
@@ -1,7 +1,62 @@
 from flask_wtf import FlaskForm
+from flask_wtf.file import FileField, FileAllowed, FileRequired
 from wtforms import StringField, PasswordField, SelectField, TextAreaField, IntegerField, DateField, SubmitField, BooleanField, HiddenField
 from wtforms.validators import DataRequired, Email, EqualTo, Length, Optional, ValidationError
 from datetime import date
+from operator import attrgetter
+
+from flask import get_template_attribute, url_for
+from sqlalchemy import or_
+
+from models import EvacuationCenter, Evacuee, Family
+
+def _coerce_id(value):
+    # '' and None (no selection) become 0, the "None" option used throughout the forms
+    return int(value) if value not in (None, '') else 0
+
+class RecordSelectField(SelectField):
+    """Select whose options come from a typeahead endpoint instead of a preloaded choices list.
+
+    Only the blank option and the current record are rendered; the submitted id is
+    checked against ``query_factory()`` (every row of ``model`` by default).
+    """
+
+    def __init__(self, label=None, validators=None, model=None, endpoint=None, get_label=str,
+                 query_factory=None, blank_text=None, **kwargs):
+        super().__init__(label, validators, coerce=_coerce_id, choices=[], validate_choice=False, **kwargs)
+        self.model = model
+        self.endpoint = endpoint
+        self.get_label = get_label
+        self.query_factory = query_factory or (lambda: model.query)
+        self.blank_text = blank_text
+        # Ids already known to be valid (bulk import resolves them up front); skips the query
+        self.known_ids = None
+
+    def _record(self, record_id):
+        return self.query_factory().filter(self.model.id == record_id).first()
+
+    def pre_validate(self, form):
+        if not self.data:
+            return
+        if self.known_ids is not None:
+            found = self.data in self.known_ids
+        else:
+            found = self._record(self.data) is not None
+        if not found:
+            raise ValidationError(self.gettext('Not a valid choice.'))
+
+    def __call__(self, **kwargs):
+        record = self._record(self.data) if self.data else None
+        record_select = get_template_attribute('macros/autocomplete.html', 'record_select')
+        return record_select(
+            self.name, kwargs.get('id', self.id), url_for(self.endpoint),
+            selected=record.id if record else None,
+            label=self.get_label(record) if record else '',
+            blank=self.blank_text,
+            required=self.flags.required,
+            **{'class': kwargs.get('class', 'form-select')}
+        )
+
 
 class LoginForm(FlaskForm):
     username = StringField('Username', validators=[DataRequired()])
@@ -25,10 +80,18 @@ class EvacuationCenterForm(FlaskForm):
     address = StringField('Address', validators=[DataRequired()])
     capacity = IntegerField('Capacity', validators=[DataRequired()])
     status = SelectField('Status', choices=[('active', 'Active'), ('closed', 'Closed')], default='active')
+    accepts_special_needs = BooleanField('Accepts evacuees with special needs', default=True)
     contact_person = StringField('Contact Person', validators=[Optional()])
     contact_number = StringField('Contact Number', validators=[Optional()])
     submit = SubmitField('Save Center')
 
+def _open_centers(current_id=None):
+    # Active centers, plus the one an edited record is already in even if it has since closed
+    condition = EvacuationCenter.status == 'active'
+    if current_id:
+        condition = or_(condition, EvacuationCenter.id == current_id)
+    return EvacuationCenter.query.filter(condition)
+
 class EvacueeForm(FlaskForm):
     first_name = StringField('First Name', validators=[DataRequired()])
     last_name = StringField('Last Name', validators=[DataRequired()])
@@ -41,9 +104,19 @@ class EvacueeForm(FlaskForm):
         ('deceased', 'Deceased')
     ], default='present')
     special_needs = TextAreaField('Special Needs', validators=[Optional()])
-    family_id = SelectField('Family', coerce=int, validators=[Optional()])
-    evacuation_center_id = SelectField('Evacuation Center', coerce=int, validators=[DataRequired()])
+    family_id = RecordSelectField('Family', validators=[Optional()], model=Family, endpoint='lookup.families',
+                                  get_label=attrgetter('family_name'), blank_text='None')
+    evacuation_center_id = RecordSelectField('Evacuation Center', validators=[DataRequired()], model=EvacuationCenter,
+                                             endpoint='lookup.active_centers', get_label=attrgetter('name'),
+                                             query_factory=_open_centers)
     submit = SubmitField('Save Evacuee')
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Editing: keep the evacuee's current center valid after it is closed
+        current_id = getattr(kwargs.get('obj'), 'evacuation_center_id', None)
+        if current_id:
+            self.evacuation_center_id.query_factory = lambda: _open_centers(current_id)
     
     def validate_date_of_birth(self, field):
         if field.data and field.data > date.today():
@@ -51,11 +124,20 @@ class EvacueeForm(FlaskForm):
 
 class FamilyForm(FlaskForm):
     family_name = StringField('Family Name', validators=[DataRequired()])
-    head_of_family_id = SelectField('Head of Family', coerce=int, validators=[Optional()])
+    head_of_family_id = RecordSelectField('Head of Family', validators=[Optional()], model=Evacuee,
+                                          endpoint='lookup.evacuees', get_label=attrgetter('full_name'),
+                                          blank_text='None')
     address = StringField('Home Address', validators=[Optional()])
     contact_number = StringField('Contact Number', validators=[Optional()])
     submit = SubmitField('Save Family')
 
+class EvacueeImportForm(FlaskForm):
+    file = FileField('Spreadsheet', validators=[
+        FileRequired(),
+        FileAllowed(['csv', 'xlsx'], 'Upload a .csv or .xlsx file.')
+    ])
+    submit = SubmitField('Import Evacuees')
+
 class DonationForm(FlaskForm):
     type = SelectField('Donation Type', choices=[('food', 'Food'), ('non-food', 'Non-Food')], validators=[DataRequired()])
     description = TextAreaField('Description', validators=[DataRequired()])
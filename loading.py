@@ -0,0 +1,74 @@
+"""Declared relationship loading for the list views.
+
+A list template reads relationships of every row it shows
+(``evacuee.evacuation_center.name``, ``family.head_of_family``); left to the
+default lazy loading, each of those is one more query per row. Instead every
+list names in ``LIST_LOADS`` the relationships its rows use and how they are
+fetched: ``joinedload`` for references to a single record, joined into the
+page query itself, and ``subqueryload`` for collections, one extra query
+however many rows (``selectinload`` would split long unpaginated lists into
+batches of ids). A list page then runs the same number of queries however
+many rows it shows.
+
+``with_loading(query, 'evacuees')`` adds a list's options to its query. With
+``STRICT_LOADING`` on (the default in debug mode and when ``app.testing`` is
+set) every relationship the list did not declare raises on access, so a
+template that starts reading a new relationship fails in development instead
+of adding a query per row in production; declare it here.
+
+The options go on the query that fetches the rows, not on the shared
+``_filtered_*`` helpers of the routes: the CSV exports reuse those with their
+own column selection.
+"""
+import os
+
+from flask import current_app
+from sqlalchemy.orm import configure_mappers, joinedload, raiseload, subqueryload
+
+from models import Evacuee, Family, Donation, InventoryItem, DuplicateCandidate
+
+# Relationships declared as backrefs (Evacuee.family, .evacuation_center) only exist once the
+# mappers are configured; a first start creating the tables does that, a later start may not have
+configure_mappers()
+
+LIST_LOADS = {
+    'evacuees': (joinedload(Evacuee.family), joinedload(Evacuee.evacuation_center)),
+    # member_count only needs the members' ids
+    'families': (joinedload(Family.head_of_family), subqueryload(Family.members).load_only(Evacuee.id)),
+    'donations': (joinedload(Donation.donor), joinedload(Donation.evacuation_center)),
+    'donor_donations': (joinedload(Donation.evacuation_center),),
+    'inventory': (joinedload(InventoryItem.evacuation_center),),
+    'users': (),
+    'duplicates': tuple(
+        joinedload(relationship).options(joinedload(Evacuee.family), joinedload(Evacuee.evacuation_center))
+        for relationship in (DuplicateCandidate.evacuee, DuplicateCandidate.duplicate)
+    ),
+    'recent_evacuees': (joinedload(Evacuee.evacuation_center),),
+    'recent_donations': (joinedload(Donation.evacuation_center),),
+}
+
+
+def strict():
+    setting = current_app.config.get('STRICT_LOADING')
+    if setting is None:
+        return current_app.debug or current_app.testing
+    return setting
+
+
+def loading_options(name):
+    """The loader options of list ``name``, plus ``raiseload`` for the rest when strict."""
+    options = list(LIST_LOADS[name])
+    if strict():
+        options.append(raiseload('*', sql_only=True))
+    return options
+
+
+def with_loading(query, name):
+    return query.options(*loading_options(name))
+
+
+def init_app(app):
+    setting = os.environ.get('STRICT_LOADING')
+    if setting is not None:
+        setting = setting.lower() in ('1', 'true', 'yes', 'on')
+    app.config.setdefault('STRICT_LOADING', setting)
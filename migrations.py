@@ -0,0 +1,266 @@
+"""Versioned schema migrations.
+
+``db.create_all()`` creates missing tables but never changes tables that
+already exist, so changes to the schema of existing tables are written here as
+numbered migrations. ``flask upgrade-schema`` applies the pending ones in order
+and records each in ``schema_migration``; ``flask schema-status`` lists them.
+A database created from scratch already has the current schema and is stamped
+as up to date at startup.
+
+Migrations must be safe to run against a live database:
+
+* every step checks the current schema first, so a migration interrupted half
+  way (MySQL commits each DDL statement on its own) can simply be run again;
+* on MySQL/MariaDB indexes are built with ``ALGORITHM=INPLACE, LOCK=NONE``, so
+  reads and writes carry on while they build;
+* new columns are added with a default, so running code keeps working.
+
+New migrations are appended with the next version number; the models must be
+updated to match so new databases get the same schema from ``create_all``.
+"""
+import logging
+from datetime import datetime
+
+from sqlalchemy import bindparam, inspect, select, text, update
+
+from app import db
+
+logger = logging.getLogger(__name__)
+
+schema_migration = db.Table(
+    'schema_migration',
+    db.Column('version', db.Integer, primary_key=True, autoincrement=False),
+    db.Column('name', db.String(100), nullable=False),
+    db.Column('applied_at', db.DateTime, nullable=False),
+)
+
+MIGRATIONS = []  # (version, name, function), in version order
+
+
+def migration(version, name):
+    def register(function):
+        assert not MIGRATIONS or version > MIGRATIONS[-1][0], 'migrations must be declared in version order'
+        MIGRATIONS.append((version, name, function))
+        return function
+    return register
+
+
+# Schema helpers for migration steps; each one is a no-op when the change is already there
+
+def _quote(connection, name):
+    return connection.dialect.identifier_preparer.quote(name)
+
+
+def add_column(connection, table, column, definition):
+    """Add ``column`` to ``table``; returns False when it already exists."""
+    if column in {c['name'] for c in inspect(connection).get_columns(table)}:
+        return False
+    connection.execute(text(
+        f'ALTER TABLE {_quote(connection, table)} ADD COLUMN {_quote(connection, column)} {definition}'
+    ))
+    return True
+
+
+def create_index(connection, name, table, columns):
+    """Create index ``name`` on ``table`` unless it, or an index leading with ``columns``, exists."""
+    for index in inspect(connection).get_indexes(table):
+        # MySQL has already indexed foreign key columns by itself
+        if index['name'] == name or index['column_names'][:len(columns)] == list(columns):
+            return False
+    sql = (f'CREATE INDEX {_quote(connection, name)} ON {_quote(connection, table)} '
+           f'({", ".join(_quote(connection, column) for column in columns)})')
+    if connection.dialect.name in ('mysql', 'mariadb'):
+        # Online build: no table copy and no lock on concurrent DML
+        sql += ' ALGORITHM=INPLACE LOCK=NONE'
+    connection.execute(text(sql))
+    return True
+
+
+# Migrations
+
+@migration(1, 'evacuation center occupancy counters')
+def _occupancy_counters(connection):
+    for column in ('occupancy_count', 'present_count', 'relocated_count', 'missing_count', 'deceased_count'):
+        add_column(connection, 'evacuation_center', column, 'INTEGER NOT NULL DEFAULT 0')
+    # Fill the counters; afterwards the flush hooks in models.py keep them current. Run even when
+    # the columns were already there: a run stopped after its ALTERs (each commits on MySQL) left them at 0
+    counts = {'occupancy_count': ''}
+    counts.update({f'{status}_count': f" AND evacuee.status = '{status}'"
+                   for status in ('present', 'relocated', 'missing', 'deceased')})
+    connection.execute(text('UPDATE evacuation_center SET ' + ', '.join(
+        f'{column} = (SELECT COUNT(*) FROM evacuee '
+        f'WHERE evacuee.evacuation_center_id = evacuation_center.id{condition})'
+        for column, condition in counts.items()
+    )))
+
+
+@migration(2, 'indexes for list filters, keyset pagination and foreign keys')
+def _hot_path_indexes(connection):
+    # Status/center filters on the evacuee lists and the per-center status counts
+    create_index(connection, 'ix_evacuee_status_center', 'evacuee', ('status', 'evacuation_center_id'))
+    # Inventory type/status filters and the expiring-food lookups
+    create_index(connection, 'ix_inventory_item_type_status_expiry', 'inventory_item',
+                 ('type', 'status', 'expiry_date'))
+    # A donor's own donations, newest first
+    create_index(connection, 'ix_donation_donor_created', 'donation', ('donor_id', 'created_at'))
+    create_index(connection, 'ix_donation_status', 'donation', ('status',))
+    # Default (newest first) sort of the keyset-paginated lists
+    create_index(connection, 'ix_user_created_at', 'user', ('created_at',))
+    create_index(connection, 'ix_evacuee_created_at', 'evacuee', ('created_at',))
+    create_index(connection, 'ix_donation_created_at', 'donation', ('created_at',))
+    create_index(connection, 'ix_inventory_item_created_at', 'inventory_item', ('created_at',))
+    # Foreign keys: family members, heads of family and per-center lists
+    create_index(connection, 'ix_evacuee_family_id', 'evacuee', ('family_id',))
+    create_index(connection, 'ix_evacuee_evacuation_center_id', 'evacuee', ('evacuation_center_id',))
+    create_index(connection, 'ix_family_head_of_family_id', 'family', ('head_of_family_id',))
+    create_index(connection, 'ix_donation_evacuation_center_id', 'donation', ('evacuation_center_id',))
+    create_index(connection, 'ix_inventory_item_evacuation_center_id', 'inventory_item', ('evacuation_center_id',))
+    create_index(connection, 'ix_inventory_item_donation_id', 'inventory_item', ('donation_id',))
+
+
+@migration(3, 'inventory ledger and stock levels')
+def _inventory_ledger(connection):
+    from models import StockLevel, StockMovement
+    from services.ledger import open_balances
+    StockMovement.__table__.create(connection, checkfirst=True)
+    StockLevel.__table__.create(connection, checkfirst=True)
+    # Stock on hand so far becomes the opening entries; lines already entered are skipped on a re-run
+    open_balances(connection)
+
+
+
+@migration(4, 'evacuation center special-needs flag')
+def _center_special_needs(connection):
+    # Every center keeps accepting everyone until an admin says otherwise
+    add_column(connection, 'evacuation_center', 'accepts_special_needs', 'BOOLEAN NOT NULL DEFAULT 1')
+
+
+@migration(5, 'duplicate detection blocking keys and review queue')
+def _duplicate_detection(connection):
+    from models import DuplicateCandidate, Evacuee, name_block_key
+    add_column(connection, 'evacuee', 'surname_key', 'VARCHAR(20)')
+    add_column(connection, 'evacuee', 'given_name_key', 'VARCHAR(20)')
+    # Fill the keys in id order, a chunk at a time; rows already keyed are skipped on a re-run
+    table = Evacuee.__table__
+    last_id = 0
+    while True:
+        rows = connection.execute(
+            select(table.c.id, table.c.first_name, table.c.last_name, table.c.date_of_birth)
+            .where(table.c.id > last_id, table.c.surname_key.is_(None)).order_by(table.c.id).limit(5000)
+        ).all()
+        if not rows:
+            break
+        connection.execute(
+            update(table).where(table.c.id == bindparam('row_id'))
+            .values(surname_key=bindparam('surname'), given_name_key=bindparam('given')),
+            [{'row_id': row.id, 'surname': name_block_key(row.last_name, row.date_of_birth),
+              'given': name_block_key(row.first_name, row.date_of_birth)} for row in rows]
+        )
+        last_id = rows[-1].id
+    create_index(connection, 'ix_evacuee_surname_key', 'evacuee', ('surname_key',))
+    create_index(connection, 'ix_evacuee_given_name_key', 'evacuee', ('given_name_key',))
+    DuplicateCandidate.__table__.create(connection, checkfirst=True)
+
+
+@migration(6, 'evacuee phonetic name keys')
+def _phonetic_name_keys(connection):
+    from models import Evacuee, given_name_phonetic, surname_phonetic
+    add_column(connection, 'evacuee', 'first_name_phonetic', 'VARCHAR(12)')
+    add_column(connection, 'evacuee', 'last_name_phonetic', 'VARCHAR(12)')
+    # As for the blocking keys: id order, a chunk at a time, rows already keyed skipped
+    table = Evacuee.__table__
+    last_id = 0
+    while True:
+        rows = connection.execute(
+            select(table.c.id, table.c.first_name, table.c.last_name)
+            .where(table.c.id > last_id, table.c.first_name_phonetic.is_(None)).order_by(table.c.id).limit(5000)
+        ).all()
+        if not rows:
+            break
+        connection.execute(
+            update(table).where(table.c.id == bindparam('row_id'))
+            .values(first_name_phonetic=bindparam('given'), last_name_phonetic=bindparam('surname')),
+            [{'row_id': row.id, 'given': given_name_phonetic(row.first_name),
+              'surname': surname_phonetic(row.last_name)} for row in rows]
+        )
+        last_id = rows[-1].id
+    create_index(connection, 'ix_evacuee_first_name_phonetic', 'evacuee', ('first_name_phonetic',))
+    create_index(connection, 'ix_evacuee_last_name_phonetic', 'evacuee', ('last_name_phonetic',))
+
+
+@migration(7, 'evacuee phonetic keys for j, h, g and ll')
+def _phonetic_keys_recomputed(connection):
+    from models import Evacuee, given_name_phonetic, surname_phonetic
+    # The rules changed, so every key is computed again; only rows whose keys differ are written,
+    # which also makes a second run after an interruption cheap
+    table = Evacuee.__table__
+    last_id = 0
+    while True:
+        rows = connection.execute(
+            select(table.c.id, table.c.first_name, table.c.last_name, table.c.first_name_phonetic,
+                   table.c.last_name_phonetic)
+            .where(table.c.id > last_id).order_by(table.c.id).limit(5000)
+        ).all()
+        if not rows:
+            break
+        changed = []
+        for row in rows:
+            given, surname = given_name_phonetic(row.first_name), surname_phonetic(row.last_name)
+            if (given, surname) != (row.first_name_phonetic, row.last_name_phonetic):
+                changed.append({'row_id': row.id, 'given': given, 'surname': surname})
+        if changed:
+            connection.execute(
+                update(table).where(table.c.id == bindparam('row_id'))
+                .values(first_name_phonetic=bindparam('given'), last_name_phonetic=bindparam('surname')),
+                changed
+            )
+        last_id = rows[-1].id
+
+
+# Runner
+
+def applied_versions(connection):
+    return set(connection.scalars(select(schema_migration.c.version)))
+
+
+def _record(connection, version, name):
+    connection.execute(schema_migration.insert().values(version=version, name=name, applied_at=datetime.now()))
+
+
+def migration_status():
+    """(version, name, applied) for every known migration."""
+    with db.engine.connect() as connection:
+        applied = applied_versions(connection)
+    return [(version, name, version in applied) for version, name, function in MIGRATIONS]
+
+
+def upgrade_schema():
+    """Apply every pending migration in order; returns the (version, name) pairs applied."""
+    with db.engine.connect() as connection:
+        applied = applied_versions(connection)
+    done = []
+    for version, name, function in MIGRATIONS:
+        if version in applied:
+            continue
+        # One transaction per migration (DDL is transactional on SQLite and PostgreSQL)
+        with db.engine.begin() as connection:
+            function(connection)
+            _record(connection, version, name)
+        logger.info('Applied schema migration %s: %s', version, name)
+        done.append((version, name))
+    return done
+
+
+def init_schema():
+    """Called at startup: create missing tables and stamp or check the migration state."""
+    new_database = not inspect(db.engine).has_table('evacuee')
+    db.create_all()
+    if new_database:
+        # create_all just built the current schema, which already includes every migration
+        with db.engine.begin() as connection:
+            for version, name, function in MIGRATIONS:
+                _record(connection, version, name)
+        return
+    pending = [version for version, name, applied in migration_status() if not applied]
+    if pending:
+        logger.warning('%d schema migration(s) pending; run "flask upgrade-schema"', len(pending))
@@ -1,6 +1,17 @@
+from collections import Counter, defaultdict, namedtuple
 from datetime import datetime
+from sqlalchemy import event, func, insert, inspect, update
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session, column_property
 from app import db
-from flask_login import UserMixin
+from services.cache import stats_cache
+from services.phonetic import normalize_name, phonetic_key
+from flask import has_request_context
+from flask_login import UserMixin, current_user
+
+# Evacuee statuses that have their own occupancy counter on EvacuationCenter
+EVACUEE_STATUSES = ('present', 'relocated', 'missing', 'deceased')
 
 class User(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -14,6 +25,11 @@ class User(UserMixin, db.Model):
     is_active = db.Column(db.Boolean, default=True)
     created_at = db.Column(db.DateTime, default=datetime.now)
     
+    # Indexes are added to existing databases by the migrations in migrations.py
+    __table_args__ = (
+        db.Index('ix_user_created_at', 'created_at'),
+    )
+    
     # Relationship with donations (for donor)
     donations = db.relationship('Donation', backref='donor', lazy=True)
     
@@ -30,11 +46,20 @@ class EvacuationCenter(db.Model):
     address = db.Column(db.String(200), nullable=False)
     capacity = db.Column(db.Integer, nullable=False)
     status = db.Column(db.String(20), default='active')  # 'active', 'closed'
+    # Whether evacuees with special needs can be placed here (services.placement)
+    accepts_special_needs = db.Column(db.Boolean, nullable=False, default=True, server_default='1')
     contact_person = db.Column(db.String(100))
     contact_number = db.Column(db.String(20))
     created_at = db.Column(db.DateTime, default=datetime.now)
     updated_at = db.Column(db.DateTime, default=datetime.now, onupdate=datetime.now)
     
+    # Denormalized occupancy counters, maintained by the flush hooks below
+    occupancy_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    present_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    relocated_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    missing_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    deceased_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    
     # Relationships
     evacuees = db.relationship('Evacuee', backref='evacuation_center', lazy=True)
     inventory_items = db.relationship('InventoryItem', backref='evacuation_center', lazy=True)
@@ -45,16 +70,44 @@ class EvacuationCenter(db.Model):
     
     @property
     def current_occupancy(self):
-        return len(self.evacuees)
+        return self.occupancy_count or 0
     
     @property
     def available_capacity(self):
         return self.capacity - self.current_occupancy
+    
+    def status_count(self, status):
+        return getattr(self, f'{status}_count') or 0 if status in EVACUEE_STATUSES else 0
+    
+    @classmethod
+    def recompute_occupancy(cls):
+        """Rebuild every center's occupancy counters from a single GROUP BY over evacuees."""
+        rows = db.session.query(
+            Evacuee.evacuation_center_id, Evacuee.status, func.count(Evacuee.id)
+        ).filter(Evacuee.evacuation_center_id.isnot(None)).group_by(
+            Evacuee.evacuation_center_id, Evacuee.status
+        ).all()
+        
+        counts = defaultdict(Counter)
+        for center_id, status, count in rows:
+            counts[center_id]['occupancy_count'] += count
+            if status in EVACUEE_STATUSES:
+                counts[center_id][f'{status}_count'] += count
+        
+        columns = ['occupancy_count'] + [f'{status}_count' for status in EVACUEE_STATUSES]
+        changed = 0
+        for center in cls.query.all():
+            for column in columns:
+                if getattr(center, column) != counts[center.id][column]:
+                    setattr(center, column, counts[center.id][column])
+                    changed += 1
+        db.session.commit()
+        return changed
 
 class Family(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     family_name = db.Column(db.String(100), nullable=False)
-    head_of_family_id = db.Column(db.Integer, db.ForeignKey('evacuee.id'), nullable=True)
+    head_of_family_id = db.Column(db.Integer, db.ForeignKey('evacuee.id'), nullable=True, index=True)
     address = db.Column(db.String(200))
     contact_number = db.Column(db.String(20))
     created_at = db.Column(db.DateTime, default=datetime.now)
@@ -77,13 +130,31 @@ class Evacuee(db.Model):
     last_name = db.Column(db.String(64), nullable=False)
     date_of_birth = db.Column(db.Date)
     gender = db.Column(db.String(10))
-    status = db.Column(db.String(20), default='present')  # 'present', 'relocated', 'missing', 'deceased'
+    # active_history keeps the previous value around so the occupancy hooks can decrement it
+    status = column_property(db.Column(db.String(20), default='present'), active_history=True)  # 'present', 'relocated', 'missing', 'deceased'
     special_needs = db.Column(db.Text)
-    family_id = db.Column(db.Integer, db.ForeignKey('family.id'), nullable=True)
-    evacuation_center_id = db.Column(db.Integer, db.ForeignKey('evacuation_center.id'), nullable=True)
+    family_id = db.Column(db.Integer, db.ForeignKey('family.id'), nullable=True, index=True)
+    evacuation_center_id = column_property(
+        db.Column(db.Integer, db.ForeignKey('evacuation_center.id'), nullable=True, index=True), active_history=True
+    )
+    # Duplicate detection blocking keys (name_block_key); filled in by bulk inserts too, updated by the hooks below
+    surname_key = db.Column(db.String(20), index=True,
+                            default=lambda context: _block_key_default(context, 'last_name'))
+    given_name_key = db.Column(db.String(20), index=True,
+                               default=lambda context: _block_key_default(context, 'first_name'))
+    # Phonetic keys for search (given_name_phonetic, surname_phonetic); maintained the same way
+    first_name_phonetic = db.Column(db.String(12), index=True,
+                                    default=lambda context: _phonetic_default(context, 'first_name'))
+    last_name_phonetic = db.Column(db.String(12), index=True,
+                                   default=lambda context: _phonetic_default(context, 'last_name'))
     created_at = db.Column(db.DateTime, default=datetime.now)
     updated_at = db.Column(db.DateTime, default=datetime.now, onupdate=datetime.now)
     
+    __table_args__ = (
+        db.Index('ix_evacuee_status_center', 'status', 'evacuation_center_id'),
+        db.Index('ix_evacuee_created_at', 'created_at'),
+    )
+    
     def __repr__(self):
         return f'<Evacuee {self.first_name} {self.last_name}>'
     
@@ -106,11 +177,17 @@ class Donation(db.Model):
     unit = db.Column(db.String(20), nullable=False)  # 'kg', 'pcs', etc.
     expiry_date = db.Column(db.Date, nullable=True)  # Only for food items
     donor_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
-    evacuation_center_id = db.Column(db.Integer, db.ForeignKey('evacuation_center.id'), nullable=True)
+    evacuation_center_id = db.Column(db.Integer, db.ForeignKey('evacuation_center.id'), nullable=True, index=True)
     status = db.Column(db.String(20), default='pending')  # 'pending', 'received', 'distributed'
     created_at = db.Column(db.DateTime, default=datetime.now)
     updated_at = db.Column(db.DateTime, default=datetime.now, onupdate=datetime.now)
     
+    __table_args__ = (
+        db.Index('ix_donation_donor_created', 'donor_id', 'created_at'),
+        db.Index('ix_donation_status', 'status'),
+        db.Index('ix_donation_created_at', 'created_at'),
+    )
+    
     # Relationship with inventory items created from this donation
     inventory_items = db.relationship('InventoryItem', backref='donation', lazy=True)
     
@@ -131,18 +208,28 @@ class Donation(db.Model):
         return False
 
 class InventoryItem(db.Model):
+    # quantity is what is on hand; movements (StockMovement) reduce it, and the one that
+    # empties the line closes it as 'distributed' or 'expired' with its last quantity.
+    # active_history keeps the previous values around so the stock level hooks can move them
     id = db.Column(db.Integer, primary_key=True)
-    type = db.Column(db.String(20), nullable=False)  # 'food', 'non-food'
-    description = db.Column(db.Text, nullable=False)
-    quantity = db.Column(db.Integer, nullable=False)
-    unit = db.Column(db.String(20), nullable=False)  # 'kg', 'pcs', etc.
+    type = column_property(db.Column(db.String(20), nullable=False), active_history=True)  # 'food', 'non-food'
+    description = column_property(db.Column(db.Text, nullable=False), active_history=True)
+    quantity = column_property(db.Column(db.Integer, nullable=False), active_history=True)
+    unit = column_property(db.Column(db.String(20), nullable=False), active_history=True)  # 'kg', 'pcs', etc.
     expiry_date = db.Column(db.Date, nullable=True)  # Only for food items
-    donation_id = db.Column(db.Integer, db.ForeignKey('donation.id'), nullable=True)
-    evacuation_center_id = db.Column(db.Integer, db.ForeignKey('evacuation_center.id'), nullable=False)
-    status = db.Column(db.String(20), default='available')  # 'available', 'distributed', 'expired'
+    donation_id = db.Column(db.Integer, db.ForeignKey('donation.id'), nullable=True, index=True)
+    evacuation_center_id = column_property(
+        db.Column(db.Integer, db.ForeignKey('evacuation_center.id'), nullable=False, index=True), active_history=True
+    )
+    status = column_property(db.Column(db.String(20), default='available'), active_history=True)  # 'available', 'distributed', 'expired'
     created_at = db.Column(db.DateTime, default=datetime.now)
     updated_at = db.Column(db.DateTime, default=datetime.now, onupdate=datetime.now)
     
+    __table_args__ = (
+        db.Index('ix_inventory_item_type_status_expiry', 'type', 'status', 'expiry_date'),
+        db.Index('ix_inventory_item_created_at', 'created_at'),
+    )
+    
     def __repr__(self):
         return f'<InventoryItem {self.type} - {self.description}>'
     
@@ -155,6 +242,323 @@ class InventoryItem(db.Model):
     
     @property
     def is_expired(self):
+        # The expiry sweep (services/expiry.py) moves past-date food to 'expired'
+        if self.status == 'expired':
+            return True
         if self.type == 'food' and self.expiry_date:
             return self.expiry_date < datetime.now().date()
         return False
+
+class StockLevel(db.Model):
+    """Quantity of one item on hand at one center: the sum of its available inventory lines.
+
+    Kept current by the inventory flush hooks below and by ``record_stock_movements``
+    for bulk writes, so a center's stock of an item is a primary key lookup.
+    """
+    evacuation_center_id = db.Column(db.Integer, db.ForeignKey('evacuation_center.id'), primary_key=True)
+    item = db.Column(db.String(200), primary_key=True)  # stock_item_key(description)
+    unit = db.Column(db.String(20), primary_key=True)
+    type = db.Column(db.String(20), nullable=False)
+    quantity = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.now, onupdate=datetime.now)
+    
+    def __repr__(self):
+        return f'<StockLevel {self.evacuation_center_id} {self.item} {self.quantity} {self.unit}>'
+
+class StockMovement(db.Model):
+    """One entry of the append-only inventory ledger: a signed change to the stock on hand."""
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(20), nullable=False)  # STOCK_MOVEMENT_KINDS
+    # Cleared if the inventory line is deleted; the entry itself stays
+    inventory_item_id = db.Column(db.Integer, db.ForeignKey('inventory_item.id', ondelete='SET NULL'), nullable=True)
+    evacuation_center_id = db.Column(db.Integer, db.ForeignKey('evacuation_center.id'), nullable=False)
+    item = db.Column(db.String(200), nullable=False)
+    unit = db.Column(db.String(20), nullable=False)
+    type = db.Column(db.String(20), nullable=False)
+    quantity = db.Column(db.Integer, nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
+    note = db.Column(db.String(200))
+    created_at = db.Column(db.DateTime, default=datetime.now)
+    
+    __table_args__ = (
+        db.Index('ix_stock_movement_item', 'inventory_item_id', 'id'),
+        db.Index('ix_stock_movement_center', 'evacuation_center_id', 'id'),
+    )
+    
+    def __repr__(self):
+        return f'<StockMovement {self.kind} {self.quantity} {self.unit} {self.item}>'
+
+class DuplicateCandidate(db.Model):
+    """A pair of evacuees that may be the same person, waiting for an admin's review (services.dedup)."""
+    id = db.Column(db.Integer, primary_key=True)
+    # The lower id of the pair first, so each pair has one row
+    evacuee_id = db.Column(db.Integer, db.ForeignKey('evacuee.id', ondelete='CASCADE'), nullable=False)
+    duplicate_id = db.Column(db.Integer, db.ForeignKey('evacuee.id', ondelete='CASCADE'), nullable=False, index=True)
+    score = db.Column(db.Float, nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='pending')  # 'pending', 'dismissed'
+    reviewed_by_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
+    reviewed_at = db.Column(db.DateTime)
+    created_at = db.Column(db.DateTime, default=datetime.now)
+    
+    evacuee = db.relationship('Evacuee', foreign_keys=[evacuee_id])
+    duplicate = db.relationship('Evacuee', foreign_keys=[duplicate_id])
+    
+    __table_args__ = (
+        db.UniqueConstraint('evacuee_id', 'duplicate_id', name='uq_duplicate_candidate_pair'),
+        db.Index('ix_duplicate_candidate_status_score', 'status', 'score'),
+    )
+    
+    def __repr__(self):
+        return f'<DuplicateCandidate {self.evacuee_id}/{self.duplicate_id} {self.score:.2f}>'
+
+
+# Name keys: duplicate detection blocking keys and phonetic search keys
+NAME_KEY_LENGTH = 4
+
+def name_block_key(name, date_of_birth):
+    """The first letters of the name, spaces ignored, and the birth year: ``'delc|1987'``."""
+    letters = normalize_name(name).replace(' ', '')[:NAME_KEY_LENGTH]
+    return f'{letters}|{date_of_birth.year if date_of_birth else ""}'
+
+def given_name_phonetic(first_name):
+    """Phonetic key of the first of the given names, the one a person is looked for by (Maria of Maria Luisa)."""
+    return phonetic_key(normalize_name(first_name).partition(' ')[0])
+
+def surname_phonetic(last_name):
+    """Phonetic key of the whole surname, particles included (Dela Cruz)."""
+    return phonetic_key(last_name)
+
+def _block_key_default(context, field):
+    parameters = context.get_current_parameters()
+    return name_block_key(parameters.get(field), parameters.get('date_of_birth'))
+
+def _phonetic_default(context, field):
+    name = context.get_current_parameters().get(field)
+    return given_name_phonetic(name) if field == 'first_name' else surname_phonetic(name)
+
+@event.listens_for(Session, 'before_flush')
+def _update_name_keys(session, flush_context, instances):
+    for obj in session.new | session.dirty:
+        if not isinstance(obj, Evacuee):
+            continue
+        state = inspect(obj)
+        if obj in session.new or any(state.attrs[field].history.has_changes()
+                                     for field in ('first_name', 'last_name', 'date_of_birth')):
+            obj.surname_key = name_block_key(obj.last_name, obj.date_of_birth)
+            obj.given_name_key = name_block_key(obj.first_name, obj.date_of_birth)
+            obj.first_name_phonetic = given_name_phonetic(obj.first_name)
+            obj.last_name_phonetic = surname_phonetic(obj.last_name)
+
+
+# Occupancy counter maintenance
+def _previous_value(evacuee, attr):
+    history = inspect(evacuee).attrs[attr].history
+    if history.deleted:
+        return history.deleted[0]
+    if history.unchanged:
+        return history.unchanged[0]
+    return getattr(evacuee, attr)
+
+def _current_value(evacuee, attr):
+    history = inspect(evacuee).attrs[attr].history
+    if history.added:
+        return history.added[0]
+    return getattr(evacuee, attr)
+
+@event.listens_for(Session, 'before_flush')
+def _load_occupancy_state(session, flush_context, instances):
+    # Make sure deleted evacuees still carry their center and status once the row is gone
+    for obj in session.deleted:
+        if isinstance(obj, Evacuee):
+            obj.evacuation_center_id, obj.status
+
+@event.listens_for(Session, 'after_flush')
+def _update_occupancy_counters(session, flush_context):
+    deltas = defaultdict(Counter)
+    
+    def apply(center_id, status, amount):
+        if center_id is None:
+            return
+        deltas[center_id]['occupancy_count'] += amount
+        if status in EVACUEE_STATUSES:
+            deltas[center_id][f'{status}_count'] += amount
+    
+    for obj in session.new:
+        if isinstance(obj, Evacuee):
+            apply(obj.evacuation_center_id, obj.status, 1)
+    
+    for obj in session.deleted:
+        if isinstance(obj, Evacuee):
+            apply(_previous_value(obj, 'evacuation_center_id'), _previous_value(obj, 'status'), -1)
+    
+    for obj in session.dirty:
+        if not isinstance(obj, Evacuee) or obj in session.deleted:
+            continue
+        old_center, old_status = _previous_value(obj, 'evacuation_center_id'), _previous_value(obj, 'status')
+        new_center, new_status = _current_value(obj, 'evacuation_center_id'), _current_value(obj, 'status')
+        if (old_center, old_status) != (new_center, new_status):
+            apply(old_center, old_status, -1)
+            apply(new_center, new_status, 1)
+    
+    apply_occupancy_deltas(session, deltas)
+
+def apply_occupancy_deltas(session, deltas):
+    """Increment center counters in SQL so concurrent writers never lose an update."""
+    table = EvacuationCenter.__table__
+    for center_id, counter in deltas.items():
+        values = {column: table.c[column] + amount for column, amount in counter.items() if amount}
+        if not values:
+            continue
+        session.connection().execute(update(table).where(table.c.id == center_id).values(**values))
+        mark_tables_changed(session, table.name)
+        center = session.identity_map.get(inspect(EvacuationCenter).identity_key_from_primary_key((center_id,)))
+        if center is not None:
+            session.expire(center, list(values))
+
+
+# Stock level maintenance
+STOCK_MOVEMENT_KINDS = ('receive', 'distribute', 'transfer', 'spoil', 'adjust')
+# Movement recorded when an edit closes an available line
+CLOSING_KINDS = {'distributed': 'distribute', 'expired': 'spoil'}
+
+def stock_item_key(description):
+    """Name an item's stock is kept under: its description trimmed and lower-cased."""
+    return (description or '').strip().lower()[:200]
+
+def stock_movement(kind, line, quantity, note=None):
+    """Ledger entry for ``quantity`` (signed) of ``line``, anything with the InventoryItem columns."""
+    return {
+        'kind': kind,
+        'inventory_item_id': line.id,
+        'evacuation_center_id': line.evacuation_center_id,
+        'item': stock_item_key(line.description),
+        'unit': line.unit,
+        'type': line.type,
+        'quantity': quantity,
+        'note': note,
+    }
+
+def _acting_user_id():
+    if has_request_context() and current_user.is_authenticated:
+        return int(current_user.get_id())
+    return None
+
+def record_stock_movements(session, movements):
+    """Append ``movements`` (``stock_movement`` dicts) to the ledger and apply them to the stock levels."""
+    movements = [movement for movement in movements if movement['quantity']]
+    if not movements:
+        return
+    now, user_id = datetime.now(), _acting_user_id()
+    connection = session.connection()
+    connection.execute(insert(StockMovement.__table__), [
+        dict(movement, user_id=user_id, created_at=now) for movement in movements
+    ])
+    deltas = defaultdict(int)
+    types = {}
+    for movement in movements:
+        key = (movement['evacuation_center_id'], movement['item'], movement['unit'])
+        deltas[key] += movement['quantity']
+        types[key] = movement['type']
+    for key, amount in deltas.items():
+        if amount:
+            _add_stock(connection, key, types[key], amount, now)
+    mark_tables_changed(session, StockMovement.__tablename__, StockLevel.__tablename__)
+
+def _add_stock(connection, key, item_type, amount, now):
+    """Increment one stock level in SQL (creating it on first receipt) so concurrent writers never lose an update."""
+    table = StockLevel.__table__
+    center_id, item, unit = key
+    values = dict(evacuation_center_id=center_id, item=item, unit=unit, type=item_type, quantity=amount, updated_at=now)
+    dialect = connection.dialect.name
+    if dialect in ('mysql', 'mariadb'):
+        statement = mysql_insert(table).values(**values)
+        statement = statement.on_duplicate_key_update(quantity=table.c.quantity + amount, updated_at=now)
+    elif dialect == 'sqlite':
+        statement = sqlite_insert(table).values(**values).on_conflict_do_update(
+            index_elements=['evacuation_center_id', 'item', 'unit'],
+            set_={'quantity': table.c.quantity + amount, 'updated_at': now}
+        )
+    else:
+        result = connection.execute(update(table).where(
+            table.c.evacuation_center_id == center_id, table.c.item == item, table.c.unit == unit
+        ).values(quantity=table.c.quantity + amount, updated_at=now))
+        if result.rowcount:
+            return
+        statement = insert(table).values(**values)
+    connection.execute(statement)
+
+StockLine = namedtuple('StockLine', 'id evacuation_center_id description unit type quantity')
+
+def _stock_line(item, value):
+    """(StockLine with the quantity ``item`` adds to its stock level, status), read with ``value``."""
+    status = value(item, 'status') or 'available'
+    quantity = value(item, 'quantity') if status == 'available' else 0
+    line = StockLine(item.id, value(item, 'evacuation_center_id'), value(item, 'description'), value(item, 'unit'),
+                     value(item, 'type'), quantity or 0)
+    return line, status
+
+def _stock_key(line):
+    return line.evacuation_center_id, stock_item_key(line.description), line.unit
+
+@event.listens_for(Session, 'before_flush')
+def _load_stock_state(session, flush_context, instances):
+    # Deleted lines still need their values once the row is gone
+    for obj in session.deleted:
+        if isinstance(obj, InventoryItem):
+            obj.evacuation_center_id, obj.description, obj.unit, obj.type, obj.status, obj.quantity
+
+@event.listens_for(Session, 'after_flush')
+def _update_stock_levels(session, flush_context):
+    # Inventory lines written through the ORM (admin forms); bulk writers record their own movements
+    movements = []
+    for obj in session.new:
+        if isinstance(obj, InventoryItem):
+            line, status = _stock_line(obj, _current_value)
+            movements.append(stock_movement('receive', line, line.quantity))
+    
+    for obj in session.deleted:
+        if isinstance(obj, InventoryItem):
+            line, status = _stock_line(obj, _previous_value)
+            movements.append(stock_movement('adjust', line._replace(id=None), -line.quantity, 'line deleted'))
+    
+    for obj in session.dirty:
+        if not isinstance(obj, InventoryItem) or obj in session.deleted:
+            continue
+        old, old_status = _stock_line(obj, _previous_value)
+        new, new_status = _stock_line(obj, _current_value)
+        if old == new:
+            continue
+        if _stock_key(old) == _stock_key(new):
+            kind = CLOSING_KINDS.get(new_status, 'adjust') if old_status != new_status else 'adjust'
+            movements.append(stock_movement(kind, new, new.quantity - old.quantity))
+        else:
+            # Moved to another center or renamed: out of the old stock level, into the new one
+            kind = 'transfer' if old.evacuation_center_id != new.evacuation_center_id else 'adjust'
+            movements.append(stock_movement(kind, old, -old.quantity))
+            movements.append(stock_movement(kind, new, new.quantity))
+    
+    record_stock_movements(session, movements)
+
+
+# Stats cache invalidation
+def mark_tables_changed(session, *tables):
+    """Record tables written outside the unit of work (bulk UPDATE/INSERT) for invalidation."""
+    session.info.setdefault('changed_tables', set()).update(tables)
+
+@event.listens_for(Session, 'after_flush')
+def _record_changed_tables(session, flush_context):
+    tables = {obj.__table__.name for obj in session.new | session.deleted}
+    tables.update(obj.__table__.name for obj in session.dirty if session.is_modified(obj))
+    if tables:
+        mark_tables_changed(session, *tables)
+
+@event.listens_for(Session, 'after_commit')
+def _bump_table_versions(session):
+    # Bumped only once the data is visible to other connections, so no worker can
+    # cache pre-commit numbers under the new versions
+    stats_cache.bump(session.info.pop('changed_tables', None))
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _discard_changed_tables(session, previous_transaction):
+    if not session.in_transaction():
+        session.info.pop('changed_tables', None)
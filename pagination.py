@@ -0,0 +1,139 @@
+"""Keyset (cursor) pagination for the list views.
+
+Pages are addressed by the sort value and id of the last row seen instead of an
+OFFSET, so fetching a late page costs the same as fetching the first one. The
+list routes render the first page server-side and expose a JSON endpoint that
+DataTables calls in server-side processing mode for every following page.
+"""
+import base64
+import binascii
+import json
+from datetime import date, datetime
+
+from flask import jsonify, render_template, request, url_for
+from sqlalchemy import and_, or_
+
+DEFAULT_PER_PAGE = 25
+MAX_PER_PAGE = 100
+
+# Request arguments consumed by the paginator (everything else is a filter)
+PAGINATION_ARGS = ('after', 'before', 'per_page', 'length', 'start', 'draw', 'sort', 'dir')
+
+
+def encode_cursor(value, row_id):
+    if isinstance(value, datetime):
+        payload = ['dt', value.isoformat(), row_id]
+    elif isinstance(value, date):
+        payload = ['d', value.isoformat(), row_id]
+    else:
+        payload = ['v', value, row_id]
+    raw = json.dumps(payload, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Return (value, id) for a cursor, or None when it is missing or malformed."""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        kind, value, row_id = json.loads(raw)
+        if kind == 'dt':
+            value = datetime.fromisoformat(value)
+        elif kind == 'd':
+            value = date.fromisoformat(value)
+        return value, int(row_id)
+    except (ValueError, TypeError, binascii.Error):
+        return None
+
+
+class KeysetPage:
+    def __init__(self, items, sort, direction, per_page, next_cursor=None, prev_cursor=None):
+        self.items = items
+        self.sort = sort
+        self.direction = direction
+        self.per_page = per_page
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self):
+        return self.prev_cursor is not None
+
+    @property
+    def shown(self):
+        # Rows up to the end of this page, plus one when more follow. DataTables only
+        # needs this to enable its "Next" button, and it avoids a COUNT(*) per request.
+        start = request.args.get('start', 0, type=int)
+        return start + len(self.items) + (1 if self.has_next else 0)
+
+    def source_url(self, endpoint, **values):
+        """URL of the JSON endpoint that serves further pages with the current filters."""
+        filters = {key: value for key, value in request.args.items() if key not in PAGINATION_ARGS}
+        filters.update(values)
+        return url_for(endpoint, **filters)
+
+
+def paginate(query, model, sort_columns, default_sort='created_at', default_dir='desc'):
+    """Return one KeysetPage of ``query`` driven by the request arguments.
+
+    ``sort_columns`` maps the public sort names accepted in ``?sort=`` to model
+    columns; rows are always ordered by (sort column, id) so the cursor is unique.
+    Use ``?after=<cursor>`` for the following page and ``?before=<cursor>`` for
+    the preceding one.
+    """
+    sort = request.args.get('sort')
+    if sort not in sort_columns:
+        sort = default_sort
+    direction = request.args.get('dir')
+    if direction not in ('asc', 'desc'):
+        direction = default_dir
+
+    per_page = request.args.get('per_page', type=int) or request.args.get('length', type=int) or DEFAULT_PER_PAGE
+    per_page = max(1, min(per_page, MAX_PER_PAGE))
+
+    column = sort_columns[sort]
+    backwards = bool(request.args.get('before')) and not request.args.get('after')
+    cursor = decode_cursor(request.args.get('before') if backwards else request.args.get('after'))
+
+    # Walking backwards reads the preceding rows in reverse order, then flips them
+    descending = (direction == 'desc') != backwards
+    if cursor:
+        value, last_id = cursor
+        if descending:
+            query = query.filter(or_(column < value, and_(column == value, model.id < last_id)))
+        else:
+            query = query.filter(or_(column > value, and_(column == value, model.id > last_id)))
+
+    ordering = (column.desc(), model.id.desc()) if descending else (column.asc(), model.id.asc())
+    rows = query.order_by(None).order_by(*ordering).limit(per_page + 1).all()
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if backwards:
+        rows.reverse()
+
+    has_next = True if backwards else has_more
+    has_prev = has_more if backwards else cursor is not None
+
+    page = KeysetPage(rows, sort, direction, per_page)
+    if rows and has_next:
+        page.next_cursor = encode_cursor(getattr(rows[-1], column.key), rows[-1].id)
+    if rows and has_prev:
+        page.prev_cursor = encode_cursor(getattr(rows[0], column.key), rows[0].id)
+    return page
+
+
+def page_json(page, rows_template, **context):
+    """DataTables server-side response carrying the page rendered with ``rows_template``."""
+    return jsonify(
+        draw=request.args.get('draw', 0, type=int),
+        recordsTotal=page.shown,
+        recordsFiltered=page.shown,
+        next_cursor=page.next_cursor,
+        prev_cursor=page.prev_cursor,
+        html=render_template(rows_template, page=page, **context),
+    )
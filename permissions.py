@@ -0,0 +1,104 @@
+"""Role-based access control for every endpoint.
+
+Each blueprint declares the roles allowed on its pages in
+``BLUEPRINT_POLICIES``; single endpoints narrow or widen that with the
+``allow_roles`` / ``public`` decorators. ``init_app`` resolves the policy of
+every registered endpoint once, after the blueprints are registered, so the
+``before_request`` check is a single dict lookup.
+
+An endpoint without a policy is refused (403), and ``flask check-permissions``
+lists every endpoint of ``app.url_map`` with its policy and fails if one has
+none, so a new blueprint cannot go live unguarded.
+"""
+from flask import abort, current_app, flash, redirect, request, url_for
+from flask_login import current_user
+
+ROLES = ('admin', 'volunteer', 'donor')
+PUBLIC = 'public'  # no login needed
+
+# Roles allowed on a blueprint's endpoints; admins may open every page
+BLUEPRINT_POLICIES = {
+    'auth': PUBLIC,
+    'common': PUBLIC,
+    'admin': frozenset({'admin'}),
+    'volunteer': frozenset({'admin', 'volunteer'}),
+    'lookup': frozenset({'admin', 'volunteer'}),
+    'donor': frozenset({'admin', 'donor'}),
+}
+
+# Endpoints outside any blueprint
+ENDPOINT_POLICIES = {
+    'static': PUBLIC,
+}
+
+# Where a user is sent when a page is not open to their role
+HOME_ENDPOINTS = {
+    'admin': 'admin.dashboard',
+    'volunteer': 'volunteer.dashboard',
+    'donor': 'donor.dashboard',
+}
+
+
+def allow_roles(*roles):
+    """Restrict a view to ``roles`` instead of its blueprint's policy."""
+    assert set(roles) <= set(ROLES), f'unknown role in {roles}'
+
+    def decorate(view):
+        view.allowed_roles = frozenset(roles)
+        return view
+    return decorate
+
+
+def public(view):
+    """Open a view to everyone, logged in or not."""
+    view.allowed_roles = PUBLIC
+    return view
+
+
+def build_policies(app):
+    """{endpoint: PUBLIC or frozenset of roles} for every endpoint that has a policy."""
+    policies = {}
+    for endpoint, view in app.view_functions.items():
+        policy = getattr(view, 'allowed_roles', None)
+        if policy is None:
+            policy = ENDPOINT_POLICIES.get(endpoint)
+        if policy is None and '.' in endpoint:
+            policy = BLUEPRINT_POLICIES.get(endpoint.rpartition('.')[0])
+        if policy is not None:
+            policies[endpoint] = policy
+    return policies
+
+
+def missing_policies(app):
+    """Endpoints of the URL map that no policy covers."""
+    policies = app.extensions['permissions']
+    return sorted({rule.endpoint for rule in app.url_map.iter_rules()} - set(policies))
+
+
+def check_permission():
+    endpoint = request.endpoint
+    if endpoint is None:
+        return None  # no route matched; let Flask answer 404/405
+
+    policy = current_app.extensions['permissions'].get(endpoint)
+    if policy is None:
+        abort(403)
+    if policy is PUBLIC:
+        return None
+
+    if not current_user.is_authenticated:
+        return current_app.login_manager.unauthorized()
+    if current_user.role in policy:
+        return None
+
+    flash('You do not have permission to access this page', 'danger')
+    return redirect(url_for(HOME_ENDPOINTS.get(current_user.role, 'common.index')))
+
+
+def init_app(app):
+    """Resolve the policies of the registered endpoints and install the check."""
+    app.extensions['permissions'] = build_policies(app)
+    missing = missing_policies(app)
+    if missing:
+        app.logger.warning('Endpoints without an access policy (refused): %s', ', '.join(missing))
+    app.before_request(check_permission)
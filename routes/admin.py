@@ -1,115 +1,57 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, request
+from flask import (Blueprint, render_template, redirect, url_for, flash, request, make_response, jsonify,
+                   current_app)
 from flask_login import login_required, current_user
-from sqlalchemy import func
-from datetime import datetime, timedelta
 
 from app import db
-from models import User, EvacuationCenter, Evacuee, Family, Donation, InventoryItem
+from pagination import paginate, page_json
+from loading import loading_options, with_loading
+from services.dashboard import DashboardStats
+from services.dedup import DedupError, dismiss_candidate, flag_duplicates, merge_evacuees
+from services.export import (csv_response, evacuee_rows, donation_rows, inventory_rows,
+                             EVACUEE_COLUMNS, DONATION_COLUMNS, INVENTORY_COLUMNS)
+from services.importer import EvacueeImporter, ImportFileError
+from services.perf import perf_stats
+from services.placement import PlacementConflict, place_evacuees
+from services.search import filter_query, search
+from models import User, EvacuationCenter, Evacuee, Family, Donation, InventoryItem, DuplicateCandidate
 from forms import (EvacuationCenterForm, EvacueeForm, FamilyForm, 
-                  DonationForm, InventoryItemForm, UserManagementForm, SearchForm)
+                  DonationForm, InventoryItemForm, UserManagementForm, SearchForm, EvacueeImportForm)
 
 admin_bp = Blueprint('admin', __name__, url_prefix='/admin')
 
 @admin_bp.route('/dashboard')
 @login_required
 def dashboard():
-    # Ensure user is admin
-    if current_user.role != 'admin':
-        flash('Access denied. Admin privileges required.', 'danger')
-        return redirect(url_for('common.index'))
-
-    # Center statistics
-    center_count = EvacuationCenter.query.count()
-    active_center_count = EvacuationCenter.query.filter_by(status='active').count()
-
-    # Evacuee and family statistics
-    evacuee_count = Evacuee.query.count()
-    family_count = Family.query.count()
-
-    # Donation statistics
-    donation_count = Donation.query.count()
-    pending_donation_count = Donation.query.filter_by(status='pending').count()
-
-    # Inventory statistics
-    inventory_count = InventoryItem.query.count()
-    expiring_inventory_count = InventoryItem.query.filter(
-        InventoryItem.type == 'food',
-        InventoryItem.expiry_date <= (datetime.now() + timedelta(days=7)).date(),
-        InventoryItem.status == 'available'
-    ).count()
-
-    # Recent users for the table
-    recent_users = User.query.order_by(User.created_at.desc()).limit(5).all()
-
-    # Recent activities
-    recent_centers = EvacuationCenter.query.order_by(EvacuationCenter.created_at.desc()).limit(5).all()
-    recent_evacuees = Evacuee.query.order_by(Evacuee.created_at.desc()).limit(5).all()
-    recent_donations = Donation.query.order_by(Donation.created_at.desc()).limit(5).all()
-
-    # Get centers at capacity
-    centers_at_capacity = []
-    for center in EvacuationCenter.query.all():
-        if center.current_occupancy >= center.capacity * 0.9:  # 90% or more capacity
-            centers_at_capacity.append(center)
-
-    # Get soon-to-expire food items
-    expiring_food = InventoryItem.query.filter(
-        InventoryItem.type == 'food',
-        InventoryItem.expiry_date <= (datetime.now() + timedelta(days=7)).date(),
-        InventoryItem.expiry_date >= datetime.now().date(),
-        InventoryItem.status == 'available'
-    ).order_by(InventoryItem.expiry_date).all()
-
-    # Get evacuee count by status
-    evacuee_status = db.session.query(
-        Evacuee.status, func.count(Evacuee.id)
-    ).group_by(Evacuee.status).all()
-
-    # Get donation count by type
-    donation_types = db.session.query(
-        Donation.type, func.count(Donation.id)
-    ).group_by(Donation.type).all()
-
-    # Prepare center data for occupancy chart
-    centers_data = []
-    for center in EvacuationCenter.query.filter_by(status='active').all():
-        centers_data.append({
-            'name': center.name,
-            'current_occupancy': center.current_occupancy,
-            'capacity': center.capacity
-        })
+    # All counters come from one aggregate query; lists are small bounded queries
+    stats = DashboardStats().load_counters().load_centers().load_recent(users=True)
+    stats.log('admin')
 
-    return render_template(
+    response = make_response(render_template(
         'admin/dashboard.html',
-        center_count=center_count,
-        active_center_count=active_center_count,
-        evacuee_count=evacuee_count,
-        family_count=family_count,
-        donation_count=donation_count,
-        pending_donation_count=pending_donation_count,
-        inventory_count=inventory_count,
-        expiring_inventory_count=expiring_inventory_count,
-        recent_users=recent_users,
-        recent_centers=recent_centers,
-        recent_evacuees=recent_evacuees,
-        recent_donations=recent_donations,
-        centers_data=centers_data
-    )
+        recent_users=stats.recent_users,
+        recent_evacuees=stats.recent_evacuees,
+        recent_donations=stats.recent_donations,
+        centers_data=stats.centers_data,
+        centers_at_capacity=stats.centers_at_capacity,
+        evacuee_status=stats.evacuee_status,
+        donation_types=stats.donation_types,
+        **stats.counters
+    ))
+    response.headers['Server-Timing'] = stats.server_timing()
+    return response
 
 # Evacuation Center Management
 @admin_bp.route('/centers')
 @login_required
 def centers():
-    centers = EvacuationCenter.query.all()
-    search_form = SearchForm()
+    search_term = request.args.get('query', '').strip()
+    search_form = SearchForm(query=search_term)
     form = EvacuationCenterForm()
 
-    if search_form.validate_on_submit():
-        search_term = search_form.query.data
-        centers = EvacuationCenter.query.filter(
-            EvacuationCenter.name.ilike(f'%{search_term}%') | 
-            EvacuationCenter.address.ilike(f'%{search_term}%')
-        ).all()
+    if search_term:
+        centers = search(EvacuationCenter, search_term, limit=None)
+    else:
+        centers = EvacuationCenter.query.all()
 
     return render_template('admin/centers.html', search_form=search_form, form=form, centers=centers)
 
@@ -124,6 +66,7 @@ def add_center():
             address=form.address.data,
             capacity=form.capacity.data,
             status=form.status.data,
+            accepts_special_needs=form.accepts_special_needs.data,
             contact_person=form.contact_person.data,
             contact_number=form.contact_number.data
         )
@@ -134,7 +77,8 @@ def add_center():
         flash('Evacuation center added successfully!', 'success')
         return redirect(url_for('admin.centers'))
 
-    return render_template('admin/centers.html', form=form, adding=True)
+    return render_template('admin/centers.html', search_form=SearchForm(), form=form,
+                           centers=EvacuationCenter.query.all(), adding=True)
 
 @admin_bp.route('/centers/edit/<int:center_id>', methods=['GET', 'POST'])
 @login_required
@@ -148,6 +92,7 @@ def edit_center(center_id):
         center.address = form.address.data
         center.capacity = form.capacity.data
         center.status = form.status.data
+        center.accepts_special_needs = form.accepts_special_needs.data
         center.contact_person = form.contact_person.data
         center.contact_number = form.contact_number.data
 
@@ -165,7 +110,7 @@ def delete_center(center_id):
     center = EvacuationCenter.query.get_or_404(center_id)
 
     # Check if center has evacuees
-    if center.evacuees:
+    if center.current_occupancy:
         flash('Cannot delete center with evacuees. Please relocate evacuees first.', 'danger')
         return redirect(url_for('admin.centers'))
 
@@ -175,32 +120,41 @@ def delete_center(center_id):
     flash('Evacuation center deleted successfully!', 'success')
     return redirect(url_for('admin.centers'))
 
-# Evacuee Management
-@admin_bp.route('/evacuees', methods=['GET', 'POST'])
+@admin_bp.route('/centers/place', methods=['POST'])
 @login_required
-def evacuees():
-    # Start with base query
-    query = Evacuee.query
-    search_form = SearchForm() #Added search form
+def place_unassigned():
+    # Every present evacuee with no center, or only the families posted as family_ids
+    family_ids = request.form.getlist('family_ids', type=int) or None
+    try:
+        report = place_evacuees(family_ids=family_ids)
+    except PlacementConflict:
+        flash('Some of these evacuees were just assigned by someone else. Nothing was changed; please try again.', 'danger')
+        return redirect(url_for('admin.centers'))
 
-    # Create both forms
-    evacuee_form = EvacueeForm()  # Form for the modal dialog
+    if request.accept_mimetypes.best == 'application/json':
+        return jsonify(report.as_dict())
+    if report.placed:
+        flash(f'{report.evacuees} evacuee(s) placed in {report.centers} center(s), families kept together.', 'success')
+    elif not report.unplaced:
+        flash('Nobody is waiting for a center.', 'info')
+    if report.unplaced:
+        flash(f'{len(report.unplaced)} family(ies) or lone evacuee(s) could not be placed: '
+              'no active center has room for them.', 'warning')
+    return redirect(url_for('admin.centers'))
 
-    # Load data for dropdowns
-    families = Family.query.all()
-    centers = EvacuationCenter.query.all()
+# Evacuee Management
+EVACUEE_SORTS = {
+    'created_at': Evacuee.created_at,
+    'first_name': Evacuee.first_name,
+    'last_name': Evacuee.last_name,
+}
 
-    # Load families and centers for form dropdowns
-    evacuee_form.family_id.choices = [(0, 'No Family')] + [(f.id, f.family_name) for f in families]
-    evacuee_form.evacuation_center_id.choices = [(c.id, c.name) for c in centers]
+def _filtered_evacuees():
+    query = Evacuee.query
 
     # Handle search query
     if request.args.get('query'):
-        search_term = request.args.get('query')
-        query = query.filter(
-            Evacuee.first_name.ilike(f'%{search_term}%') | 
-            Evacuee.last_name.ilike(f'%{search_term}%')
-        )
+        query = filter_query(query, Evacuee, request.args.get('query'))
 
     # Handle status filter
     if request.args.get('status'):
@@ -210,25 +164,69 @@ def evacuees():
     if request.args.get('center'):
         query = query.filter(Evacuee.evacuation_center_id == request.args.get('center'))
 
-    # Execute query
-    evacuees = query.all()
+    return query
+
+@admin_bp.route('/evacuees', methods=['GET', 'POST'])
+@login_required
+def evacuees():
+    search_form = SearchForm() #Added search form
+
+    # Create both forms
+    evacuee_form = EvacueeForm()  # Form for the modal dialog
+
+    # Centers for the filter dropdown; the form's family and center selects look records up on demand
+    centers = EvacuationCenter.query.all()
+
+    # First page only; DataTables fetches the rest from evacuees_data
+    page = paginate(with_loading(_filtered_evacuees(), 'evacuees'), Evacuee, EVACUEE_SORTS)
 
     return render_template('admin/evacuees.html', 
-                         evacuees=evacuees,
+                         evacuees=page.items,
+                         page=page,
                          form=evacuee_form,
                          search_form=search_form,
-                         families=families,
                          centers=centers)
 
+@admin_bp.route('/evacuees/data')
+@login_required
+def evacuees_data():
+    page = paginate(with_loading(_filtered_evacuees(), 'evacuees'), Evacuee, EVACUEE_SORTS)
+    return page_json(page, 'admin/_evacuee_rows.html')
+
+@admin_bp.route('/evacuees/export')
+@login_required
+def export_evacuees():
+    return csv_response(evacuee_rows(_filtered_evacuees()), EVACUEE_COLUMNS, 'evacuees')
+
+@admin_bp.route('/evacuees/import', methods=['GET', 'POST'])
+@login_required
+def import_evacuees():
+    form = EvacueeImportForm()
+    report = None
+
+    if form.validate_on_submit():
+        upload = form.file.data
+        try:
+            report = EvacueeImporter().run(upload.stream, upload.filename)
+        except ImportFileError as error:
+            # Rows read before the unreadable part are saved; show what was written
+            report = error.report
+            if request.accept_mimetypes.best == 'application/json':
+                return jsonify(report.as_dict() if report else {'file_error': str(error)}), 400
+            flash(str(error), 'danger')
+        else:
+            if request.accept_mimetypes.best == 'application/json':
+                return jsonify(report.as_dict())
+            flash(f'Imported {report.imported} of {report.rows} evacuee(s).',
+                  'warning' if report.errors else 'success')
+
+    return render_template('admin/import_evacuees.html', form=form, report=report)
+
 @admin_bp.route('/evacuees/add', methods=['GET', 'POST'])
 @login_required
 def add_evacuee():
     form = EvacueeForm()
 
-    # Populate dropdown options
-    form.evacuation_center_id.choices = [(c.id, c.name) for c in EvacuationCenter.query.filter_by(status='active').all()]
-    form.family_id.choices = [(0, 'None')] + [(f.id, f.family_name) for f in Family.query.all()]
-
     if form.validate_on_submit():
         family_id = form.family_id.data if form.family_id.data != 0 else None
 
@@ -247,6 +245,9 @@ def add_evacuee():
         db.session.commit()
 
         flash('Evacuee added successfully!', 'success')
+        if flag_duplicates([evacuee.id]):
+            flash(f'{evacuee.first_name} {evacuee.last_name} may already be registered; '
+                  'the possible duplicate is queued for an admin to review.', 'warning')
         return redirect(url_for('admin.evacuees'))
 
     return render_template('admin/evacuees.html', form=form, adding=True)
@@ -257,10 +258,6 @@ def edit_evacuee(evacuee_id):
     evacuee = Evacuee.query.get_or_404(evacuee_id)
     form = EvacueeForm(obj=evacuee)
 
-    # Populate dropdown options
-    form.evacuation_center_id.choices = [(c.id, c.name) for c in EvacuationCenter.query.filter_by(status='active').all()]
-    form.family_id.choices = [(0, 'None')] + [(f.id, f.family_name) for f in Family.query.all()]
-
     if form.validate_on_submit():
         evacuee.first_name = form.first_name.data
         evacuee.last_name = form.last_name.data
@@ -317,20 +314,69 @@ def delete_evacuee(evacuee_id):
     flash('Evacuee deleted successfully!', 'success')
     return redirect(url_for('admin.evacuees'))
 
+# Row dialogs are rendered on demand when opened (static/js/modals.js), not with the list
+@admin_bp.route('/evacuees/delete/<int:evacuee_id>/dialog')
+@login_required
+def delete_evacuee_modal(evacuee_id):
+    evacuee = Evacuee.query.get_or_404(evacuee_id)
+    is_head_of_family = Family.query.filter_by(head_of_family_id=evacuee_id).first() is not None
+    return render_template('admin/modals/delete_evacuee.html', evacuee=evacuee, is_head_of_family=is_head_of_family)
+
+# Possible duplicate registrations (services.dedup), most alike first
+DUPLICATE_SORTS = {
+    'score': DuplicateCandidate.score,
+    'created_at': DuplicateCandidate.created_at,
+}
+
+def _pending_duplicates():
+    return DuplicateCandidate.query.filter_by(status='pending')
+
+@admin_bp.route('/duplicates')
+@login_required
+def duplicates():
+    page = paginate(with_loading(_pending_duplicates(), 'duplicates'), DuplicateCandidate, DUPLICATE_SORTS, 'score')
+    return render_template('admin/duplicates.html', candidates=page.items, page=page)
+
+@admin_bp.route('/duplicates/data')
+@login_required
+def duplicates_data():
+    page = paginate(with_loading(_pending_duplicates(), 'duplicates'), DuplicateCandidate, DUPLICATE_SORTS, 'score')
+    return page_json(page, 'admin/_duplicate_rows.html')
+
+@admin_bp.route('/duplicates/<int:candidate_id>/merge', methods=['POST'])
+@login_required
+def merge_duplicate(candidate_id):
+    try:
+        kept = merge_evacuees(candidate_id, request.form.get('keep', type=int))
+    except DedupError as error:
+        flash(str(error), 'warning')
+    else:
+        flash(f'Records merged into {kept.first_name} {kept.last_name}.', 'success')
+    return redirect(url_for('admin.duplicates'))
+
+@admin_bp.route('/duplicates/<int:candidate_id>/dismiss', methods=['POST'])
+@login_required
+def dismiss_duplicate(candidate_id):
+    try:
+        dismiss_candidate(candidate_id)
+    except DedupError as error:
+        flash(str(error), 'warning')
+    else:
+        flash('Marked as different people.', 'success')
+    return redirect(url_for('admin.duplicates'))
+
 # Family Management
 @admin_bp.route('/families')
 @login_required
 def families():
-    families = Family.query.all()
-    search_form = SearchForm()
+    search_term = request.args.get('query', '').strip()
+    search_form = SearchForm(query=search_term)
     form = FamilyForm()  # For the add/edit modal
 
-    evacuees = Evacuee.query.all()
-    form.head_of_family_id.choices = [(0, 'None')] + [(e.id, f"{e.first_name} {e.last_name}") for e in evacuees]
-
-    if search_form.validate_on_submit():
-        search_term = search_form.query.data
-        families = Family.query.filter(Family.family_name.ilike(f'%{search_term}%')).all()
+    if search_term:
+        families = search(Family, search_term, limit=None, options=loading_options('families'))
+    else:
+        families = with_loading(Family.query, 'families').all()
 
     return render_template('admin/families.html', 
                          families=families, 
@@ -342,9 +388,6 @@ def families():
 def add_family():
     form = FamilyForm()
 
-    # Populate head of family dropdown options
-    form.head_of_family_id.choices = [(0, 'None')] + [(e.id, f"{e.first_name} {e.last_name}") for e in Evacuee.query.all()]
-
     if form.validate_on_submit():
         head_of_family_id = form.head_of_family_id.data if form.head_of_family_id.data != 0 else None
 
@@ -369,9 +412,6 @@ def edit_family(family_id):
     family = Family.query.get_or_404(family_id)
     form = FamilyForm(obj=family)
 
-    # Populate head of family dropdown options
-    form.head_of_family_id.choices = [(0, 'None')] + [(e.id, f"{e.first_name} {e.last_name}") for e in Evacuee.query.all()]
-
     if form.validate_on_submit():
         family.family_name = form.family_name.data
         family.head_of_family_id = form.head_of_family_id.data if form.head_of_family_id.data != 0 else None
@@ -391,6 +431,12 @@ def edit_family(family_id):
 
     return render_template('admin/edit_family.html', form=form, family=family)
 
+@admin_bp.route('/families/edit/<int:family_id>/dialog')
+@login_required
+def edit_family_modal(family_id):
+    family = Family.query.get_or_404(family_id)
+    return render_template('admin/modals/edit_family.html', form=FamilyForm(), family=family)
+
 @admin_bp.route('/families/delete/<int:family_id>', methods=['POST'])
 @login_required
 def delete_family(family_id):
@@ -406,26 +452,67 @@ def delete_family(family_id):
     flash('Family deleted successfully!', 'success')
     return redirect(url_for('admin.families'))
 
+@admin_bp.route('/families/delete/<int:family_id>/dialog')
+@login_required
+def delete_family_modal(family_id):
+    family = Family.query.get_or_404(family_id)
+    return render_template('admin/modals/delete_family.html', family=family, member_count=family.member_count)
+
 # Donation Management
+DONATION_SORTS = {
+    'created_at': Donation.created_at,
+    'description': Donation.description,
+    'quantity': Donation.quantity,
+}
+
+def _filtered_donations():
+    query = Donation.query
+
+    # Handle search
+    search_term = request.args.get('query')
+    if search_term:
+        query = filter_query(query, Donation, search_term)
+
+    # Handle type filter
+    donation_type = request.args.get('type')
+    if donation_type in ['food', 'non-food']:
+        query = query.filter(Donation.type == donation_type)
+
+    # Handle status filter
+    status = request.args.get('status')
+    if status in ['pending', 'received', 'distributed']:
+        query = query.filter(Donation.status == status)
+
+    return query
+
 @admin_bp.route('/donations')
 @login_required
 def donations():
-    donations = Donation.query.all()
     search_form = SearchForm()
     donation_form = DonationForm()  # Add this form for the modal
     
     # Load centers for dropdown
     donation_form.evacuation_center_id.choices = [(c.id, c.name) for c in EvacuationCenter.query.filter_by(status='active').all()]
 
-    if search_form.validate_on_submit():
-        search_term = search_form.query.data
-        donations = Donation.query.filter(Donation.description.ilike(f'%{search_term}%')).all()
+    page = paginate(with_loading(_filtered_donations(), 'donations'), Donation, DONATION_SORTS)
 
     return render_template('admin/donations.html', 
-                         donations=donations, 
+                         donations=page.items, 
+                         page=page,
                          search_form=search_form,
                          form=donation_form)  # Pass donation_form as form for the modal
 
+@admin_bp.route('/donations/data')
+@login_required
+def donations_data():
+    page = paginate(with_loading(_filtered_donations(), 'donations'), Donation, DONATION_SORTS)
+    return page_json(page, 'admin/_donation_rows.html')
+
+@admin_bp.route('/donations/export')
+@login_required
+def export_donations():
+    return csv_response(donation_rows(_filtered_donations()), DONATION_COLUMNS, 'donations')
+
 @admin_bp.route('/donations/add', methods=['GET', 'POST'])
 @login_required
 def add_donation():
@@ -446,22 +533,19 @@ def add_donation():
             status='received'  # Admin directly adds as received
         )
 
-        db.session.add(donation)
-        db.session.commit()
-
-        # Create inventory item from this donation
+        # Create inventory item from this donation, saved together with it
         inventory_item = InventoryItem(
             type=donation.type,
             description=donation.description,
             quantity=donation.quantity,
             unit=donation.unit,
             expiry_date=donation.expiry_date,
-            donation_id=donation.id,
+            donation=donation,
             evacuation_center_id=donation.evacuation_center_id,
             status='available'
         )
 
-        db.session.add(inventory_item)
+        db.session.add_all([donation, inventory_item])
         db.session.commit()
 
         flash('Donation added and inventory updated successfully!', 'success')
@@ -486,28 +570,19 @@ def update_donation_status(donation_id):
     return redirect(url_for('admin.donations'))
 
 # Inventory Management
-@admin_bp.route('/inventory')
-@login_required
-def inventory():
-    show_inventory = True  # We're in the inventory view
-    inventory_items = InventoryItem.query.all()
-    search_form = SearchForm()
-    form = InventoryItemForm()  # For the add/edit modal
-        
-    # Populate evacuation center choices
-    centers = EvacuationCenter.query.filter_by(status='active').all()
-    form.evacuation_center_id.choices = [(c.id, c.name) for c in centers]
+INVENTORY_SORTS = {
+    'created_at': InventoryItem.created_at,
+    'description': InventoryItem.description,
+    'quantity': InventoryItem.quantity,
+}
 
-    # Start with base query
-    query = InventoryItem.query if show_inventory else Donation.query
+def _filtered_inventory():
+    query = InventoryItem.query
 
     # Handle search
     search_term = request.args.get('query')
     if search_term:
-        query = query.filter(
-            InventoryItem.description.ilike(f'%{search_term}%') if show_inventory 
-            else Donation.description.ilike(f'%{search_term}%')
-        )
+        query = filter_query(query, InventoryItem, search_term)
 
     # Handle type filter
     item_type = request.args.get('type')
@@ -519,16 +594,39 @@ def inventory():
     if status:
         query = query.filter_by(status=status)
 
-    # Execute query
-    items = query.all()
+    return query
+
+@admin_bp.route('/inventory')
+@login_required
+def inventory():
+    search_form = SearchForm()
+    form = InventoryItemForm()  # For the add/edit modal
+        
+    # Populate evacuation center choices
+    centers = EvacuationCenter.query.filter_by(status='active').all()
+    form.evacuation_center_id.choices = [(c.id, c.name) for c in centers]
+
+    page = paginate(with_loading(_filtered_inventory(), 'inventory'), InventoryItem, INVENTORY_SORTS)
     
     return render_template('admin/donations.html',
-                         inventory_items=items if show_inventory else None,
-                         donations=items if not show_inventory else None,
+                         inventory_items=page.items,
+                         page=page,
                          search_form=search_form,
                          form=form,
+                         centers=centers,
                          show_inventory=True)
 
+@admin_bp.route('/inventory/data')
+@login_required
+def inventory_data():
+    page = paginate(with_loading(_filtered_inventory(), 'inventory'), InventoryItem, INVENTORY_SORTS)
+    return page_json(page, 'admin/_inventory_rows.html')
+
+@admin_bp.route('/inventory/export')
+@login_required
+def export_inventory():
+    return csv_response(inventory_rows(_filtered_inventory()), INVENTORY_COLUMNS, 'inventory')
+
 @admin_bp.route('/inventory/add', methods=['GET', 'POST'])
 @login_required
 def add_inventory_item():
@@ -589,6 +687,14 @@ def edit_inventory_item(item_id):
                          show_inventory=True,
                          centers=centers)  # Pass centers to the template
 
+@admin_bp.route('/inventory/edit/<int:item_id>/dialog')
+@login_required
+def edit_inventory_item_modal(item_id):
+    item = InventoryItem.query.get_or_404(item_id)
+    form = InventoryItemForm()
+    form.evacuation_center_id.choices = [(c.id, c.name) for c in EvacuationCenter.query.filter_by(status='active').all()]
+    return render_template('admin/modals/edit_inventory_item.html', form=form, item=item)
+
 @admin_bp.route('/inventory/delete/<int:item_id>', methods=['POST'])
 @login_required
 def delete_inventory_item(item_id):
@@ -600,23 +706,42 @@ def delete_inventory_item(item_id):
     flash('Inventory item deleted successfully!', 'success')
     return redirect(url_for('admin.inventory'))
 
+@admin_bp.route('/inventory/delete/<int:item_id>/dialog')
+@login_required
+def delete_inventory_item_modal(item_id):
+    item = InventoryItem.query.get_or_404(item_id)
+    return render_template('admin/modals/delete_inventory_item.html', item=item)
+
 # User Management
+USER_SORTS = {
+    'created_at': User.created_at,
+    'username': User.username,
+    'email': User.email,
+    'last_name': User.last_name,
+}
+
+def _filtered_users():
+    query = User.query
+
+    search_term = request.args.get('query')
+    if search_term:
+        query = filter_query(query, User, search_term)
+
+    return query
+
 @admin_bp.route('/users')
 @login_required
 def users():
-    users = User.query.all()
     search_form = SearchForm()
+    page = paginate(with_loading(_filtered_users(), 'users'), User, USER_SORTS)
 
-    if search_form.validate_on_submit():
-        search_term = search_form.query.data
-        users = User.query.filter(
-            User.username.ilike(f'%{search_term}%') | 
-            User.email.ilike(f'%{search_term}%') |
-            User.first_name.ilike(f'%{search_term}%') |
-            User.last_name.ilike(f'%{search_term}%')
-        ).all()
+    return render_template('admin/users.html', users=page.items, page=page, search_form=search_form)
 
-    return render_template('admin/users.html', users=users, search_form=search_form)
+@admin_bp.route('/users/data')
+@login_required
+def users_data():
+    page = paginate(with_loading(_filtered_users(), 'users'), User, USER_SORTS)
+    return page_json(page, 'admin/_user_rows.html')
 
 @admin_bp.route('/users/edit/<int:user_id>', methods=['GET', 'POST'])
 @login_required
@@ -661,4 +786,28 @@ def deactivate_user(user_id):
     db.session.commit()
 
     flash(f'User {user.username} has been deactivated!', 'success')
-    return redirect(url_for('admin.users'))
\ No newline at end of file
+    return redirect(url_for('admin.users'))
+
+@admin_bp.route('/users/deactivate/<int:user_id>/dialog')
+@login_required
+def deactivate_user_modal(user_id):
+    user = User.query.get_or_404(user_id)
+    return render_template('admin/modals/deactivate_user.html', user=user)
+
+@admin_bp.route('/perf')
+@login_required
+def perf():
+    # Figures of the worker process that answers this request (services/perf.py)
+    return render_template(
+        'admin/perf.html',
+        endpoints=perf_stats.endpoints(),
+        slow_queries=perf_stats.slow_log(),
+        slow_query_ms=current_app.config['PERF_SLOW_QUERY_MS']
+    )
+
+@admin_bp.route('/perf/reset', methods=['POST'])
+@login_required
+def reset_perf():
+    perf_stats.clear()
+    flash('Performance figures have been reset.', 'success')
+    return redirect(url_for('admin.perf'))
@@ -3,24 +3,24 @@ from flask_login import login_required, current_user
 from datetime import datetime
 
 from app import db
+from pagination import paginate, page_json
+from loading import with_loading
+from services.search import filter_query
 from models import Donation, EvacuationCenter
 from forms import DonationForm, SearchForm
+from permissions import allow_roles
 
 donor_bp = Blueprint('donor', __name__, url_prefix='/donor')
 
 @donor_bp.route('/dashboard')
+@allow_roles('donor')
 @login_required
 def dashboard():
-    # Ensure user is donor
-    if current_user.role != 'donor':
-        flash('Access denied. Donor privileges required.', 'danger')
-        return redirect(url_for('common.index'))
-    
     # Get count of donations made by this donor
     total_donations = Donation.query.filter_by(donor_id=current_user.id).count()
     
     # Get donation history for this donor
-    donation_history = Donation.query.filter_by(donor_id=current_user.id).order_by(Donation.created_at.desc()).all()
+    donation_history = with_loading(Donation.query, 'donor_donations').filter_by(donor_id=current_user.id).order_by(Donation.created_at.desc()).all()
     
     # Get active evacuation centers
     active_centers = EvacuationCenter.query.filter_by(status='active').all()
@@ -32,28 +32,43 @@ def dashboard():
         active_centers=active_centers
     )
 
-@donor_bp.route('/donations')
-@login_required
-def donations():
+DONATION_SORTS = {
+    'created_at': Donation.created_at,
+    'description': Donation.description,
+    'quantity': Donation.quantity,
+}
+
+def _filtered_donations():
     query = Donation.query.filter_by(donor_id=current_user.id)
     
     # Handle search query
     search_term = request.args.get('query', '').strip()
     if search_term:
-        query = query.filter(Donation.description.ilike(f'%{search_term}%'))
+        query = filter_query(query, Donation, search_term)
     
     # Handle type filter
     donation_type = request.args.get('type')
     if donation_type in ['food', 'non-food']:
         query = query.filter(Donation.type == donation_type)
-        
-    # Get results ordered by date
-    donations = query.order_by(Donation.created_at.desc()).all()
+    
+    return query
+
+@donor_bp.route('/donations')
+@login_required
+def donations():
+    # Get the first page of results ordered by date
+    page = paginate(with_loading(_filtered_donations(), 'donor_donations'), Donation, DONATION_SORTS)
     
     # Get active evacuation centers
     centers = EvacuationCenter.query.filter_by(status='active').all()
     
-    return render_template('donor/donations.html', donations=donations, centers=centers)    
+    return render_template('donor/donations.html', donations=page.items, page=page, centers=centers)    
+
+@donor_bp.route('/donations/data')
+@login_required
+def donations_data():
+    page = paginate(with_loading(_filtered_donations(), 'donor_donations'), Donation, DONATION_SORTS)
+    return page_json(page, 'donor/_donation_rows.html')
 
 @donor_bp.route('/donations/add', methods=['GET', 'POST'])
 @login_required
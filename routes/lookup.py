@@ -0,0 +1,51 @@
+from flask import Blueprint, jsonify, request
+from flask_login import login_required
+
+from models import Evacuee, Family, EvacuationCenter
+from services.search import filter_query, search
+
+lookup_bp = Blueprint('lookup', __name__, url_prefix='/lookup')
+
+# Typeahead endpoints behind the record selects (static/js/autocomplete.js).
+# Every response is bounded: at most LOOKUP_LIMIT matches, best first.
+LOOKUP_LIMIT = 20
+
+def _matches(model, term, query=None):
+    if term and query is None:
+        return search(model, term, limit=LOOKUP_LIMIT)
+    query = query if query is not None else model.query
+    if term:
+        query = filter_query(query, model, term)
+    # Without a term, the most recently added records (primary key order, no sort)
+    return query.order_by(model.id.desc()).limit(LOOKUP_LIMIT).all()
+
+def _evacuee_label(evacuee):
+    if evacuee.date_of_birth:
+        return f'{evacuee.full_name} (b. {evacuee.date_of_birth.year})'
+    return evacuee.full_name
+
+@lookup_bp.route('/evacuees')
+@login_required
+def evacuees():
+    results = _matches(Evacuee, request.args.get('q', '').strip())
+    return jsonify(results=[{'id': evacuee.id, 'text': _evacuee_label(evacuee)} for evacuee in results])
+
+@lookup_bp.route('/families')
+@login_required
+def families():
+    results = _matches(Family, request.args.get('q', '').strip())
+    return jsonify(results=[{'id': family.id, 'text': family.family_name} for family in results])
+
+@lookup_bp.route('/centers')
+@login_required
+def centers():
+    results = _matches(EvacuationCenter, request.args.get('q', '').strip())
+    return jsonify(results=[{'id': center.id, 'text': center.name} for center in results])
+
+@lookup_bp.route('/centers/active')
+@login_required
+def active_centers():
+    # Centers that can take new evacuees
+    query = EvacuationCenter.query.filter_by(status='active')
+    results = _matches(EvacuationCenter, request.args.get('q', '').strip(), query)
+    return jsonify(results=[{'id': center.id, 'text': center.name} for center in results])
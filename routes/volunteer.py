@@ -1,79 +1,65 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, request
+from flask import Blueprint, render_template, redirect, url_for, flash, request, make_response, jsonify
 from flask_login import login_required, current_user
-from datetime import datetime, timedelta
+from datetime import datetime
 
 from app import db
-from models import EvacuationCenter, Evacuee, Family, Donation, InventoryItem
-from forms import EvacueeForm, DonationForm, SearchForm
+from pagination import paginate, page_json
+from loading import with_loading
+from services.dashboard import DashboardStats
+from services.dedup import flag_duplicates
+from services.export import (csv_response, evacuee_rows, donation_rows, inventory_rows,
+                             EVACUEE_COLUMNS, DONATION_COLUMNS, INVENTORY_COLUMNS)
+from services.importer import EvacueeImporter, ImportFileError
+from services.search import filter_query
+from services import ledger
+from services.allocation import AllocationError, propose_transfers
+from services.roster import RosterConflict, set_evacuee_status
+from services.stock import StockConflict, receive_donations, distribute_items
+from models import EvacuationCenter, Evacuee, Family, Donation, InventoryItem, EVACUEE_STATUSES
+from forms import EvacueeForm, DonationForm, SearchForm, EvacueeImportForm
+from permissions import allow_roles
 
 volunteer_bp = Blueprint('volunteer', __name__, url_prefix='/volunteer')
 
 @volunteer_bp.route('/dashboard')
+@allow_roles('volunteer')
 @login_required
 def dashboard():
-    # Ensure user is volunteer
-    if current_user.role != 'volunteer':
-        flash('Access denied. Volunteer privileges required.', 'danger')
-        return redirect(url_for('common.index'))
-    
-    # Get summary data for dashboard
-    total_centers = EvacuationCenter.query.count()
-    total_evacuees = Evacuee.query.count()
-    total_donations = Donation.query.count()
-    
-    # Get recent activities relevant to volunteers
-    recent_evacuees = Evacuee.query.order_by(Evacuee.created_at.desc()).limit(5).all()
-    recent_donations = Donation.query.order_by(Donation.created_at.desc()).limit(5).all()
-    
-    # Get centers at capacity
-    centers_at_capacity = []
-    for center in EvacuationCenter.query.filter_by(status='active').all():
-        if center.current_occupancy >= center.capacity * 0.9:  # 90% or more capacity
-            centers_at_capacity.append(center)
-    
-    # Get soon-to-expire food items
-    expiring_food = InventoryItem.query.filter(
-        InventoryItem.type == 'food',
-        InventoryItem.expiry_date <= (datetime.now() + timedelta(days=7)).date(),
-        InventoryItem.expiry_date >= datetime.now().date(),
-        InventoryItem.status == 'available'
-    ).order_by(InventoryItem.expiry_date).all()
-
-    centers = EvacuationCenter.query.filter_by(status='active').all()
-    families = Family.query.all()
-    donations = Donation.query.order_by(Donation.created_at.desc()).limit(5).all()
-    return render_template(
+    # Summary counters come from the shared dashboard aggregate query
+    stats = DashboardStats().load_counters().load_centers().load_recent().load_expiring_food()
+    stats.log('volunteer')
+    
+    response = make_response(render_template(
         'volunteer/dashboard.html', 
-        total_centers=total_centers,
-        total_evacuees=total_evacuees,
-        total_donations=total_donations,
-        recent_evacuees=recent_evacuees,
-        recent_donations=recent_donations,
-        centers_at_capacity=centers_at_capacity,
-        expiring_food=expiring_food,
-        centers=centers,
-        families=families,
-        donations=donations,
+        total_centers=stats.counters['center_count'],
+        total_evacuees=stats.counters['evacuee_count'],
+        total_donations=stats.counters['donation_count'],
+        recent_evacuees=stats.recent_evacuees,
+        recent_donations=stats.recent_donations,
+        centers_at_capacity=[center for center in stats.centers_at_capacity if center['status'] == 'active'],
+        expiring_food=stats.expiring_food,
+        centers=stats.active_centers,
         now=datetime.now
-    )
+    ))
+    response.headers['Server-Timing'] = stats.server_timing()
+    return response
 
 # Evacuee Management for Volunteers
-@volunteer_bp.route('/evacuees')
-@login_required
-def evacuees():
+EVACUEE_SORTS = {
+    'created_at': Evacuee.created_at,
+    'first_name': Evacuee.first_name,
+    'last_name': Evacuee.last_name,
+}
+
+def _filtered_evacuees():
     query = request.args.get('query', '')
     status = request.args.get('status', '')
     center_id = request.args.get('center_id', '')
-    edit_id = request.args.get('edit', type=int)
     
     evacuees_query = Evacuee.query
     
     if query:
-        evacuees_query = evacuees_query.filter(
-            Evacuee.first_name.ilike(f'%{query}%') |
-            Evacuee.last_name.ilike(f'%{query}%') |
-            Evacuee.special_needs.ilike(f'%{query}%')
-        )
+        evacuees_query = filter_query(evacuees_query, Evacuee, query)
     
     if status:
         evacuees_query = evacuees_query.filter(Evacuee.status == status)
@@ -81,45 +67,50 @@ def evacuees():
     if center_id:
         evacuees_query = evacuees_query.filter(Evacuee.evacuation_center_id == center_id)
     
-    evacuees = evacuees_query.all()
-    centers = EvacuationCenter.query.all()
-    families = Family.query.all()
+    return evacuees_query
+
+@volunteer_bp.route('/evacuees')
+@login_required
+def evacuees():
+    edit_id = request.args.get('edit', type=int)
+    
+    page = paginate(with_loading(_filtered_evacuees(), 'evacuees'), Evacuee, EVACUEE_SORTS)
+    centers = EvacuationCenter.query.all()  # center filter dropdown
     search_form = SearchForm()
     
-    # Create form and populate choices
+    # Family and center selects look records up on demand (lookup blueprint)
     form = EvacueeForm()
-    form.evacuation_center_id.choices = [(c.id, c.name) for c in centers]
-    form.family_id.choices = [(0, 'No Family')] + [(f.id, f.family_name) for f in families]
     
     # If editing, populate form with evacuee data
     editing = None
     if edit_id:
         editing = Evacuee.query.get_or_404(edit_id)
         form = EvacueeForm(obj=editing)
-        form.evacuation_center_id.choices = [(c.id, c.name) for c in centers]
-        form.family_id.choices = [(0, 'No Family')] + [(f.id, f.family_name) for f in families]
-        if editing.family_id:
-            form.family_id.data = editing.family_id
-        else:
-            form.family_id.data = 0
     
     return render_template('volunteer/evacuees.html',
-                         evacuees=evacuees,
+                         evacuees=page.items,
+                         page=page,
                          centers=centers,
-                         families=families,
                          search_form=search_form,
                          form=form,
                          editing=editing)
 
+@volunteer_bp.route('/evacuees/data')
+@login_required
+def evacuees_data():
+    page = paginate(with_loading(_filtered_evacuees(), 'evacuees'), Evacuee, EVACUEE_SORTS)
+    return page_json(page, 'volunteer/_evacuee_rows.html')
+
+@volunteer_bp.route('/evacuees/export')
+@login_required
+def export_evacuees():
+    return csv_response(evacuee_rows(_filtered_evacuees()), EVACUEE_COLUMNS, 'evacuees')
+
 @volunteer_bp.route('/evacuees/add', methods=['GET', 'POST'])
 @login_required
 def add_evacuee():
     form = EvacueeForm()
     
-    # Populate dropdown options
-    form.evacuation_center_id.choices = [(c.id, c.name) for c in EvacuationCenter.query.filter_by(status='active').all()]
-    form.family_id.choices = [(0, 'None')] + [(f.id, f.family_name) for f in Family.query.all()]
-    
     if form.validate_on_submit():
         family_id = form.family_id.data if form.family_id.data != 0 else None
         
@@ -138,20 +129,44 @@ def add_evacuee():
         db.session.commit()
         
         flash('Evacuee added successfully!', 'success')
+        if flag_duplicates([evacuee.id]):
+            flash(f'{evacuee.first_name} {evacuee.last_name} may already be registered; '
+                  'the possible duplicate is queued for an admin to review.', 'warning')
         return redirect(url_for('volunteer.evacuees'))
     
     return render_template('volunteer/evacuees.html', form=form, adding=True)
 
+@volunteer_bp.route('/evacuees/import', methods=['GET', 'POST'])
+@login_required
+def import_evacuees():
+    form = EvacueeImportForm()
+    report = None
+    
+    if form.validate_on_submit():
+        upload = form.file.data
+        try:
+            # Volunteers can only register evacuees into active centers
+            report = EvacueeImporter(active_centers_only=True).run(upload.stream, upload.filename)
+        except ImportFileError as error:
+            # Rows read before the unreadable part are saved; show what was written
+            report = error.report
+            if request.accept_mimetypes.best == 'application/json':
+                return jsonify(report.as_dict() if report else {'file_error': str(error)}), 400
+            flash(str(error), 'danger')
+        else:
+            if request.accept_mimetypes.best == 'application/json':
+                return jsonify(report.as_dict())
+            flash(f'Imported {report.imported} of {report.rows} evacuee(s).',
+                  'warning' if report.errors else 'success')
+    
+    return render_template('volunteer/import_evacuees.html', form=form, report=report)
+
 @volunteer_bp.route('/evacuees/edit/<int:evacuee_id>', methods=['GET', 'POST'])
 @login_required
 def edit_evacuee(evacuee_id):
     evacuee = Evacuee.query.get_or_404(evacuee_id)
     form = EvacueeForm(obj=evacuee)
     
-    # Populate dropdown options
-    form.evacuation_center_id.choices = [(c.id, c.name) for c in EvacuationCenter.query.filter_by(status='active').all()]
-    form.family_id.choices = [(0, 'None')] + [(f.id, f.family_name) for f in Family.query.all()]
-    
     if form.validate_on_submit():
         evacuee.first_name = form.first_name.data
         evacuee.last_name = form.last_name.data
@@ -175,6 +190,13 @@ def edit_evacuee(evacuee_id):
     
     return render_template('volunteer/evacuees.html', form=form, editing=True, evacuee=evacuee)
 
+# Row dialogs are rendered on demand when opened (static/js/modals.js), not with the list
+@volunteer_bp.route('/evacuees/edit/<int:evacuee_id>/dialog')
+@login_required
+def edit_evacuee_modal(evacuee_id):
+    evacuee = Evacuee.query.get_or_404(evacuee_id)
+    return render_template('volunteer/modals/edit_evacuee.html', form=EvacueeForm(), evacuee=evacuee)
+
 @volunteer_bp.route('/evacuees/update_status/<int:evacuee_id>', methods=['POST'])
 @login_required
 def update_evacuee_status(evacuee_id):
@@ -191,108 +213,310 @@ def update_evacuee_status(evacuee_id):
     
     return redirect(url_for('volunteer.evacuees'))
 
-# Donation Management for Volunteers
-@volunteer_bp.route('/donations')
+@volunteer_bp.route('/evacuees/update_status', methods=['POST'])
 @login_required
-def donations():
+def bulk_update_status():
+    new_status = request.form.get('status')
+    center_id = request.form.get('center_id', type=int)
+    current_status = request.form.get('current_status') or None
+    back = redirect(url_for('volunteer.evacuees', center_id=center_id, status=current_status))
+    
+    if new_status not in EVACUEE_STATUSES:
+        flash('Invalid status!', 'danger')
+        return back
+    
+    # Either the ticked evacuees, or everyone in the center (with the status filtered on)
+    if request.form.get('scope') == 'center' and center_id:
+        picked = dict(center_id=center_id, current_status=current_status)
+    else:
+        evacuee_ids = request.form.getlist('evacuee_ids', type=int)
+        if not evacuee_ids:
+            flash('Select the evacuees to update first.', 'warning')
+            return back
+        picked = dict(evacuee_ids=evacuee_ids)
+    
+    try:
+        updated = set_evacuee_status(new_status, **picked)
+    except RosterConflict:
+        flash('Some of these evacuees were just updated by someone else. Nothing was changed; please try again.', 'danger')
+        return back
+    
+    if request.accept_mimetypes.best == 'application/json':
+        return jsonify(updated=updated, status=new_status)
+    flash(f'{updated} evacuee(s) marked {new_status}.', 'success')
+    return back
+
+@volunteer_bp.route('/evacuees/update_status/<int:evacuee_id>/dialog')
+@login_required
+def evacuee_status_modal(evacuee_id):
+    evacuee = Evacuee.query.get_or_404(evacuee_id)
+    return render_template('volunteer/modals/evacuee_status.html', evacuee=evacuee)
+
+# Donation Management for Volunteers
+DONATION_SORTS = {
+    'created_at': Donation.created_at,
+    'description': Donation.description,
+    'quantity': Donation.quantity,
+}
+
+INVENTORY_SORTS = {
+    'created_at': InventoryItem.created_at,
+    'description': InventoryItem.description,
+    'quantity': InventoryItem.quantity,
+}
+
+def _filtered_donations():
     query = Donation.query
     
     # Handle search query
     search_term = request.args.get('query')
     if search_term:
-        query = query.filter(Donation.description.ilike(f'%{search_term}%'))
+        query = filter_query(query, Donation, search_term)
     
     # Handle type filter
     donation_type = request.args.get('type')
     if donation_type in ['food', 'non-food']:
         query = query.filter(Donation.type == donation_type)
         
-         # Handle status filter
+    # Handle status filter
     status = request.args.get('status')
     if status in ['pending', 'received', 'distributed']:
         query = query.filter(Donation.status == status)
-        
-    # Get filtered donations and inventory items
-    donations = query.order_by(Donation.created_at.desc()).all()
-    inventory_items = InventoryItem.query.all()
     
-    return render_template('volunteer/donations.html', donations=donations, inventory_items=inventory_items)
-def donations():
-    donations = Donation.query.all()
-    inventory_items = InventoryItem.query.all()
-    form = SearchForm()
+    return query
 
-    if form.validate_on_submit():
-        search_term = form.query.data
-        donations = Donation.query.filter(
-            Donation.description.ilike(f'%{search_term}%')).all()
-        inventory_items = InventoryItem.query.filter(
-            InventoryItem.description.ilike(f'%{search_term}%')).all()
+def _filtered_inventory():
+    query = InventoryItem.query
+    
+    # The donations page filters both tables with the same search form
+    search_term = request.args.get('query')
+    if search_term:
+        query = filter_query(query, InventoryItem, search_term)
+    
+    item_type = request.args.get('type')
+    if item_type in ['food', 'non-food']:
+        query = query.filter(InventoryItem.type == item_type)
+    
+    status = request.args.get('status')
+    if status in ['available', 'distributed', 'expired']:
+        query = query.filter(InventoryItem.status == status)
+    
+    return query
 
+@volunteer_bp.route('/donations')
+@login_required
+def donations():
+    # Get the first page of filtered donations and inventory items
+    page = paginate(with_loading(_filtered_donations(), 'donations'), Donation, DONATION_SORTS)
+    inventory_page = paginate(with_loading(_filtered_inventory(), 'inventory'), InventoryItem, INVENTORY_SORTS)
+    
     return render_template('volunteer/donations.html',
-                           donations=donations,
-                           inventory_items=inventory_items,
-                           form=form)
+                         donations=page.items,
+                         page=page,
+                         inventory_items=inventory_page.items,
+                         inventory_page=inventory_page)
+
+@volunteer_bp.route('/donations/data')
+@login_required
+def donations_data():
+    page = paginate(with_loading(_filtered_donations(), 'donations'), Donation, DONATION_SORTS)
+    return page_json(page, 'volunteer/_donation_rows.html')
+
+@volunteer_bp.route('/inventory/data')
+@login_required
+def inventory_data():
+    page = paginate(with_loading(_filtered_inventory(), 'inventory'), InventoryItem, INVENTORY_SORTS)
+    return page_json(page, 'volunteer/_inventory_rows.html')
+
+@volunteer_bp.route('/donations/export')
+@login_required
+def export_donations():
+    return csv_response(donation_rows(_filtered_donations()), DONATION_COLUMNS, 'donations')
+
+@volunteer_bp.route('/inventory/export')
+@login_required
+def export_inventory():
+    return csv_response(inventory_rows(_filtered_inventory()), INVENTORY_COLUMNS, 'inventory')
 
 @volunteer_bp.route('/donations/receive/<int:donation_id>', methods=['POST'])
 @login_required
 def receive_donation(donation_id):
-    donation = Donation.query.get_or_404(donation_id)
+    Donation.query.get_or_404(donation_id)
     
-    if donation.status != 'pending':
+    try:
+        received, without_center = receive_donations([donation_id])
+    except StockConflict:
+        received, without_center = [], []
+    
+    if without_center:
+        flash('This donation has no evacuation center to stock it at; assign one before receiving it.', 'warning')
+    elif not received:
         flash('This donation has already been processed!', 'warning')
+    else:
+        flash('Donation received and added to inventory!', 'success')
+    return redirect(url_for('volunteer.donations'))
+
+@volunteer_bp.route('/donations/receive', methods=['POST'])
+@login_required
+def receive_selected():
+    donation_ids = request.form.getlist('donation_ids', type=int)
+    if not donation_ids:
+        flash('Select the donations to receive first.', 'warning')
         return redirect(url_for('volunteer.donations'))
     
-    donation.status = 'received'
-    
-    # Create inventory item from this donation
-    inventory_item = InventoryItem(
-        type=donation.type,
-        description=donation.description,
-        quantity=donation.quantity,
-        unit=donation.unit,
-        expiry_date=donation.expiry_date,
-        donation_id=donation.id,
-        evacuation_center_id=donation.evacuation_center_id,
-        status='available'
-    )
-    
-    db.session.add(inventory_item)
-    db.session.commit()
+    try:
+        received, without_center = receive_donations(donation_ids)
+    except StockConflict:
+        flash('Some of these donations were just processed by someone else. Nothing was changed; please try again.', 'danger')
+        return redirect(url_for('volunteer.donations'))
     
-    flash('Donation received and added to inventory!', 'success')
+    skipped = len(set(donation_ids)) - len(received) - len(without_center)
+    flash(f'{len(received)} donation(s) received and added to inventory.', 'success')
+    if without_center:
+        flash(f'{len(without_center)} donation(s) have no evacuation center to stock them at and were left pending.',
+              'warning')
+    if skipped:
+        flash(f'{skipped} donation(s) were already processed and were skipped.', 'warning')
     return redirect(url_for('volunteer.donations'))
 
 @volunteer_bp.route('/inventory/distribute/<int:item_id>', methods=['POST'])
 @login_required
 def distribute_inventory(item_id):
-    inventory_item = InventoryItem.query.get_or_404(item_id)
+    InventoryItem.query.get_or_404(item_id)
+    
+    try:
+        distributed = distribute_items([item_id])
+    except StockConflict:
+        distributed = []
     
-    if inventory_item.status != 'available':
+    if not distributed:
         flash('This item is not available for distribution!', 'warning')
+    else:
+        flash('Inventory item has been distributed!', 'success')
+    return redirect(url_for('volunteer.donations'))
+
+@volunteer_bp.route('/inventory/distribute', methods=['POST'])
+@login_required
+def distribute_selected():
+    item_ids = request.form.getlist('item_ids', type=int)
+    if not item_ids:
+        flash('Select the inventory items to distribute first.', 'warning')
         return redirect(url_for('volunteer.donations'))
     
-    inventory_item.status = 'distributed'
-    db.session.commit()
+    try:
+        distributed = distribute_items(item_ids)
+    except StockConflict:
+        flash('Some of these items were just changed by someone else. Nothing was changed; please try again.', 'danger')
+        return redirect(url_for('volunteer.donations'))
     
-    # If this item is from a donation, update the donation status too
-    if inventory_item.donation:
-        inventory_item.donation.status = 'distributed'
-        db.session.commit()
+    skipped = len(set(item_ids)) - len(distributed)
+    flash(f'{len(distributed)} inventory item(s) distributed.', 'success')
+    if skipped:
+        flash(f'{skipped} item(s) were not available and were skipped.', 'warning')
+    return redirect(url_for('volunteer.donations'))
+
+@volunteer_bp.route('/inventory/move/<int:item_id>', methods=['POST'])
+@login_required
+def move_inventory(item_id):
+    item = InventoryItem.query.get_or_404(item_id)
+    action = request.form.get('action')
+    quantity = request.form.get('quantity', type=int)
+    note = request.form.get('note', '').strip()[:200] or None
+    
+    try:
+        if action == 'distribute':
+            moved = ledger.distribute(item_id, quantity, note)
+            flash(f'Distributed {moved} {item.unit} of {item.description}.', 'success')
+        elif action == 'spoil':
+            moved = ledger.spoil(item_id, quantity, note)
+            flash(f'Wrote off {moved} {item.unit} of {item.description} as spoiled.', 'success')
+        elif action == 'transfer':
+            center = EvacuationCenter.query.get(request.form.get('center_id', type=int) or 0)
+            if center is None or center.status != 'active':
+                raise ledger.LedgerError('Choose an active evacuation center to transfer to.')
+            ledger.transfer(item_id, center.id, quantity, note)
+            flash(f'Transferred {quantity or item.quantity} {item.unit} of {item.description} to {center.name}.', 'success')
+        else:
+            flash('Invalid action!', 'danger')
+    except ledger.LedgerError as error:
+        flash(str(error), 'warning')
     
-    flash('Inventory item has been distributed!', 'success')
     return redirect(url_for('volunteer.donations'))
 
+@volunteer_bp.route('/inventory/move/<int:item_id>/dialog')
+@login_required
+def inventory_movement_modal(item_id):
+    item = InventoryItem.query.get_or_404(item_id)
+    centers = EvacuationCenter.query.filter(
+        EvacuationCenter.status == 'active', EvacuationCenter.id != item.evacuation_center_id
+    ).order_by(EvacuationCenter.name).all()
+    return render_template('volunteer/modals/inventory_movement.html', item=item, centers=centers)
+
+@volunteer_bp.route('/stock')
+@login_required
+def stock_levels():
+    centers = EvacuationCenter.query.filter_by(status='active').order_by(EvacuationCenter.name).all()
+    center = EvacuationCenter.query.get(request.args.get('center_id', type=int) or 0) or (centers[0] if centers else None)
+    
+    return render_template('volunteer/stock.html',
+                         centers=centers,
+                         center=center,
+                         levels=ledger.center_stock(center.id) if center else [],
+                         movements=ledger.recent_movements(center.id) if center else [])
+
+ALLOCATION_SHOWN = 500  # proposals listed at once; filter by center to see the rest
+
+@volunteer_bp.route('/stock/allocation')
+@login_required
+def allocation():
+    center_id = request.args.get('center_id', type=int)
+    try:
+        proposals = propose_transfers()
+    except AllocationError as error:
+        flash(str(error), 'danger')
+        return redirect(url_for('volunteer.stock_levels'))
+    if center_id:
+        proposals = [proposal for proposal in proposals
+                     if center_id in (proposal.from_center_id, proposal.to_center_id)]
+    
+    centers = EvacuationCenter.query.filter_by(status='active').order_by(EvacuationCenter.name).all()
+    return render_template('volunteer/allocation.html',
+                         proposals=proposals[:ALLOCATION_SHOWN],
+                         total=len(proposals),
+                         centers=centers,
+                         center_names={center.id: center.name for center in centers},
+                         center_id=center_id)
+
+@volunteer_bp.route('/stock/allocation/approve', methods=['POST'])
+@login_required
+def approve_allocation():
+    # Each ticked proposal is posted as "item id:destination center id:quantity"
+    moves = []
+    for value in request.form.getlist('moves'):
+        try:
+            moves.append(tuple(int(part) for part in value.split(':')))
+        except ValueError:
+            continue
+    moves = [move for move in moves if len(move) == 3]
+    if not moves:
+        flash('Select the transfers to approve first.', 'warning')
+        return redirect(url_for('volunteer.allocation'))
+    
+    try:
+        made = ledger.transfer_many(moves, note='allocation')
+    except ledger.LedgerError as error:
+        flash(f'{error} The stock changed since the plan was made; nothing was transferred. '
+              'Review the new plan and approve again.', 'warning')
+        return redirect(url_for('volunteer.allocation'))
+    
+    flash(f'{made} transfer(s) made.', 'success')
+    return redirect(url_for('volunteer.allocation'))
+
 @volunteer_bp.route('/inventory/report_expiring', methods=['GET'])
 @login_required
 def report_expiring():
-    # Get soon-to-expire food items
-    expiring_food = InventoryItem.query.filter(
-        InventoryItem.type == 'food',
-        InventoryItem.expiry_date <= (datetime.now() + timedelta(days=7)).date(),
-        InventoryItem.expiry_date >= datetime.now().date(),
-        InventoryItem.status == 'available'
-    ).order_by(InventoryItem.expiry_date).all()
+    # Soon-to-expire food, from the precomputed watchlist the dashboard also shows
+    expiring_food = DashboardStats().load_expiring_food().expiring_food
     
     return render_template('volunteer/donations.html', 
                           expiring_food=expiring_food,
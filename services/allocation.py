@@ -0,0 +1,315 @@
+"""Fair allocation of relief stock across centers, proposed as transfers.
+
+``propose_transfers`` loads the active centers, the people present in each by
+age bracket (from ``Evacuee.date_of_birth``) and every available inventory
+line into NumPy arrays, and works out in one vectorised pass which stock
+should move where:
+
+* the need of a center for an item is its headcount weighted by age bracket
+  (``NEED_WEIGHTS``; infant goods count only infants and small children);
+* each item's total stock is shared out in proportion to need, no center
+  getting more than ``max_share`` of it; what a capped center does not take
+  is shared out again among the others (water-filling), and the shares are
+  rounded to whole units keeping the total;
+* centers holding more than their share by over ``tolerance`` send the
+  difference to centers short by as much, largest surplus to largest
+  shortage, so stock that is roughly where it belongs stays put;
+* each center sends its earliest-expiring lines first.
+
+The result is a list of ``TransferProposal``, one per line and destination,
+which coordinators approve in bulk; approved proposals are carried out with
+``services.ledger.transfer_many`` in one transaction. Nothing is written
+here.
+
+NumPy is an optional dependency (``pip install numpy``); without it
+``AllocationError`` says so. ``flask benchmark-allocation`` times the
+planning pass on synthetic data.
+"""
+from collections import namedtuple
+from datetime import date, timedelta
+from time import perf_counter
+
+from sqlalchemy import case, func, select
+
+from app import db
+from models import EvacuationCenter, Evacuee, InventoryItem, stock_item_key
+
+# Upper age limit of each bracket (the last has none)
+AGE_BRACKETS = (('infant', 2), ('child', 13), ('adult', 60), ('senior', None))
+# Need per person in each bracket, by item type; unknown ages count as adults
+NEED_WEIGHTS = {
+    'food': (0.5, 0.75, 1.0, 0.9),
+    'non-food': (1.0, 1.0, 1.0, 1.0),
+}
+# Items needed by the youngest only, recognised by their description
+INFANT_ITEMS = ('diaper', 'formula', 'baby', 'infant')
+INFANT_WEIGHTS = (1.0, 0.25, 0.0, 0.0)
+
+DEFAULT_MAX_SHARE = 0.5
+DEFAULT_TOLERANCE = 0.2
+NO_EXPIRY = 2 ** 31  # sorts lines without an expiry date after every dated one
+
+TransferProposal = namedtuple('TransferProposal', 'item_id from_center_id to_center_id item unit quantity expiry_date')
+
+
+class AllocationError(RuntimeError):
+    """The allocation cannot be computed (NumPy missing)."""
+
+
+def _numpy():
+    try:
+        import numpy
+    except ImportError:
+        raise AllocationError('Planning allocations requires the numpy package (pip install numpy).')
+    return numpy
+
+
+class AllocationSnapshot:
+    """The arrays an allocation is computed from.
+
+    ``heads`` is centers x age brackets, ``weights`` items x age brackets;
+    the ``line_*`` arrays describe each available inventory line, its center
+    and item given as indexes into ``center_ids`` and ``items``.
+    """
+
+    def __init__(self, center_ids, heads, items, weights, line_ids, line_centers, line_items, line_quantities,
+                 line_expiry):
+        self.center_ids = center_ids
+        self.heads = heads
+        self.items = items  # (item key, unit)
+        self.weights = weights
+        self.line_ids = line_ids
+        self.line_centers = line_centers
+        self.line_items = line_items
+        self.line_quantities = line_quantities
+        self.line_expiry = line_expiry  # days since 1970-01-01, NO_EXPIRY when there is none
+
+
+def need_weights(item, item_type):
+    if any(word in item for word in INFANT_ITEMS):
+        return INFANT_WEIGHTS
+    return NEED_WEIGHTS.get(item_type, NEED_WEIGHTS['non-food'])
+
+
+def load_snapshot(today=None):
+    """Read the centers, their people by age bracket and the available stock into an ``AllocationSnapshot``."""
+    np = _numpy()
+    today = today or date.today()
+    center_ids = np.array(db.session.scalars(
+        select(EvacuationCenter.id).where(EvacuationCenter.status == 'active').order_by(EvacuationCenter.id)
+    ).all(), dtype=np.int64)
+    center_index = {center_id: index for index, center_id in enumerate(center_ids.tolist())}
+
+    # People present per center, counted by age bracket in the database
+    adult = [name for name, limit in AGE_BRACKETS].index('adult')
+    bracket = case(
+        (Evacuee.date_of_birth.is_(None), adult),
+        *[(Evacuee.date_of_birth > today - timedelta(days=round(limit * 365.25)), index)
+          for index, (name, limit) in enumerate(AGE_BRACKETS) if limit is not None],
+        else_=len(AGE_BRACKETS) - 1,
+    )
+    heads = np.zeros((len(center_ids), len(AGE_BRACKETS)))
+    for center_id, *counts in db.session.execute(
+        select(Evacuee.evacuation_center_id,
+               *[func.sum(case((bracket == index, 1), else_=0)) for index in range(len(AGE_BRACKETS))])
+        .where(Evacuee.status == 'present', Evacuee.evacuation_center_id.isnot(None))
+        .group_by(Evacuee.evacuation_center_id)
+    ):
+        if center_id in center_index:
+            heads[center_index[center_id]] = counts
+
+    lines = db.session.execute(
+        select(InventoryItem.id, InventoryItem.evacuation_center_id, InventoryItem.description, InventoryItem.unit,
+               InventoryItem.type, InventoryItem.quantity, InventoryItem.expiry_date)
+        .where(InventoryItem.status == 'available', InventoryItem.quantity > 0)
+        .order_by(InventoryItem.id)
+    ).all()
+    items = {}
+    weights = []
+    line_ids, line_centers, line_items, line_quantities, line_expiry = [], [], [], [], []
+    epoch = date(1970, 1, 1)
+    for item_id, center_id, description, unit, item_type, quantity, expiry_date in lines:
+        if center_id not in center_index:
+            continue  # stock at closed centers is not shared out
+        key = (stock_item_key(description), unit)
+        if key not in items:
+            items[key] = len(items)
+            weights.append(need_weights(key[0], item_type))
+        line_ids.append(item_id)
+        line_centers.append(center_index[center_id])
+        line_items.append(items[key])
+        line_quantities.append(quantity)
+        line_expiry.append((expiry_date - epoch).days if expiry_date else NO_EXPIRY)
+
+    return AllocationSnapshot(
+        center_ids, heads, list(items), np.array(weights, dtype=float).reshape(len(items), len(AGE_BRACKETS)),
+        np.array(line_ids, dtype=np.int64), np.array(line_centers, dtype=np.int64),
+        np.array(line_items, dtype=np.int64), np.array(line_quantities, dtype=np.int64),
+        np.array(line_expiry, dtype=np.int64),
+    )
+
+
+def capped_shares(supply, need, max_share):
+    """Share each column's ``supply`` out over the rows in proportion to ``need``, capped per row.
+
+    No row gets more than ``max_share`` of a column's supply (at least an
+    equal split among the rows with any need, so the supply is always used
+    up); what capped rows cannot take goes to the others in proportion to
+    their need. Columns nobody needs get nothing.
+    """
+    np = _numpy()
+    needing = need > 0
+    cap = supply * np.maximum(max_share, 1 / np.maximum(needing.sum(axis=0), 1))
+    shares = np.zeros(need.shape)
+    remaining = supply.astype(float)
+    active = needing.copy()
+    for _ in range(need.shape[0]):
+        weights = np.where(active, need, 0.0)
+        total = weights.sum(axis=0)
+        proposed = np.divide(remaining * weights, total, out=np.zeros(need.shape), where=total > 0)
+        over = active & (proposed > cap)
+        if not over.any():
+            shares += proposed
+            break
+        # Rows over their cap get exactly the cap and drop out of the next round
+        capped = np.where(over, cap, 0.0)
+        shares += capped
+        remaining -= capped.sum(axis=0)
+        active &= ~over
+    return shares
+
+
+def whole_units(shares, totals):
+    """Round ``shares`` to integers whose columns still add up to ``totals`` (largest remainders first)."""
+    np = _numpy()
+    floors = np.floor(shares + 1e-9).astype(np.int64)
+    left = totals - floors.sum(axis=0)
+    order = np.argsort(floors - shares, axis=0, kind='stable')  # largest fraction first
+    ranks = np.empty_like(order)
+    np.put_along_axis(ranks, order, np.arange(shares.shape[0])[:, None], axis=0)
+    return floors + (ranks < left)
+
+
+def _pair_up(groups_a, lengths_a, groups_b, lengths_b, group_count):
+    """Lay two sequences of lengths end to end within each group and pair up their overlaps.
+
+    Both sequences must be sorted by group. Returns ``(index in a, index in
+    b, overlap)`` arrays; where a group's totals differ, the excess of the
+    longer side is left unpaired.
+    """
+    np = _numpy()
+    if not len(lengths_a) or not len(lengths_b):
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty, empty
+    totals_a = np.bincount(groups_a, lengths_a, group_count).astype(np.int64)
+    totals_b = np.bincount(groups_b, lengths_b, group_count).astype(np.int64)
+    offsets = np.concatenate(([0], np.cumsum(np.maximum(totals_a, totals_b))[:-1]))
+
+    def starts(groups, lengths, totals):
+        before = np.cumsum(lengths) - lengths  # start within the whole sequence
+        return offsets[groups] + before - (np.cumsum(totals) - totals)[groups]
+
+    start_a = starts(groups_a, lengths_a, totals_a)
+    start_b = starts(groups_b, lengths_b, totals_b)
+    points = np.sort(np.concatenate((start_a, start_a + lengths_a, start_b, start_b + lengths_b)))
+    points = points[np.concatenate(([True], points[1:] != points[:-1]))]
+    lower, upper = points[:-1], points[1:]
+    in_a = np.searchsorted(start_a, lower, side='right') - 1
+    in_b = np.searchsorted(start_b, lower, side='right') - 1
+    covered = ((in_a >= 0) & (in_b >= 0))
+    in_a, in_b = np.maximum(in_a, 0), np.maximum(in_b, 0)
+    covered &= (lower < start_a[in_a] + lengths_a[in_a]) & (lower < start_b[in_b] + lengths_b[in_b])
+    return in_a[covered], in_b[covered], (upper - lower)[covered]
+
+
+def plan_allocation(snapshot, max_share=DEFAULT_MAX_SHARE, tolerance=DEFAULT_TOLERANCE):
+    """Transfers that bring every center to its fair share; returns arrays (line index, destination index, quantity).
+
+    Pure computation over ``snapshot``; see the module docstring for the rules.
+    """
+    np = _numpy()
+    center_count, item_count = len(snapshot.center_ids), len(snapshot.items)
+    empty = np.zeros(0, dtype=np.int64)
+    if not center_count or not item_count:
+        return empty, empty, empty
+
+    need = snapshot.heads @ snapshot.weights.T  # centers x items
+    held = np.bincount(snapshot.line_centers * item_count + snapshot.line_items, snapshot.line_quantities,
+                       center_count * item_count).astype(np.int64).reshape(center_count, item_count)
+    supply = held.sum(axis=0)
+    target = whole_units(capped_shares(supply, need, max_share), supply)
+    target = np.where(need.sum(axis=0) > 0, target, held)  # stock nobody needs stays where it is
+
+    # Only differences beyond the tolerance (and at least one unit) are worth moving
+    band = np.maximum(tolerance * target, 1)
+    surplus = np.where(held - target >= band, held - target, 0)
+    shortage = np.where(target - held >= band, target - held, 0)
+
+    # Senders and receivers per item, largest amounts first; each sender's excess goes out in that order
+    def largest_first(amounts):
+        items, centers = np.nonzero(amounts.T)
+        order = np.lexsort((-amounts.T[items, centers], items))
+        return items[order], centers[order], amounts.T[items[order], centers[order]]
+
+    send_items, send_centers, send_amounts = largest_first(surplus)
+    receive_items, receive_centers, receive_amounts = largest_first(shortage)
+    sent, received, amounts = _pair_up(send_items, send_amounts, receive_items, receive_amounts, item_count)
+    if not len(amounts):
+        return empty, empty, empty
+    from_centers, to_centers, items = send_centers[sent], receive_centers[received], send_items[sent]
+
+    # Take each transfer from the sending center's lines of the item, earliest expiry first
+    transfer_order = np.lexsort((from_centers, items))
+    from_centers, to_centers, items, amounts = (array[transfer_order]
+                                                for array in (from_centers, to_centers, items, amounts))
+    line_order = np.lexsort((snapshot.line_ids, snapshot.line_expiry, snapshot.line_centers, snapshot.line_items))
+    line_groups = snapshot.line_items[line_order] * center_count + snapshot.line_centers[line_order]
+    transfers, lines, quantities = _pair_up(items * center_count + from_centers, amounts,
+                                            line_groups, snapshot.line_quantities[line_order],
+                                            item_count * center_count)
+    return line_order[lines], to_centers[transfers], quantities
+
+
+def propose_transfers(max_share=DEFAULT_MAX_SHARE, tolerance=DEFAULT_TOLERANCE, today=None):
+    """Transfer proposals for the stock on hand now, as ``TransferProposal`` ordered by item and center."""
+    snapshot = load_snapshot(today)
+    lines, destinations, quantities = plan_allocation(snapshot, max_share, tolerance)
+    epoch = date(1970, 1, 1)
+    proposals = []
+    for line, destination, quantity in zip(lines.tolist(), destinations.tolist(), quantities.tolist()):
+        item, unit = snapshot.items[snapshot.line_items[line]]
+        expiry = int(snapshot.line_expiry[line])
+        proposals.append(TransferProposal(
+            int(snapshot.line_ids[line]), int(snapshot.center_ids[snapshot.line_centers[line]]),
+            int(snapshot.center_ids[destination]), item, unit, quantity,
+            epoch + timedelta(days=expiry) if expiry != NO_EXPIRY else None,
+        ))
+    proposals.sort(key=lambda proposal: (proposal.item, proposal.unit, proposal.from_center_id,
+                                         proposal.to_center_id, proposal.item_id))
+    return proposals
+
+
+def synthetic_snapshot(centers, items, lines_per_item=4, seed=0):
+    """A random ``AllocationSnapshot`` of the given size, for benchmarking."""
+    np = _numpy()
+    random = np.random.default_rng(seed)
+    line_count = items * lines_per_item
+    return AllocationSnapshot(
+        np.arange(1, centers + 1), random.poisson(60, (centers, len(AGE_BRACKETS))).astype(float),
+        [(f'item {index}', 'pcs') for index in range(items)],
+        random.choice([NEED_WEIGHTS['food'], NEED_WEIGHTS['non-food'], INFANT_WEIGHTS], items),
+        np.arange(1, line_count + 1), random.integers(0, centers, line_count),
+        np.repeat(np.arange(items), lines_per_item), random.integers(1, 500, line_count),
+        random.integers(19000, 21000, line_count),
+    )
+
+
+def benchmark_allocation(centers, items, repeat=5, seed=0):
+    """Time ``plan_allocation`` on synthetic data; returns (seconds per run, transfers proposed)."""
+    snapshot = synthetic_snapshot(centers, items, seed=seed)
+    timings = []
+    for _ in range(repeat):
+        started = perf_counter()
+        lines, destinations, quantities = plan_allocation(snapshot)
+        timings.append(perf_counter() - started)
+    return timings, len(quantities)
@@ -0,0 +1,119 @@
+"""Page weight and render time of the list views at increasing data volumes.
+
+``flask benchmark-pages`` tops the evacuee table up to each requested number of
+rows with synthetic records, requests the list pages, their JSON data
+endpoints and a row dialog through the test client as an admin and as a
+volunteer, and reports the response size and median time of each. The
+synthetic rows are deleted again when the run ends.
+
+Endpoints missing from the running code are skipped, so the same run can be
+repeated on an older checkout for a before/after comparison.
+"""
+from datetime import datetime
+from statistics import median
+from time import perf_counter
+
+from sqlalchemy import delete, func, insert, select
+
+from app import app, db
+from models import EvacuationCenter, Evacuee, User, mark_tables_changed
+
+DEFAULT_SCALES = (1000, 10000, 50000)
+INSERT_CHUNK = 5000
+SYNTHETIC_NAME = 'Benchmark'  # first_name of the generated evacuees
+STATUSES = ('present', 'present', 'present', 'relocated', 'missing')
+
+# (role, endpoint, whether the endpoint takes the id of an evacuee)
+PAGES = (
+    ('admin', 'admin.evacuees', False),
+    ('admin', 'admin.evacuees_data', False),
+    ('admin', 'admin.delete_evacuee_modal', True),
+    ('admin', 'admin.inventory', False),
+    ('admin', 'admin.users', False),
+    ('volunteer', 'volunteer.evacuees', False),
+    ('volunteer', 'volunteer.evacuees_data', False),
+    ('volunteer', 'volunteer.edit_evacuee_modal', True),
+)
+
+
+def _url(endpoint, evacuee_id):
+    # Built against the url map directly so the run needs no request context
+    adapter = app.url_map.bind('localhost')
+    return adapter.build(endpoint, {'evacuee_id': evacuee_id} if evacuee_id else {})
+
+
+def logged_in_client(user):
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = user.get_id()
+        session['_fresh'] = True
+    return client
+
+
+def _fill_evacuees(total, center_id):
+    """Insert synthetic evacuees until the table holds ``total`` rows."""
+    missing = total - db.session.scalar(select(func.count(Evacuee.id)))
+    first_id = (db.session.scalar(select(func.max(Evacuee.id))) or 0) + 1
+    stamp = datetime.now()
+    added = 0
+    while added < missing:
+        size = min(INSERT_CHUNK, missing - added)
+        db.session.execute(insert(Evacuee), [
+            {
+                'first_name': SYNTHETIC_NAME,
+                'last_name': f'Evacuee {first_id + added + offset}',
+                'status': STATUSES[(added + offset) % len(STATUSES)],
+                'evacuation_center_id': center_id,
+                'created_at': stamp,
+                'updated_at': stamp,
+            }
+            for offset in range(size)
+        ])
+        added += size
+    mark_tables_changed(db.session, Evacuee.__tablename__)
+    db.session.commit()
+
+
+def _measure(client, url, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = perf_counter()
+        response = client.get(url)
+        timings.append((perf_counter() - start) * 1000)
+    return response.status_code, len(response.get_data()), median(timings)
+
+
+def benchmark_pages(scales=DEFAULT_SCALES, repeat=5):
+    """Yield one result dict per (scale, page) as it is measured."""
+    users = {
+        role: User.query.filter_by(role=role, is_active=True).order_by(User.id).first()
+        for role in ('admin', 'volunteer')
+    }
+    clients = {role: logged_in_client(user) for role, user in users.items() if user}
+
+    center = EvacuationCenter.query.order_by(EvacuationCenter.id).first()
+    created_center = center is None
+    if created_center:
+        center = EvacuationCenter(name=f'{SYNTHETIC_NAME} Center', address='-', capacity=0, status='active')
+        db.session.add(center)
+        db.session.commit()
+    center_id = center.id
+    last_id = db.session.scalar(select(func.max(Evacuee.id))) or 0
+
+    try:
+        for total in sorted(scales):
+            _fill_evacuees(total, center_id)
+            evacuee_id = db.session.scalar(select(func.max(Evacuee.id)))
+            for role, endpoint, takes_id in PAGES:
+                if role not in clients or endpoint not in app.view_functions:
+                    continue
+                url = _url(endpoint, evacuee_id if takes_id else None)
+                status, size, ms = _measure(clients[role], url, repeat)
+                yield {'rows': total, 'role': role, 'url': url, 'status': status, 'bytes': size, 'ms': ms}
+    finally:
+        db.session.rollback()
+        db.session.execute(delete(Evacuee).where(Evacuee.id > last_id, Evacuee.first_name == SYNTHETIC_NAME))
+        mark_tables_changed(db.session, Evacuee.__tablename__)
+        if created_center:
+            db.session.delete(db.session.get(EvacuationCenter, center_id))
+        db.session.commit()
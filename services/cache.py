@@ -0,0 +1,188 @@
+"""Versioned cache for dashboard and summary data.
+
+Every cached entry declares the tables it was computed from. Its key embeds
+the current version counter of each of those tables, and the session hooks in
+``models.py`` bump the counters of the tables a transaction touched once it
+commits. A commit therefore invalidates exactly the entries that read from the
+changed tables; stale entries are never looked up again and age out.
+
+Two backends are available:
+
+* ``lru``    - in-process LRU, for a single process (development server)
+* ``sqlite`` - a small SQLite file shared by every gunicorn worker on the host
+
+Select one with the ``STATS_CACHE_BACKEND`` setting (environment variable of
+the same name); ``STATS_CACHE_PATH`` overrides where the SQLite file lives.
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_TTL = 300  # seconds; bounds staleness if a write bypasses the session hooks
+DEFAULT_MAX_ENTRIES = 512
+
+
+class LRUCacheBackend:
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False, None
+            expires_at, value = entry
+            if expires_at < time.time():
+                del self._entries[key]
+                return False, None
+            self._entries.move_to_end(key)
+            return True, value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (time.time() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def versions(self, tables):
+        with self._lock:
+            return {table: self._versions.get(table, 0) for table in tables}
+
+    def bump(self, tables):
+        with self._lock:
+            for table in tables:
+                self._versions[table] = self._versions.get(table, 0) + 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class SQLiteCacheBackend:
+    """Cache and version counters in one SQLite file, safe across worker processes."""
+
+    def __init__(self, path, max_entries=DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._local = threading.local()
+
+    def _connection(self):
+        # One connection per thread, reopened after a fork (gunicorn --preload)
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS cache_entry '
+                '(key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL NOT NULL)'
+            )
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS table_version '
+                '(name TEXT PRIMARY KEY, version INTEGER NOT NULL)'
+            )
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def get(self, key):
+        row = self._connection().execute(
+            'SELECT value, expires_at FROM cache_entry WHERE key = ?', (key,)
+        ).fetchone()
+        if row is None or row[1] < time.time():
+            return False, None
+        return True, pickle.loads(row[0])
+
+    def set(self, key, value, ttl):
+        connection = self._connection()
+        now = time.time()
+        connection.execute(
+            'INSERT OR REPLACE INTO cache_entry (key, value, expires_at) VALUES (?, ?, ?)',
+            (key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL), now + ttl)
+        )
+        connection.execute('DELETE FROM cache_entry WHERE expires_at < ?', (now,))
+        connection.execute(
+            'DELETE FROM cache_entry WHERE key NOT IN '
+            '(SELECT key FROM cache_entry ORDER BY expires_at DESC LIMIT ?)', (self.max_entries,)
+        )
+
+    def versions(self, tables):
+        tables = list(tables)
+        placeholders = ', '.join('?' for _ in tables)
+        rows = self._connection().execute(
+            f'SELECT name, version FROM table_version WHERE name IN ({placeholders})', tables
+        ).fetchall()
+        found = dict(rows)
+        return {table: found.get(table, 0) for table in tables}
+
+    def bump(self, tables):
+        connection = self._connection()
+        with connection:
+            connection.execute('BEGIN IMMEDIATE')
+            connection.executemany(
+                'INSERT INTO table_version (name, version) VALUES (?, 1) '
+                'ON CONFLICT(name) DO UPDATE SET version = version + 1',
+                [(table,) for table in tables]
+            )
+
+    def clear(self):
+        self._connection().execute('DELETE FROM cache_entry')
+
+
+class StatsCache:
+    def __init__(self, backend=None):
+        self.backend = backend or LRUCacheBackend()
+        self.default_ttl = DEFAULT_TTL
+
+    def init_app(self, app):
+        kind = app.config.setdefault('STATS_CACHE_BACKEND', os.environ.get('STATS_CACHE_BACKEND', 'sqlite'))
+        self.default_ttl = app.config.setdefault('STATS_CACHE_TTL', DEFAULT_TTL)
+        if kind == 'sqlite':
+            path = app.config.setdefault(
+                'STATS_CACHE_PATH',
+                os.environ.get('STATS_CACHE_PATH', os.path.join(app.instance_path, 'stats_cache.db'))
+            )
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            self.backend = SQLiteCacheBackend(path)
+        elif kind == 'lru':
+            self.backend = LRUCacheBackend()
+        else:
+            raise ValueError(f'Unknown STATS_CACHE_BACKEND {kind!r}')
+        app.extensions['stats_cache'] = self
+
+    def key(self, name, tables):
+        versions = self.backend.versions(sorted(tables))
+        return name + '|' + '|'.join(f'{table}={version}' for table, version in versions.items())
+
+    def get_or_set(self, name, tables, compute, ttl=None):
+        """Return the cached value of ``name`` for the current versions of ``tables``.
+
+        ``compute`` is only called on a miss; its result must be picklable plain
+        data (no ORM instances, which are bound to the session that loaded them).
+        """
+        # Versions are read before computing: a write that commits meanwhile bumps
+        # them, so the value stored here is never served for the newer data.
+        key = self.key(name, tables)
+        found, value = self.backend.get(key)
+        if found:
+            return value
+        value = compute()
+        self.backend.set(key, value, ttl or self.default_ttl)
+        return value
+
+    def bump(self, tables):
+        if tables:
+            self.backend.bump(sorted(tables))
+
+    def clear(self):
+        self.backend.clear()
+
+
+stats_cache = StatsCache()
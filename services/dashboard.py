@@ -0,0 +1,215 @@
+"""Dashboard statistics shared by the admin and volunteer dashboards.
+
+Every counter on the dashboards comes from a single statement that joins one
+conditional-aggregation subquery per table (``SUM(CASE ...)``), so a dashboard
+render costs one round trip for the numbers plus a few small list queries.
+Each query is timed; the timings are sent as a ``Server-Timing`` header and
+logged so dashboard latency can be watched under load.
+
+The counters, the center snapshot and the expiring-food watchlist are plain
+data, so they are kept in the versioned stats cache (``services.cache``) and
+only recomputed after a commit touches one of the tables they read. The expiry
+sweeper (``services.expiry``) rebuilds the watchlist right after it runs.
+"""
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import case, func, select, true
+
+from app import db
+from services.cache import stats_cache
+from loading import with_loading
+from models import (User, EvacuationCenter, Evacuee, Family, Donation, InventoryItem,
+                    EVACUEE_STATUSES)
+
+EXPIRY_WINDOW_DAYS = 7
+CAPACITY_WARNING_RATIO = 0.9
+DONATION_TYPES = ('food', 'non-food')
+RECENT_LIMIT = 5
+
+# Tables each cached value is computed from
+COUNTER_TABLES = ('evacuation_center', 'evacuee', 'family', 'donation', 'inventory_item')
+CENTER_TABLES = ('evacuation_center',)
+CENTER_FIELDS = ('id', 'name', 'address', 'capacity', 'status', 'contact_person', 'current_occupancy')
+WATCHLIST_TABLES = ('inventory_item', 'evacuation_center')
+
+
+def _count_if(condition):
+    return func.coalesce(func.sum(case((condition, 1), else_=0)), 0)
+
+
+def _counter_statement(today):
+    expiring_before = today + timedelta(days=EXPIRY_WINDOW_DAYS)
+
+    centers = select(
+        func.count(EvacuationCenter.id).label('center_count'),
+        _count_if(EvacuationCenter.status == 'active').label('active_center_count'),
+    ).subquery('centers')
+
+    evacuees = select(
+        func.count(Evacuee.id).label('evacuee_count'),
+        *[_count_if(Evacuee.status == status).label(f'evacuee_{status}_count') for status in EVACUEE_STATUSES],
+    ).subquery('evacuees')
+
+    families = select(func.count(Family.id).label('family_count')).subquery('families')
+
+    donations = select(
+        func.count(Donation.id).label('donation_count'),
+        _count_if(Donation.status == 'pending').label('pending_donation_count'),
+        *[_count_if(Donation.type == donation_type).label(f'donation_{donation_type.replace("-", "_")}_count')
+          for donation_type in DONATION_TYPES],
+    ).subquery('donations')
+
+    inventory = select(
+        func.count(InventoryItem.id).label('inventory_count'),
+        _count_if(
+            (InventoryItem.type == 'food') &
+            (InventoryItem.status == 'available') &
+            (InventoryItem.expiry_date <= expiring_before)
+        ).label('expiring_inventory_count'),
+    ).subquery('inventory')
+
+    return select(centers, evacuees, families, donations, inventory).select_from(
+        centers.join(evacuees, true())
+        .join(families, true())
+        .join(donations, true())
+        .join(inventory, true())
+    )
+
+
+class DashboardStats:
+    def __init__(self):
+        self.today = datetime.now().date()
+        self.counters = {}
+        self.timings = {}
+        self.cache_hits = set()
+
+    @contextmanager
+    def timed(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = (time.perf_counter() - started) * 1000
+
+    @property
+    def evacuee_status(self):
+        return {status: self.counters[f'evacuee_{status}_count'] for status in EVACUEE_STATUSES}
+
+    @property
+    def donation_types(self):
+        return {donation_type: self.counters[f'donation_{donation_type.replace("-", "_")}_count']
+                for donation_type in DONATION_TYPES}
+
+    def cached(self, name, key, tables, compute):
+        """Timed lookup of ``key`` in the stats cache, noting whether ``compute`` had to run."""
+        computed = []
+
+        def compute_and_record():
+            computed.append(True)
+            return compute()
+
+        with self.timed(name):
+            value = stats_cache.get_or_set(f'dashboard:{key}', tables, compute_and_record)
+        if not computed:
+            self.cache_hits.add(name)
+        return value
+
+    def _compute_counters(self):
+        row = db.session.execute(_counter_statement(self.today)).mappings().one()
+        return {key: int(value or 0) for key, value in row.items()}
+
+    def load_counters(self):
+        # Keyed by day as well, since the expiring-soon window moves at midnight
+        self.counters = self.cached(
+            'counters', f'counters:{self.today.isoformat()}', COUNTER_TABLES, self._compute_counters
+        )
+        return self
+
+    def _compute_centers(self):
+        return [
+            {field: getattr(center, field) for field in CENTER_FIELDS}
+            for center in EvacuationCenter.query.order_by(EvacuationCenter.id)
+        ]
+
+    def load_centers(self):
+        # Centers are snapshots (dicts), which the templates read like the models
+        self.centers = self.cached('centers', 'centers', CENTER_TABLES, self._compute_centers)
+        self.active_centers = [center for center in self.centers if center['status'] == 'active']
+        self.centers_at_capacity = [
+            center for center in self.centers
+            if center['current_occupancy'] >= center['capacity'] * CAPACITY_WARNING_RATIO
+        ]
+        self.centers_data = [
+            {
+                'name': center['name'],
+                'current_occupancy': center['current_occupancy'],
+                'capacity': center['capacity']
+            }
+            for center in self.active_centers
+        ]
+        return self
+
+    def load_recent(self, users=False):
+        with self.timed('recent_evacuees'):
+            self.recent_evacuees = with_loading(Evacuee.query, 'recent_evacuees').order_by(Evacuee.created_at.desc()).limit(RECENT_LIMIT).all()
+        with self.timed('recent_donations'):
+            self.recent_donations = with_loading(Donation.query, 'recent_donations').order_by(Donation.created_at.desc()).limit(RECENT_LIMIT).all()
+        if users:
+            with self.timed('recent_users'):
+                self.recent_users = User.query.order_by(User.created_at.desc()).limit(RECENT_LIMIT).all()
+        return self
+
+    def _compute_expiring_food(self):
+        rows = db.session.query(
+            InventoryItem.id, InventoryItem.description, InventoryItem.quantity, InventoryItem.unit,
+            InventoryItem.expiry_date, InventoryItem.status, EvacuationCenter.id, EvacuationCenter.name
+        ).join(EvacuationCenter, InventoryItem.evacuation_center_id == EvacuationCenter.id).filter(
+            InventoryItem.type == 'food',
+            InventoryItem.status == 'available',
+            InventoryItem.expiry_date >= self.today,
+            InventoryItem.expiry_date <= self.today + timedelta(days=EXPIRY_WINDOW_DAYS)
+        ).order_by(InventoryItem.expiry_date, InventoryItem.id)
+        return [
+            {
+                'id': item_id,
+                'description': description,
+                'quantity': quantity,
+                'unit': unit,
+                'expiry_date': expiry_date,
+                'days_left': (expiry_date - self.today).days,
+                'status': status,
+                'evacuation_center': {'id': center_id, 'name': center_name},
+            }
+            for item_id, description, quantity, unit, expiry_date, status, center_id, center_name in rows
+        ]
+
+    def load_expiring_food(self):
+        # Watchlist snapshots, keyed by day since the window moves at midnight
+        self.expiring_food = self.cached(
+            'expiring_food', f'expiring_food:{self.today.isoformat()}', WATCHLIST_TABLES,
+            self._compute_expiring_food
+        )
+        return self
+
+    @property
+    def total_ms(self):
+        return sum(self.timings.values())
+
+    def server_timing(self):
+        """Value for a ``Server-Timing`` response header, one metric per query."""
+        metrics = [
+            f'db-{name.replace("_", "-")};dur={ms:.2f}' + (';desc="cache hit"' if name in self.cache_hits else '')
+            for name, ms in self.timings.items()
+        ]
+        metrics.append(f'db-dashboard;dur={self.total_ms:.2f}')
+        return ', '.join(metrics)
+
+    def log(self, dashboard):
+        current_app.logger.debug(
+            'dashboard=%s total_ms=%.2f cache_hits=%s %s', dashboard, self.total_ms,
+            ','.join(sorted(self.cache_hits)) or '-',
+            ' '.join(f'{name}_ms={ms:.2f}' for name, ms in self.timings.items())
+        )
@@ -0,0 +1,302 @@
+"""Finding evacuees registered twice, for an admin to merge.
+
+Comparing every evacuee with every other is out of the question at 200,000
+records, so only evacuees sharing a blocking key are compared. Every evacuee
+carries two, kept on the row itself (``models.name_block_key``): the first
+letters of the surname and of the given name, each with the birth year. Two
+records of one person usually agree on at least one of them even when the
+other name is misspelt. A block is every evacuee with the key as either of
+theirs, so a record with given and surname swapped over meets the original.
+
+Within a block each pair is scored with fuzzy string similarity
+(``difflib``) of the normalised names, given and surname either way round;
+a known birth date that differs lowers the score and a known gender that
+differs rules the pair out. Pairs scoring ``MATCH_THRESHOLD`` or more go into
+the review queue (``DuplicateCandidate``) unless already there, including
+pairs an admin dismissed before.
+
+``flag_duplicates`` checks newly registered evacuees against their blocks
+only, an indexed lookup and a handful of comparisons; the add forms and the
+importer call it. ``scan_duplicates`` (``flask find-duplicates``) compares
+every block, spread over a pool of worker processes. ``merge_evacuees`` keeps
+one record of a pair, filling its blanks from the other, and deletes the
+other.
+"""
+import os
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from difflib import SequenceMatcher
+from itertools import combinations
+
+from flask_login import current_user
+from sqlalchemy import delete, func, or_, select
+
+from app import db
+from models import NAME_KEY_LENGTH, DuplicateCandidate, Evacuee, Family, normalize_name
+
+MATCH_THRESHOLD = 0.85
+BIRTH_DATE_PENALTY = 0.1  # both birth dates known, same year but a different day
+MAX_BLOCK = 2000  # blocks larger than this are too common a name to compare pairwise
+TASK_PAIRS = 200000  # comparisons sent to a worker process at a time
+CHUNK_SIZE = 1000
+
+# (id, given name, surname, birth date ordinal or None, gender or None), names normalised
+_RECORD_COLUMNS = (Evacuee.id, Evacuee.first_name, Evacuee.last_name, Evacuee.date_of_birth, Evacuee.gender)
+
+
+class DedupError(ValueError):
+    """The merge asked for is not possible (pair already handled, record gone)."""
+
+
+def _usable(key):
+    # A name with no letters at all blocks nothing
+    return bool(key) and not key.startswith('|')
+
+
+def _record(row):
+    evacuee_id, first_name, last_name, date_of_birth, gender = row
+    return (evacuee_id, normalize_name(first_name), normalize_name(last_name),
+            date_of_birth.toordinal() if date_of_birth else None, (gender or '').lower() or None)
+
+
+def _similarity(a, b, cutoff):
+    """``difflib`` ratio of two names when it is ``cutoff`` or more, else an upper bound below ``cutoff``."""
+    if a == b:
+        return 1.0
+    if not a or not b:
+        return 0.0
+    # The length bound and quick_ratio are far cheaper upper bounds of ratio; most pairs stop at one
+    bound = 2 * min(len(a), len(b)) / (len(a) + len(b))
+    if bound < cutoff:
+        return bound
+    matcher = SequenceMatcher(None, a, b, autojunk=False)
+    bound = matcher.quick_ratio()
+    return matcher.ratio() if bound >= cutoff else bound
+
+
+def _name_score(given_a, surname_a, given_b, surname_b, threshold):
+    # The mean of the two similarities; once one is known, the other must make up the rest of the threshold
+    surname = _similarity(surname_a, surname_b, 2 * threshold - 1)
+    return (surname + _similarity(given_a, given_b, 2 * threshold - surname)) / 2
+
+
+def score_pair(a, b, threshold=MATCH_THRESHOLD):
+    """Similarity of two records (``_record`` tuples) from 0 to 1, or None if they cannot be one person.
+
+    Exact when ``threshold`` or more; a lower score is only known to be below it.
+    """
+    if a[4] and b[4] and a[4] != b[4]:
+        return None
+    score = _name_score(a[1], a[2], b[1], b[2], threshold)
+    # Given and surname swapped over: only worth comparing when the names they block on match that way
+    if score < threshold and (a[1][:NAME_KEY_LENGTH] == b[2][:NAME_KEY_LENGTH]
+                              or a[2][:NAME_KEY_LENGTH] == b[1][:NAME_KEY_LENGTH]):
+        score = max(score, _name_score(a[1], a[2], b[2], b[1], threshold))
+    if a[3] and b[3] and a[3] != b[3]:
+        score -= BIRTH_DATE_PENALTY
+    return score
+
+
+def score_blocks(blocks, threshold=MATCH_THRESHOLD):
+    """``(lower id, higher id, score)`` of every pair within each block scoring at least ``threshold``.
+
+    Runs in the worker processes of ``scan_duplicates``: plain data in and out.
+    """
+    found = []
+    for block in blocks:
+        for a, b in combinations(block, 2):
+            score = score_pair(a, b, threshold)
+            if score is not None and score >= threshold:
+                found.append((min(a[0], b[0]), max(a[0], b[0]), round(score, 3)))
+    return found
+
+
+def record_candidates(pairs):
+    """Queue the ``(lower id, higher id, score)`` pairs not queued before; returns the number added."""
+    best = {}
+    for low, high, score in pairs:
+        if score > best.get((low, high), 0):
+            best[(low, high)] = score
+    if not best:
+        return 0
+    lows = sorted({low for low, high in best})
+    known = set()
+    for start in range(0, len(lows), CHUNK_SIZE):
+        known.update(db.session.execute(
+            select(DuplicateCandidate.evacuee_id, DuplicateCandidate.duplicate_id)
+            .where(DuplicateCandidate.evacuee_id.in_(lows[start:start + CHUNK_SIZE]))
+        ).tuples())
+    now = datetime.now()
+    rows = [{'evacuee_id': low, 'duplicate_id': high, 'score': score, 'status': 'pending', 'created_at': now}
+            for (low, high), score in sorted(best.items()) if (low, high) not in known]
+    for start in range(0, len(rows), CHUNK_SIZE):
+        db.session.execute(DuplicateCandidate.__table__.insert(), rows[start:start + CHUNK_SIZE])
+    return len(rows)
+
+
+def _block_sizes(keys):
+    # Evacuees having each key as either of their blocking keys, counted on the two indexes
+    sizes = defaultdict(int)
+    for column in (Evacuee.surname_key, Evacuee.given_name_key):
+        for key, count in db.session.execute(select(column, func.count()).where(column.in_(keys)).group_by(column)):
+            sizes[key] += count
+    return sizes
+
+
+def flag_duplicates(evacuee_ids):
+    """Check newly added evacuees against their blocks and queue likely duplicates.
+
+    Returns ``{evacuee id: [ids of likely duplicates]}`` for the evacuees
+    that have any; commits.
+    """
+    new = db.session.execute(
+        select(*_RECORD_COLUMNS, Evacuee.surname_key, Evacuee.given_name_key).where(Evacuee.id.in_(evacuee_ids))
+    ).all()
+    keys = sorted({key for row in new for key in row[-2:] if _usable(key)})
+    blocks = defaultdict(list)
+    for start in range(0, len(keys), CHUNK_SIZE):
+        # As in scan_duplicates, blocks of too common a name are not compared
+        sizes = _block_sizes(keys[start:start + CHUNK_SIZE])
+        chunk = [key for key, size in sizes.items() if size <= MAX_BLOCK]
+        if not chunk:
+            continue
+        for row in db.session.execute(
+            select(*_RECORD_COLUMNS, Evacuee.surname_key, Evacuee.given_name_key)
+            .where(or_(Evacuee.surname_key.in_(chunk), Evacuee.given_name_key.in_(chunk)))
+        ):
+            record = _record(row[:5])
+            for key in {row.surname_key, row.given_name_key}:
+                if key in sizes:
+                    blocks[key].append(record)
+
+    found = defaultdict(set)
+    pairs = []
+    for row in new:
+        record = _record(row[:5])
+        others = {other[0]: other for key in set(row[-2:]) for other in blocks.get(key, ())}
+        others.pop(record[0], None)
+        for other in others.values():
+            score = score_pair(record, other)
+            if score is not None and score >= MATCH_THRESHOLD:
+                pairs.append((min(record[0], other[0]), max(record[0], other[0]), round(score, 3)))
+                found[record[0]].add(other[0])
+    try:
+        record_candidates(pairs)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return {evacuee_id: sorted(others) for evacuee_id, others in found.items()}
+
+
+def _tasks(blocks):
+    # Blocks batched into tasks of roughly TASK_PAIRS comparisons each
+    task, pairs = [], 0
+    for block in blocks:
+        task.append(block)
+        pairs += len(block) * (len(block) - 1) // 2
+        if pairs >= TASK_PAIRS:
+            yield task
+            task, pairs = [], 0
+    if task:
+        yield task
+
+
+def scan_duplicates(workers=None):
+    """Compare every block of evacuees and queue the likely duplicates.
+
+    ``workers`` is the number of processes (all CPUs by default; 1 compares
+    in this process). Returns ``(pairs found, pairs newly queued, blocks
+    skipped as too large)``; commits.
+    """
+    blocks = defaultdict(list)
+    last_id = 0
+    while True:
+        rows = db.session.execute(
+            select(*_RECORD_COLUMNS, Evacuee.surname_key, Evacuee.given_name_key)
+            .where(Evacuee.id > last_id).order_by(Evacuee.id).limit(CHUNK_SIZE * 10)
+        ).all()
+        if not rows:
+            break
+        for row in rows:
+            record = _record(row[:5])
+            for key in {row.surname_key, row.given_name_key}:
+                if _usable(key):
+                    blocks[key].append(record)
+        last_id = rows[-1].id
+
+    comparable = [block for block in blocks.values() if 1 < len(block) <= MAX_BLOCK]
+    skipped = sum(1 for block in blocks.values() if len(block) > MAX_BLOCK)
+    del blocks
+    comparable.sort(key=len, reverse=True)  # the largest blocks first, so no worker is left with one at the end
+
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        pairs = score_blocks(comparable)
+    else:
+        pairs = []
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for found in pool.map(score_blocks, _tasks(comparable)):
+                pairs.extend(found)
+
+    try:
+        queued = record_candidates(pairs)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return len({(low, high) for low, high, score in pairs}), queued, skipped
+
+
+def _merged_special_needs(keep, drop):
+    needs = [value.strip() for value in (keep, drop) if value and value.strip()]
+    if len(needs) == 2 and needs[1].lower() in needs[0].lower():
+        return needs[0]
+    return '; '.join(needs) or None
+
+
+def merge_evacuees(candidate_id, keep_id):
+    """Keep evacuee ``keep_id`` of a queued pair and delete the other, after filling in what the kept one lacks.
+
+    The deleted record's family headship and its other queued pairs go with
+    it. Returns the kept evacuee; commits.
+    """
+    candidate = db.session.get(DuplicateCandidate, candidate_id)
+    if candidate is None or candidate.status != 'pending':
+        raise DedupError('This pair has already been reviewed.')
+    if keep_id not in (candidate.evacuee_id, candidate.duplicate_id):
+        raise DedupError('Keep one of the two evacuees of the pair.')
+    drop_id = candidate.duplicate_id if keep_id == candidate.evacuee_id else candidate.evacuee_id
+    keep, drop = db.session.get(Evacuee, keep_id), db.session.get(Evacuee, drop_id)
+    if keep is None or drop is None:
+        raise DedupError('One of the two evacuees no longer exists.')
+
+    try:
+        for field in ('date_of_birth', 'gender', 'family_id', 'evacuation_center_id'):
+            if getattr(keep, field) in (None, '') and getattr(drop, field) not in (None, ''):
+                setattr(keep, field, getattr(drop, field))
+        keep.special_needs = _merged_special_needs(keep.special_needs, drop.special_needs)
+        for family in Family.query.filter_by(head_of_family_id=drop_id):
+            family.head_of_family_id = keep_id
+        db.session.execute(delete(DuplicateCandidate).where(
+            or_(DuplicateCandidate.evacuee_id == drop_id, DuplicateCandidate.duplicate_id == drop_id)
+        ))
+        db.session.delete(drop)  # the ORM hooks update the center counters and search index
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return keep
+
+
+def dismiss_candidate(candidate_id):
+    """Mark a queued pair as not a duplicate; it will not be queued again."""
+    candidate = db.session.get(DuplicateCandidate, candidate_id)
+    if candidate is None or candidate.status != 'pending':
+        raise DedupError('This pair has already been reviewed.')
+    candidate.status = 'dismissed'
+    candidate.reviewed_at = datetime.now()
+    candidate.reviewed_by_id = current_user.id if current_user and current_user.is_authenticated else None
+    db.session.commit()
+    return candidate
@@ -0,0 +1,77 @@
+"""Expiry sweep for food inventory.
+
+Nothing writes to a food item when its expiry date passes, so it would stay
+'available' (and keep showing up as stock) until someone edited it.
+``sweep_expired`` flips every available food item past its expiry date to
+'expired' with one set-based UPDATE, served by the type/status/expiry index,
+writes what was left of them off in the inventory ledger, then rebuilds the expiring-soon watchlist (``DashboardStats.load_expiring_food``)
+so the first dashboard of the day finds it ready.
+
+The sweep runs from ``flask sweep-expired`` (e.g. from cron shortly after
+midnight) or from a background thread in every app process when
+``EXPIRY_SWEEP_INTERVAL`` is set to a number of seconds. Running it from
+several processes at once is harmless: the UPDATE is idempotent.
+"""
+import logging
+import os
+import threading
+from datetime import date, datetime
+
+from sqlalchemy import select, update
+
+from app import db
+from models import InventoryItem, mark_tables_changed, record_stock_movements
+from services.dashboard import DashboardStats
+from services.ledger import LINE_COLUMNS, line_movements
+
+logger = logging.getLogger(__name__)
+
+
+def sweep_expired(today=None):
+    """Mark available food past its expiry date as expired; returns the number of items changed."""
+    today = today or date.today()
+    table = InventoryItem.__table__
+    expiring = (table.c.type == 'food', table.c.status == 'available', table.c.expiry_date < today)
+    # What is left of each line is written off in the ledger; locked so no one distributes it meanwhile
+    lines = db.session.execute(select(*LINE_COLUMNS).where(*expiring).with_for_update()).all()
+    result = db.session.execute(
+        update(table).where(table.c.id.in_([line.id for line in lines]), *expiring)
+        .values(status='expired', updated_at=datetime.now())
+    )
+    if result.rowcount != len(lines):
+        # Another sweep got to some of them first (SQLite has no row locks); it covers them
+        db.session.rollback()
+        return 0
+    if lines:
+        mark_tables_changed(db.session, InventoryItem.__tablename__)
+        record_stock_movements(db.session, line_movements('spoil', lines, sign=-1, note='expired'))
+    db.session.commit()
+
+    # Committed first, so the watchlist is computed for the new table version
+    DashboardStats().load_expiring_food()
+    return result.rowcount
+
+
+def _run_sweeper(app, interval, stop):
+    while not stop.wait(interval):
+        with app.app_context():
+            try:
+                swept = sweep_expired()
+                if swept:
+                    logger.info('Expiry sweep marked %d inventory item(s) expired', swept)
+            except Exception:
+                logger.exception('Expiry sweep failed')
+                db.session.rollback()
+            finally:
+                db.session.remove()
+
+
+def init_app(app):
+    """Start the background sweeper when ``EXPIRY_SWEEP_INTERVAL`` (seconds) is set; returns its stop event."""
+    interval = int(app.config.setdefault('EXPIRY_SWEEP_INTERVAL', os.environ.get('EXPIRY_SWEEP_INTERVAL', 0)))
+    if interval <= 0:
+        return None
+    stop = threading.Event()
+    thread = threading.Thread(target=_run_sweeper, args=(app, interval, stop), name='expiry-sweeper', daemon=True)
+    thread.start()
+    return stop
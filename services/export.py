@@ -0,0 +1,111 @@
+"""Streaming CSV exports of the filtered list views.
+
+The export endpoints take the same filtered query as the list (and its JSON
+data endpoint), select just the exported columns with outer joins for the
+related names, and stream the result with ``yield_per`` so rows are fetched
+from a server-side cursor in batches. Memory stays flat however many rows are
+exported; nothing but one batch and one CSV buffer is held at a time.
+"""
+import csv
+import io
+from datetime import date, datetime
+
+from flask import Response, stream_with_context
+
+from models import EvacuationCenter, Evacuee, Family, Donation, InventoryItem, User
+
+BATCH_SIZE = 1000
+
+# (header, column) pairs per export; the joins they need are added in the query helpers
+EVACUEE_COLUMNS = (
+    ('ID', Evacuee.id),
+    ('First Name', Evacuee.first_name),
+    ('Last Name', Evacuee.last_name),
+    ('Date of Birth', Evacuee.date_of_birth),
+    ('Gender', Evacuee.gender),
+    ('Status', Evacuee.status),
+    ('Special Needs', Evacuee.special_needs),
+    ('Family', Family.family_name),
+    ('Evacuation Center', EvacuationCenter.name),
+    ('Registered', Evacuee.created_at),
+)
+
+DONATION_COLUMNS = (
+    ('ID', Donation.id),
+    ('Type', Donation.type),
+    ('Description', Donation.description),
+    ('Quantity', Donation.quantity),
+    ('Unit', Donation.unit),
+    ('Expiry Date', Donation.expiry_date),
+    ('Status', Donation.status),
+    ('Donor', User.username),
+    ('Evacuation Center', EvacuationCenter.name),
+    ('Donated', Donation.created_at),
+)
+
+INVENTORY_COLUMNS = (
+    ('ID', InventoryItem.id),
+    ('Type', InventoryItem.type),
+    ('Description', InventoryItem.description),
+    ('Quantity', InventoryItem.quantity),
+    ('Unit', InventoryItem.unit),
+    ('Expiry Date', InventoryItem.expiry_date),
+    ('Status', InventoryItem.status),
+    ('Evacuation Center', EvacuationCenter.name),
+    ('Added', InventoryItem.created_at),
+)
+
+
+def evacuee_rows(query):
+    return (query.outerjoin(Family, Evacuee.family_id == Family.id)
+            .outerjoin(EvacuationCenter, Evacuee.evacuation_center_id == EvacuationCenter.id)
+            .order_by(None).order_by(Evacuee.id))
+
+
+def donation_rows(query):
+    return (query.outerjoin(User, Donation.donor_id == User.id)
+            .outerjoin(EvacuationCenter, Donation.evacuation_center_id == EvacuationCenter.id)
+            .order_by(None).order_by(Donation.id))
+
+
+def inventory_rows(query):
+    return (query.outerjoin(EvacuationCenter, InventoryItem.evacuation_center_id == EvacuationCenter.id)
+            .order_by(None).order_by(InventoryItem.id))
+
+
+def _text(value):
+    if value is None:
+        return ''
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d %H:%M')
+    if isinstance(value, date):
+        return value.isoformat()
+    value = str(value)
+    # Keep spreadsheet apps from evaluating user-entered text as a formula
+    if value[:1] in ('=', '+', '-', '@') and not value.lstrip('+-').replace('.', '', 1).isdigit():
+        return "'" + value
+    return value
+
+
+def csv_response(query, columns, filename):
+    """Stream ``query`` restricted to ``columns`` as a CSV attachment."""
+    query = query.with_entities(*[column for header, column in columns]).yield_per(BATCH_SIZE)
+
+    def generate():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow([header for header, column in columns])
+        for count, row in enumerate(query, start=1):
+            writer.writerow([_text(value) for value in row])
+            if count % BATCH_SIZE == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+
+    filename = f'{filename}-{datetime.now():%Y%m%d-%H%M}.csv'
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/csv',
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+    )
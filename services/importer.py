@@ -0,0 +1,337 @@
+"""Bulk import of evacuees, and the families they belong to, from CSV or XLSX files.
+
+The upload is read one row at a time; nothing but the current chunk is held in
+memory. Every row is validated with ``EvacueeForm`` (and ``FamilyForm`` the
+first time an unknown family name appears), so imported data obeys the same
+rules as the add forms. Centers and families are resolved by name or id from
+lookup maps loaded once up front.
+
+Valid rows are written in chunks of ``CHUNK_SIZE``: new families, then the
+evacuees with one executemany INSERT, then head-of-family links, each chunk
+in its own transaction. Core inserts skip the ORM hooks, so each chunk also
+applies its occupancy deltas, marks the stats-cache tables and indexes the
+new rows for search itself. The ids of the new rows are read back from the
+INSERT itself (RETURNING, or one INSERT per row where the database has no
+RETURNING), never by range, since people are registered through the forms
+while an import runs. A chunk that fails in the database is rolled back and
+reported row by row; the other chunks are kept. A file that turns out to be
+unreadable part way (bad encoding) stops the import: the rows read before it
+are saved and ``ImportFileError.report`` says what was written. Once saved, a
+chunk's evacuees are checked for people registered already
+(``services.dedup.flag_duplicates``) and likely duplicates queued for review.
+
+Recognised columns (header names are case-insensitive)::
+
+    first_name, last_name, date_of_birth (YYYY-MM-DD), gender, status,
+    special_needs, evacuation_center (name or id), family (name),
+    family_address, family_contact_number, head_of_family (yes/no)
+"""
+import csv
+import io
+from collections import Counter, defaultdict
+from datetime import date, datetime
+
+from sqlalchemy import bindparam, insert, select, update
+from sqlalchemy.exc import SQLAlchemyError
+from werkzeug.datastructures import MultiDict
+
+from app import db
+from forms import EvacueeForm, FamilyForm
+from models import EvacuationCenter, Evacuee, Family, apply_occupancy_deltas, mark_tables_changed
+from services.dedup import flag_duplicates
+from services.search import index_rows, indexed_columns
+
+CHUNK_SIZE = 1000
+
+# Header spellings found on registration sheets -> import field
+COLUMN_ALIASES = {
+    'first': 'first_name',
+    'firstname': 'first_name',
+    'given_name': 'first_name',
+    'last': 'last_name',
+    'lastname': 'last_name',
+    'surname': 'last_name',
+    'dob': 'date_of_birth',
+    'birthdate': 'date_of_birth',
+    'birth_date': 'date_of_birth',
+    'sex': 'gender',
+    'needs': 'special_needs',
+    'center': 'evacuation_center',
+    'center_id': 'evacuation_center',
+    'evacuation_center_id': 'evacuation_center',
+    'family_name': 'family',
+    'address': 'family_address',
+    'home_address': 'family_address',
+    'contact_number': 'family_contact_number',
+    'head': 'head_of_family',
+}
+EVACUEE_FIELDS = ('first_name', 'last_name', 'date_of_birth', 'gender', 'status', 'special_needs')
+TRUE_VALUES = ('1', 'x', 'y', 'yes', 'true')
+
+
+class ImportFileError(ValueError):
+    """The upload cannot be read (as opposed to individual bad rows).
+
+    ``report`` is the ``ImportReport`` of the rows written before the unreadable
+    part, or None when nothing could be read.
+    """
+
+    def __init__(self, message, report=None):
+        super().__init__(message)
+        self.report = report
+
+
+class ImportReport:
+    def __init__(self):
+        self.rows = 0
+        self.imported = 0
+        self.families_created = 0
+        self.possible_duplicates = 0  # imported evacuees queued for review as likely registered already
+        self.errors = []  # (line number, [messages])
+        self.file_error = None  # why reading stopped before the end of the file
+
+    def add_error(self, line, messages):
+        self.errors.append((line, messages))
+
+    def as_dict(self):
+        return {
+            'rows': self.rows,
+            'imported': self.imported,
+            'families_created': self.families_created,
+            'possible_duplicates': self.possible_duplicates,
+            'errors': [{'line': line, 'messages': messages} for line, messages in self.errors],
+            'file_error': self.file_error,
+        }
+
+
+def _header(value):
+    key = str(value or '').strip().lower().replace(' ', '_').replace('-', '_')
+    return COLUMN_ALIASES.get(key, key)
+
+
+def _cell(value):
+    # Spreadsheet cells arrive typed; the forms expect the text a browser would post
+    if value is None:
+        return ''
+    if isinstance(value, datetime):
+        return value.date().isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value).strip()
+
+
+def _xlsx_rows(stream):
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise ImportFileError('Reading .xlsx files requires the openpyxl package; upload a CSV file instead.')
+    try:
+        workbook = load_workbook(stream, read_only=True, data_only=True)
+    except Exception as error:
+        raise ImportFileError(f'Could not read the spreadsheet: {error}')
+    try:
+        yield from workbook.active.iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+
+def read_rows(stream, filename):
+    """Yield ``(line number, {field: text})`` for every non-blank data row of the file."""
+    if filename.lower().endswith('.xlsx'):
+        rows = _xlsx_rows(stream)
+    else:
+        rows = csv.reader(io.TextIOWrapper(stream, encoding='utf-8-sig', newline=''))
+    header = None
+    try:
+        for line, values in enumerate(rows, start=1):
+            cells = [_cell(value) for value in values]
+            if header is None:
+                header = [_header(value) for value in cells]
+                if not {'first_name', 'last_name'} <= set(header):
+                    raise ImportFileError('The first row must name the columns, including first_name and last_name.')
+                continue
+            if any(cells):
+                yield line, dict(zip(header, cells))
+    except (UnicodeDecodeError, csv.Error) as error:
+        raise ImportFileError(f'Could not read the file: {error}')
+
+
+def _insert_ids(connection, table, rows):
+    """INSERT ``rows`` into ``table``; returns the new ids in the order of ``rows``."""
+    if connection.dialect.insert_executemany_returning_sort_by_parameter_order:
+        return list(connection.scalars(
+            insert(table).returning(table.c.id, sort_by_parameter_order=True), rows
+        ))
+    # MySQL has no RETURNING; each row's id is the last insert id of its own INSERT
+    return [connection.execute(insert(table), row).inserted_primary_key[0] for row in rows]
+
+
+class EvacueeImporter:
+    def __init__(self, active_centers_only=False, chunk_size=CHUNK_SIZE):
+        self.chunk_size = chunk_size
+        self.report = ImportReport()
+
+        centers = db.session.query(EvacuationCenter.id, EvacuationCenter.name)
+        if active_centers_only:
+            centers = centers.filter(EvacuationCenter.status == 'active')
+        self.centers = {}
+        for center_id, name in centers:
+            self.centers[str(center_id)] = center_id
+            self.centers.setdefault(name.strip().lower(), center_id)
+
+        # Family names are not unique; an import joins the oldest family of that name
+        self.families = {}
+        for family_id, name in db.session.query(Family.id, Family.family_name).order_by(Family.id):
+            self.families.setdefault(name.strip().lower(), family_id)
+        self.new_families = {}  # key -> column values, until the family is inserted
+
+        # Bound once and re-processed per row; binding the fields is most of a form's cost
+        self.evacuee_form = EvacueeForm(formdata=None, meta={'csrf': False})
+        self.family_form = FamilyForm(formdata=None, meta={'csrf': False})
+        # Ids come from the lookup maps, so the record selects need not query for them
+        self.evacuee_form.evacuation_center_id.known_ids = set(self.centers.values())
+        self.evacuee_form.family_id.known_ids = set()
+        self.family_form.head_of_family_id.known_ids = set()
+
+    def run(self, stream, filename):
+        chunk = []
+        try:
+            for line, values in read_rows(stream, filename):
+                self.report.rows += 1
+                row = self._validate(line, values)
+                if row is None:
+                    continue
+                chunk.append(row)
+                if len(chunk) >= self.chunk_size:
+                    self._write(chunk)
+                    chunk = []
+        except ImportFileError as error:
+            if self.report.rows:
+                # Earlier chunks are committed already; save the rest read so far and say what was written
+                if chunk:
+                    self._write(chunk)
+                self.report.file_error = str(error)
+                error.report = self.report
+            raise
+        if chunk:
+            self._write(chunk)
+        return self.report
+
+    def _validate(self, line, values):
+        errors = []
+        center_key = values.get('evacuation_center', '').lower()
+        center_id = self.centers.get(center_key)
+
+        data = MultiDict((field, values[field]) for field in EVACUEE_FIELDS if values.get(field))
+        if center_id:
+            data['evacuation_center_id'] = str(center_id)
+        form = self.evacuee_form
+        form.process(formdata=data)
+        if not form.validate():
+            for field, messages in form.errors.items():
+                if field == 'evacuation_center_id':
+                    field = 'evacuation_center'
+                    if center_key:
+                        messages = [f"Unknown evacuation center '{values['evacuation_center']}'."]
+                errors.extend(f'{field}: {message}' for message in messages)
+
+        family_key = values.get('family', '').strip().lower() or None
+        if family_key and family_key not in self.families and family_key not in self.new_families:
+            family_form = self.family_form
+            family_form.process(formdata=MultiDict({
+                'family_name': values['family'],
+                'address': values.get('family_address', ''),
+                'contact_number': values.get('family_contact_number', ''),
+            }))
+            if family_form.validate():
+                self.new_families[family_key] = {
+                    'family_name': family_form.family_name.data.strip(),
+                    'address': family_form.address.data or None,
+                    'contact_number': family_form.contact_number.data or None,
+                }
+            else:
+                errors.extend(f'family_{field}: {message}'
+                              for field, messages in family_form.errors.items() for message in messages)
+
+        if errors:
+            self.report.add_error(line, errors)
+            return None
+
+        return {
+            'line': line,
+            'family_key': family_key,
+            'is_head': values.get('head_of_family', '').lower() in TRUE_VALUES,
+            'values': {
+                'first_name': form.first_name.data.strip(),
+                'last_name': form.last_name.data.strip(),
+                'date_of_birth': form.date_of_birth.data,
+                'gender': form.gender.data or None,
+                'status': form.status.data,
+                'special_needs': form.special_needs.data or None,
+                'evacuation_center_id': center_id,
+            },
+        }
+
+    def _write(self, chunk):
+        session = db.session
+        created = []
+        evacuee_ids = []
+        stamp = datetime.now()
+        try:
+            connection = session.connection()
+
+            pending = sorted({row['family_key'] for row in chunk if row['family_key'] in self.new_families})
+            if pending:
+                family_ids = _insert_ids(connection, Family.__table__, [
+                    dict(self.new_families[key], created_at=stamp, updated_at=stamp) for key in pending
+                ])
+                for key, family_id in zip(pending, family_ids):
+                    self.families[key] = family_id
+                    created.append(key)
+                index_rows(connection, Family, connection.execute(
+                    select(*indexed_columns(Family)).where(Family.id.in_(family_ids))
+                ).all())
+
+            evacuee_ids = _insert_ids(connection, Evacuee.__table__, [
+                dict(row['values'], family_id=self.families.get(row['family_key']), created_at=stamp, updated_at=stamp)
+                for row in chunk
+            ])
+            index_rows(connection, Evacuee, connection.execute(
+                select(*indexed_columns(Evacuee)).where(Evacuee.id.in_(evacuee_ids))
+            ).all())
+
+            heads = [
+                {'family': self.families[row['family_key']], 'head': evacuee_id}
+                for row, evacuee_id in zip(chunk, evacuee_ids) if row['is_head'] and row['family_key']
+            ]
+            if heads:
+                table = Family.__table__
+                connection.execute(
+                    update(table).where(table.c.id == bindparam('family')).values(head_of_family_id=bindparam('head')),
+                    heads
+                )
+
+            deltas = defaultdict(Counter)
+            for row in chunk:
+                counter = deltas[row['values']['evacuation_center_id']]
+                counter['occupancy_count'] += 1
+                counter[f"{row['values']['status']}_count"] += 1
+            apply_occupancy_deltas(session, deltas)
+            mark_tables_changed(session, Evacuee.__tablename__, Family.__tablename__)
+            session.commit()
+        except SQLAlchemyError as error:
+            session.rollback()
+            for key in created:
+                del self.families[key]
+            message = f'Not saved, database error: {getattr(error, "orig", None) or error}'
+            for row in chunk:
+                self.report.add_error(row['line'], [message])
+            return
+
+        for key in created:
+            self.new_families.pop(key, None)
+        self.report.families_created += len(created)
+        self.report.imported += len(chunk)
+        self.report.possible_duplicates += len(flag_duplicates(evacuee_ids))
@@ -0,0 +1,229 @@
+"""Inventory ledger: partial distributions, transfers, spoilage and stock levels.
+
+Every change to the stock on hand is appended to ``stock_movement`` as a
+signed quantity (``receive``, ``distribute``, ``transfer``, ``spoil``,
+``adjust``) and added to the ``stock_level`` row of its center and item in
+the same transaction (``models.record_stock_movements``). How much rice a
+center has is then a primary key lookup (``stock_on_hand``), and the ledger
+sums to the stock levels.
+
+An inventory line's ``quantity`` is what is left of it. Handing out part of
+a line is one ledger entry plus two single-row increments (the line and its
+stock level); the movement that takes the rest closes the line as
+'distributed' or 'expired' and leaves its last quantity on it. A transfer of
+part of a line splits it, the moved part becoming a new line at the other
+center.
+
+Lines written through the ORM (the admin forms) get their entries from the
+flush hooks in ``models.py``; the bulk writers (``services.stock``, the
+expiry sweep, the seeder) record theirs with ``line_movements``.
+``flask rebuild-stock-levels`` recomputes the stock levels from the lines.
+"""
+from collections import defaultdict
+from datetime import datetime
+
+from sqlalchemy import delete, exists, insert, select, update
+
+from app import db
+from models import (Donation, EvacuationCenter, InventoryItem, StockLevel, StockLine, StockMovement,
+                    mark_tables_changed, record_stock_movements, stock_item_key, stock_movement)
+from services.search import index_rows, indexed_columns
+
+# Columns of an inventory line that its ledger entries are made from
+LINE_COLUMNS = (InventoryItem.id, InventoryItem.evacuation_center_id, InventoryItem.description,
+                InventoryItem.unit, InventoryItem.type, InventoryItem.quantity)
+CHUNK_SIZE = 5000
+
+
+class LedgerError(ValueError):
+    """The movement asked for is not possible (unknown line, not available, too much)."""
+
+
+def line_movements(kind, lines, sign=1, note=None):
+    """Ledger entries moving the whole quantity of each of ``lines`` (rows of ``LINE_COLUMNS``)."""
+    return [stock_movement(kind, line, sign * line.quantity, note) for line in lines]
+
+
+def _locked_line(item_id, quantity):
+    line = db.session.execute(
+        select(*LINE_COLUMNS, InventoryItem.status).where(InventoryItem.id == item_id).with_for_update()
+    ).one_or_none()
+    if line is None:
+        raise LedgerError('Inventory item not found.')
+    if line.status != 'available':
+        raise LedgerError(f'This item is {line.status}, not available.')
+    if quantity is None:
+        quantity = line.quantity
+    if not 0 < quantity <= line.quantity:
+        raise LedgerError(f'Quantity must be between 1 and {line.quantity} {line.unit}.')
+    return line, quantity
+
+
+def _take(item_id, quantity, kind, closed_status, note):
+    line, quantity = _locked_line(item_id, quantity)
+    table = InventoryItem.__table__
+    if quantity == line.quantity:
+        values = {'status': closed_status}
+    else:
+        values = {'quantity': table.c.quantity - quantity}
+    now = datetime.now()
+    try:
+        db.session.execute(update(table).where(table.c.id == item_id).values(updated_at=now, **values))
+        if values.get('status') == 'distributed':
+            # As when whole lines are distributed (services.stock), the donation is distributed too
+            donations = Donation.__table__
+            db.session.execute(
+                update(donations)
+                .where(donations.c.id.in_(select(table.c.donation_id).where(table.c.id == item_id)))
+                .values(status='distributed', updated_at=now)
+            )
+            mark_tables_changed(db.session, donations.name)
+        mark_tables_changed(db.session, table.name)
+        record_stock_movements(db.session, [stock_movement(kind, line, -quantity, note)])
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return quantity
+
+
+def distribute(item_id, quantity=None, note=None):
+    """Hand out ``quantity`` of an available line (all of it by default); returns the quantity."""
+    return _take(item_id, quantity, 'distribute', 'distributed', note)
+
+
+def spoil(item_id, quantity=None, note=None):
+    """Write off ``quantity`` of an available line as spoiled (all of it by default); returns the quantity."""
+    return _take(item_id, quantity, 'spoil', 'expired', note)
+
+
+def _transfer(item_id, center_id, quantity, note):
+    line, quantity = _locked_line(item_id, quantity)
+    if center_id == line.evacuation_center_id:
+        raise LedgerError('The item is already at this center.')
+    if db.session.get(EvacuationCenter, center_id) is None:
+        raise LedgerError('Evacuation center not found.')
+
+    table = InventoryItem.__table__
+    now = datetime.now()
+    if quantity == line.quantity:
+        db.session.execute(update(table).where(table.c.id == item_id)
+                           .values(evacuation_center_id=center_id, updated_at=now))
+        moved_id = item_id
+    else:
+        db.session.execute(update(table).where(table.c.id == item_id)
+                           .values(quantity=table.c.quantity - quantity, updated_at=now))
+        source = db.session.execute(select(table).where(table.c.id == item_id)).one()
+        copy = {column: value for column, value in source._mapping.items() if column != 'id'}
+        copy.update(quantity=quantity, evacuation_center_id=center_id, status='available',
+                    created_at=now, updated_at=now)
+        connection = db.session.connection()
+        moved_id = connection.execute(insert(table).values(**copy)).inserted_primary_key[0]
+        index_rows(connection, InventoryItem,
+                   connection.execute(select(*indexed_columns(InventoryItem)).where(table.c.id == moved_id)).all())
+    mark_tables_changed(db.session, table.name)
+    moved = StockLine(moved_id, center_id, line.description, line.unit, line.type, quantity)
+    record_stock_movements(db.session, [
+        stock_movement('transfer', line, -quantity, note),
+        stock_movement('transfer', moved, quantity, note),
+    ])
+    return moved_id
+
+
+def transfer(item_id, center_id, quantity=None, note=None):
+    """Move ``quantity`` of an available line to another center; returns the id of the line there.
+
+    The whole line moves as it is; part of it becomes a new line at the center.
+    """
+    try:
+        moved_id = _transfer(item_id, center_id, quantity, note)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return moved_id
+
+
+def transfer_many(moves, note=None):
+    """Make every ``(item id, center id, quantity)`` transfer of ``moves`` in one transaction.
+
+    Returns the number made. If any of them is not possible, ``LedgerError``
+    is raised and none is made.
+    """
+    moves = sorted(moves)  # lines locked in id order, so overlapping batches cannot deadlock
+    try:
+        for item_id, center_id, quantity in moves:
+            _transfer(item_id, center_id, quantity, note)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return len(moves)
+
+
+def stock_on_hand(center_id, description, unit):
+    """Quantity of an item on hand at a center (a primary key lookup)."""
+    level = db.session.get(StockLevel, (center_id, stock_item_key(description), unit))
+    return level.quantity if level else 0
+
+
+def center_stock(center_id):
+    """Stock levels of a center with anything on hand, by item."""
+    return StockLevel.query.filter(
+        StockLevel.evacuation_center_id == center_id, StockLevel.quantity != 0
+    ).order_by(StockLevel.item, StockLevel.unit).all()
+
+
+def recent_movements(center_id, limit=50):
+    return StockMovement.query.filter_by(evacuation_center_id=center_id).order_by(
+        StockMovement.id.desc()
+    ).limit(limit).all()
+
+
+def _available_lines(connection, *conditions):
+    # Read in full before writing: MySQL cannot write on a connection still streaming a result
+    return connection.execute(
+        select(*LINE_COLUMNS).where(InventoryItem.status == 'available', InventoryItem.quantity > 0, *conditions)
+        .order_by(InventoryItem.id)
+    ).all()
+
+
+def _insert_chunks(connection, table, rows):
+    for start in range(0, len(rows), CHUNK_SIZE):
+        connection.execute(insert(table), rows[start:start + CHUNK_SIZE])
+
+
+def rebuild_stock_levels(connection=None):
+    """Recompute every stock level from the available inventory lines; returns the number of levels."""
+    connection = connection or db.session.connection()
+    levels = defaultdict(int)
+    types = {}
+    for line in _available_lines(connection):
+        key = (line.evacuation_center_id, stock_item_key(line.description), line.unit)
+        levels[key] += line.quantity
+        types[key] = line.type
+    now = datetime.now()
+    rows = []
+    for key, quantity in levels.items():
+        center_id, item, unit = key
+        rows.append(dict(evacuation_center_id=center_id, item=item, unit=unit, type=types[key],
+                         quantity=quantity, updated_at=now))
+    connection.execute(delete(StockLevel.__table__))
+    _insert_chunks(connection, StockLevel.__table__, rows)
+    return len(rows)
+
+
+def open_balances(connection=None):
+    """Opening ``receive`` entries for available lines with no ledger entry yet, then rebuild the stock levels.
+
+    For lines written before the ledger existed, or loaded behind its back;
+    returns the number of entries written.
+    """
+    connection = connection or db.session.connection()
+    unrecorded = ~exists().where(StockMovement.inventory_item_id == InventoryItem.id)
+    now = datetime.now()
+    rows = [dict(movement, created_at=now)
+            for movement in line_movements('receive', _available_lines(connection, unrecorded), note='opening balance')]
+    _insert_chunks(connection, StockMovement.__table__, rows)
+    rebuild_stock_levels(connection)
+    return len(rows)
@@ -0,0 +1,148 @@
+"""N+1 query detection for development and tests.
+
+A list template that reads a lazy relationship of every row
+(``family.head_of_family.full_name``, ``donation.evacuation_center.name``)
+runs one query per row. The ORM reports each lazy load through the session's
+``do_orm_execute`` event; the detector counts them per relationship during a
+request and, when one relationship is lazy-loaded ``NPLUSONE_THRESHOLD``
+times or more (default 2), reports it with the template line (or, outside a
+template, the line of project code) that triggered the loads::
+
+    N+1: Family.head_of_family lazy-loaded 25 times (admin/families.html:58)
+
+``NPLUSONE_MODE`` (setting or environment variable) selects what happens:
+
+* ``off``   - nothing is tracked (the default in production)
+* ``log``   - a warning is logged (the default when ``app.debug`` is set)
+* ``raise`` - the request fails with ``NPlusOneError`` (the default when
+  ``app.testing`` is set), so a test requesting the page fails
+
+``flask check-n-plus-one`` requests every page as a user of its role and lists
+the N+1 loads found; run it against a database with a few rows per list.
+"""
+import logging
+import os
+import sys
+from collections import Counter, defaultdict
+
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app import app, db
+from models import User
+from services.benchmark import logged_in_client
+from services.query_plans import BLUEPRINT_ROLES, page_urls
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_THRESHOLD = 2
+MODES = ('off', 'log', 'raise')
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Project frames that are never the cause (the detector itself, model properties)
+SKIPPED_FILES = {os.path.abspath(__file__), os.path.join(PROJECT_ROOT, 'models.py')}
+
+
+class NPlusOneError(RuntimeError):
+    """A request lazy-loaded the same relationship once per row."""
+
+
+def _mode():
+    mode = current_app.config.get('NPLUSONE_MODE')
+    if mode is None:
+        mode = 'raise' if current_app.testing else 'log' if current_app.debug else 'off'
+    return mode
+
+
+def _location():
+    """``template:line`` of the innermost template frame, else ``file:line`` of project code."""
+    fallback = None
+    frame = sys._getframe(2)
+    while frame is not None:
+        template = frame.f_globals.get('__jinja_template__')
+        if template is not None:
+            return f'{template.name}:{template.get_corresponding_lineno(frame.f_lineno)}'
+        filename = frame.f_code.co_filename
+        if (fallback is None and filename.startswith(PROJECT_ROOT) and filename not in SKIPPED_FILES
+                and 'site-packages' not in filename):
+            fallback = f'{os.path.relpath(filename, PROJECT_ROOT)}:{frame.f_lineno}'
+        frame = frame.f_back
+    return fallback or 'unknown'
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _record_lazy_load(orm_execute_state):
+    if not orm_execute_state.is_select or orm_execute_state.lazy_loaded_from is None or not has_request_context():
+        return
+    loads = g.get('lazy_loads')
+    if loads is not None:
+        relationship = str(orm_execute_state.loader_strategy_path[-1])
+        loads[relationship][_location()] += 1
+
+
+def problems(loads, threshold):
+    """Report lines for the relationships lazy-loaded ``threshold`` times or more."""
+    lines = []
+    for relationship, locations in sorted(loads.items()):
+        total = sum(locations.values())
+        if total >= threshold:
+            where = ', '.join(location for location, count in locations.most_common())
+            lines.append(f'N+1: {relationship} lazy-loaded {total} times ({where})')
+    return lines
+
+
+def _start_request():
+    if _mode() != 'off':
+        g.lazy_loads = defaultdict(Counter)
+
+
+def _finish_request(response):
+    loads = g.pop('lazy_loads', None)
+    if not loads:
+        return response
+    found = problems(loads, current_app.config['NPLUSONE_THRESHOLD'])
+    if found:
+        message = f'{request.endpoint} ({request.path}): ' + '; '.join(found)
+        if _mode() == 'raise':
+            raise NPlusOneError(message)
+        logger.warning(message)
+    return response
+
+
+def init_app(app):
+    app.config.setdefault('NPLUSONE_MODE', os.environ.get('NPLUSONE_MODE'))
+    app.config.setdefault('NPLUSONE_THRESHOLD', DEFAULT_THRESHOLD)
+    if app.config['NPLUSONE_MODE'] not in (None,) + MODES:
+        raise ValueError(f"Unknown NPLUSONE_MODE {app.config['NPLUSONE_MODE']!r}")
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+
+
+def check_n_plus_one():
+    """Request every page in raise mode; returns (pages checked, [(endpoint, url, message)])."""
+    users = {
+        role: User.query.filter_by(role=role, is_active=True).order_by(User.id).first()
+        for role in set(BLUEPRINT_ROLES.values())
+    }
+    clients = {role: logged_in_client(user) for role, user in users.items() if user}
+
+    found = []
+    checked = 0
+    saved = {key: app.config[key] for key in ('NPLUSONE_MODE', 'PROPAGATE_EXCEPTIONS')}
+    app.config.update(NPLUSONE_MODE='raise', PROPAGATE_EXCEPTIONS=True)
+    try:
+        for endpoint, role, url in list(page_urls()):
+            if role not in clients:
+                continue
+            checked += 1
+            try:
+                clients[role].get(url)
+            except NPlusOneError as error:
+                found.append((endpoint, url, str(error)))
+            except Exception as error:
+                # A page that fails for another reason is not this check's finding
+                logger.warning('%s failed: %r', url, error)
+    finally:
+        app.config.update(saved)
+        db.session.remove()
+    return checked, found
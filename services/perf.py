@@ -0,0 +1,234 @@
+"""Per-request SQL and render instrumentation.
+
+Cursor events on the engine count and time every statement a request runs,
+and the template signals time the render. When a request ends the figures are
+sent as a ``Server-Timing`` header (next to any the view set itself, such as
+the dashboard query timings) and written as one ``perf`` log line:
+
+    perf endpoint=admin.evacuees status=200 total_ms=41.20 db_ms=12.85 queries=4 render_ms=20.11 slowest_ms=6.02
+
+Each endpoint keeps its last ``WINDOW`` requests for the p95 figures on
+``/admin/perf``. Statements slower than ``PERF_SLOW_QUERY_MS`` (default 100)
+go into a rolling slow-query log with their parameters and, for SELECTs, the
+``EXPLAIN`` output (see ``services.query_plans``). The EXPLAIN is run when
+``/admin/perf`` shows the log, not inside the slow request, and the plans of
+the last ``PLAN_CACHE_SIZE`` distinct statements are kept so each is explained
+once.
+
+The figures are kept in the memory of each worker process, so with several
+gunicorn workers ``/admin/perf`` shows the requests the answering worker
+served. Statements run while a streamed response (CSV export) is being sent
+happen after the request is measured and are not counted.
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict, defaultdict, deque
+from datetime import datetime
+from statistics import quantiles
+
+from flask import before_render_template, current_app, g, has_request_context, request, template_rendered
+from sqlalchemy import event
+
+from app import db
+from services.query_plans import full_scans
+
+logger = logging.getLogger('perf')
+
+DEFAULT_SLOW_QUERY_MS = 100
+WINDOW = 500  # requests kept per endpoint
+SLOW_LOG_SIZE = 100
+PLAN_CACHE_SIZE = 256
+IGNORED_ENDPOINTS = {'static'}
+
+
+class RequestProfile:
+    def __init__(self, slow_query_ms):
+        self.started = time.perf_counter()
+        self.slow_query_ms = slow_query_ms
+        self.queries = 0
+        self.db_ms = 0.0
+        self.render_ms = 0.0
+        self.slowest_ms = 0.0
+        self.slow = []  # (ms, statement, parameters) of the statements over the threshold
+        self._render_started = []
+
+    def add_query(self, statement, parameters, ms):
+        self.queries += 1
+        self.db_ms += ms
+        self.slowest_ms = max(self.slowest_ms, ms)
+        if ms >= self.slow_query_ms:
+            self.slow.append((ms, statement, parameters))
+
+    @property
+    def total_ms(self):
+        return (time.perf_counter() - self.started) * 1000
+
+    def server_timing(self, total_ms):
+        return (f'sql;dur={self.db_ms:.2f};desc="{self.queries} queries", '
+                f'render;dur={self.render_ms:.2f}, app;dur={total_ms:.2f}')
+
+
+class PerfStats:
+    """Rolling per-endpoint request figures and the slow-query log of this process."""
+
+    def __init__(self):
+        self.requests = defaultdict(lambda: deque(maxlen=WINDOW))  # endpoint -> (total_ms, db_ms, queries)
+        self.slow_queries = deque(maxlen=SLOW_LOG_SIZE)
+        self.plans = OrderedDict()  # statement -> EXPLAIN lines, least recently used first
+        self._lock = threading.Lock()
+
+    def record(self, endpoint, total_ms, profile):
+        with self._lock:
+            self.requests[endpoint].append((total_ms, profile.db_ms, profile.queries))
+
+    def record_slow(self, endpoint, ms, statement, parameters):
+        with self._lock:
+            self.slow_queries.appendleft({
+                'at': datetime.now(),
+                'endpoint': endpoint,
+                'ms': ms,
+                'statement': statement,
+                'parameters': repr(parameters)[:500],
+                'plan': None,  # explained by slow_log()
+                '_bound': parameters,
+            })
+
+    def slow_log(self):
+        """The slow-query log, newest first, each SELECT with its EXPLAIN lines."""
+        with self._lock:
+            entries = list(self.slow_queries)
+        for entry in entries:
+            if entry['plan'] is None:
+                entry['plan'] = self._plan(entry['statement'], entry.pop('_bound', None))
+        return entries
+
+    def _plan(self, statement, parameters):
+        if not statement.lstrip().upper().startswith('SELECT'):
+            return []
+        with self._lock:
+            plan = self.plans.get(statement)
+            if plan is not None:
+                self.plans.move_to_end(statement)
+                return plan
+        plan = _explain(statement, parameters)
+        with self._lock:
+            self.plans[statement] = plan
+            self.plans.move_to_end(statement)
+            while len(self.plans) > PLAN_CACHE_SIZE:
+                self.plans.popitem(last=False)
+        return plan
+
+    def endpoints(self):
+        """Per-endpoint summary rows, slowest p95 first."""
+        with self._lock:
+            samples = {endpoint: list(requests) for endpoint, requests in self.requests.items()}
+        rows = []
+        for endpoint, requests in samples.items():
+            totals = sorted(total for total, db_ms, queries in requests)
+            query_counts = [queries for total, db_ms, queries in requests]
+            rows.append({
+                'endpoint': endpoint,
+                'requests': len(requests),
+                'p50_ms': _percentile(totals, 50),
+                'p95_ms': _percentile(totals, 95),
+                'max_ms': totals[-1],
+                'avg_db_ms': sum(db_ms for total, db_ms, queries in requests) / len(requests),
+                'avg_queries': sum(query_counts) / len(requests),
+                'max_queries': max(query_counts),
+            })
+        return sorted(rows, key=lambda row: row['p95_ms'], reverse=True)
+
+    def clear(self):
+        with self._lock:
+            self.requests.clear()
+            self.slow_queries.clear()
+            self.plans.clear()
+
+
+def _percentile(sorted_values, percent):
+    if len(sorted_values) == 1:
+        return sorted_values[0]
+    return quantiles(sorted_values, n=100, method='inclusive')[percent - 1]
+
+
+def _explain(statement, parameters):
+    # On a connection of its own: the request's transaction may already be closed
+    try:
+        with db.engine.connect() as connection:
+            tables, plan = full_scans(connection, statement, parameters)
+        return plan
+    except Exception as error:
+        return [f'EXPLAIN failed: {error}']
+
+
+perf_stats = PerfStats()
+
+
+# Engine and template hooks
+
+# The start time rides on the statement's execution context, which is dropped with it when the
+# statement fails (after_cursor_execute is not called then)
+
+def _before_cursor_execute(connection, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._perf_started = time.perf_counter()
+
+
+def _after_cursor_execute(connection, cursor, statement, parameters, context, executemany):
+    started = getattr(context, '_perf_started', None)
+    profile = g.get('perf') if has_request_context() else None
+    if profile is not None and started is not None:
+        profile.add_query(statement, parameters, (time.perf_counter() - started) * 1000)
+
+
+def _before_render(sender, template, context, **extra):
+    profile = g.get('perf')
+    if profile is not None:
+        profile._render_started.append(time.perf_counter())
+
+
+def _rendered(sender, template, context, **extra):
+    profile = g.get('perf')
+    if profile is not None and profile._render_started:
+        profile.render_ms += (time.perf_counter() - profile._render_started.pop()) * 1000
+
+
+# Request hooks
+
+def _start_request():
+    g.perf = RequestProfile(current_app.config['PERF_SLOW_QUERY_MS'])
+
+
+def _finish_request(response):
+    profile = g.pop('perf', None)
+    if profile is None or request.endpoint is None or request.endpoint in IGNORED_ENDPOINTS:
+        return response
+    total_ms = profile.total_ms
+    endpoint = request.endpoint
+
+    timing = profile.server_timing(total_ms)
+    if 'Server-Timing' in response.headers:
+        timing = response.headers['Server-Timing'] + ', ' + timing
+    response.headers['Server-Timing'] = timing
+
+    logger.info(
+        'perf endpoint=%s status=%s total_ms=%.2f db_ms=%.2f queries=%d render_ms=%.2f slowest_ms=%.2f',
+        endpoint, response.status_code, total_ms, profile.db_ms, profile.queries, profile.render_ms,
+        profile.slowest_ms
+    )
+    perf_stats.record(endpoint, total_ms, profile)
+    for ms, statement, parameters in profile.slow:
+        perf_stats.record_slow(endpoint, ms, statement, parameters)
+    return response
+
+
+def init_app(app):
+    """Install the hooks; call before the other before_request hooks are added so their queries count."""
+    app.config.setdefault('PERF_SLOW_QUERY_MS', DEFAULT_SLOW_QUERY_MS)
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+    event.listen(db.engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(db.engine, 'after_cursor_execute', _after_cursor_execute)
+    before_render_template.connect(_before_render, app)
+    template_rendered.connect(_rendered, app)
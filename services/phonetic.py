@@ -0,0 +1,112 @@
+"""Phonetic keys for names as they are spelled on intake forms.
+
+``phonetic_key`` reduces a name to the consonant sounds it is written with,
+in the manner of Metaphone, so spellings of one name written down by ear get
+the same key: "Cristine", "Christine" and "Kristine" are all ``KRSTN``;
+"Villanueva" and "Bilyanueba" ``BYNWB``; "Juan" and "Huan" ``HWN``.
+
+The rules follow Filipino and Spanish spelling rather than English:
+
+* b and v are one sound, and so are f, ph and p; z and s; k, q, c and g
+  (g is hard, as Filipino writes it: Miguel, Migel)
+* a leading j, and a leading h before a vowel, are one sound (Jose, Hose;
+  Jhon, Jon); elsewhere h is silent, and doubled letters count once
+* ch and ts are one sound (Chavez, Tsabes); ll and ly before a vowel are y
+  (Guillermo, Giyermo), ny is plain n; gu and qu before e or i are k
+* soft c (before e, i, y) is s
+* vowels are dropped after the first sound, except before another vowel:
+  there i and e are y (Maria, Marya) and a, o and u are w (Eduardo, Edwardo);
+  a leading vowel is kept as ``A``
+
+Words are run together first, so "Dela Cruz", "De la Cruz" and "Delacruz"
+share a key. Accents are dropped with the rest of the normalisation
+(``normalize_name``). Keys are at most ``KEY_LENGTH`` letters; a name with no
+letters has the key ``''``.
+"""
+import re
+import unicodedata
+
+KEY_LENGTH = 12
+
+_not_letters = re.compile(r'[^a-z ]+')
+_doubled = re.compile(r'(.)\1+')
+VOWELS = frozenset('aeiou')
+SOFTENING = frozenset('eiy')
+# Letters that always stand for one sound, whatever surrounds them
+SIMPLE = {'b': 'B', 'v': 'B', 'f': 'P', 'p': 'P', 'd': 'T', 't': 'T', 'k': 'K', 'q': 'K',
+          'j': 'J', 'l': 'L', 'm': 'M', 'n': 'N', 'r': 'R', 's': 'S', 'z': 'S', 'x': 'KS'}
+
+
+def normalize_name(name):
+    """Lower case ASCII letters and single spaces: accents dropped, punctuation removed."""
+    ascii_name = unicodedata.normalize('NFKD', name or '').encode('ascii', 'ignore').decode('ascii')
+    return ' '.join(_not_letters.sub(' ', ascii_name.lower()).split())
+
+
+def _vowel(letters, index):
+    return index < len(letters) and letters[index] in VOWELS
+
+
+def _sound(letters, index):
+    """The code of the letter at ``index`` ('' when silent) and how many letters it takes up."""
+    letter = letters[index]
+    following = letters[index + 1] if index + 1 < len(letters) else ''
+
+    if letter in VOWELS:
+        if _vowel(letters, index + 1) and index > 0:
+            return ('Y' if letter in 'ie' else 'W'), 1
+        return '', 1
+    if letter == 'y':
+        return ('Y' if _vowel(letters, index + 1) else ''), 1
+    if letter == 'w':
+        return ('W' if _vowel(letters, index + 1) else ''), 1
+    if letter == 'h':
+        return '', 1
+    if letter == 'l' and following in ('l', 'y'):
+        if _vowel(letters, index + 2):
+            return 'Y', 2  # Villanueva, Bilyanueba
+        if following == 'l':
+            return 'L', 2
+    if letter == 'p' and following == 'h':
+        return 'P', 2
+    if letter == 't' and following in ('h', 's'):
+        return ('T', 2) if following == 'h' else ('C', 2)
+    if letter == 'c':
+        if following == 'h':
+            # Christine, Chloe: ch before a consonant is k
+            return ('K', 2) if index + 2 < len(letters) and not _vowel(letters, index + 2) else ('C', 2)
+        if following == 'k':
+            return 'K', 2
+        return ('S' if following in SOFTENING else 'K'), 1
+    if letter == 'g':
+        if following == 'u' and index + 2 < len(letters) and letters[index + 2] in SOFTENING:
+            return 'K', 2  # Guillermo, Miguel: the u is silent
+        return 'K', 1
+    if letter == 'q' and following == 'u':
+        return 'K', 2
+    if letter == 'n' and following == 'y' and _vowel(letters, index + 2):
+        return 'N', 2  # Senyor
+    return SIMPLE.get(letter, ''), 1
+
+
+def phonetic_key(name):
+    """Phonetic key of a name (see the module docstring): ``'KRSTN'`` for "Cristine"."""
+    letters = normalize_name(name).replace(' ', '')
+    # Doubled letters count once (Jennifer, Jenifer), except ll, which is a sound of its own
+    letters = _doubled.sub(lambda match: match.group(1) * (2 if match.group(1) == 'l' else 1), letters)
+    if not letters:
+        return ''
+
+    index = 0
+    codes = []
+    if letters[0] == 'j' or (letters[0] == 'h' and _vowel(letters, 1)):
+        codes.append('H')  # Juan, Huan
+        index += 1
+    elif letters[0] in VOWELS or (letters[0] == 'y' and not _vowel(letters, 1)):
+        codes.append('A')  # Ybanez, Ibanez
+        index += 1
+    while index < len(letters):
+        code, width = _sound(letters, index)
+        codes.append(code)
+        index += width
+    return ''.join(codes)[:KEY_LENGTH]
@@ -0,0 +1,197 @@
+"""Assigning evacuees who have no center yet to active centers, families kept together.
+
+``place_evacuees`` takes everyone present without a center (or only the
+families asked for), groups them by family (evacuees with no family are a
+group of one) and assigns every group as a whole to an active center with
+room for it. A group with special needs (any member with special needs
+recorded) only goes to centers that accept them; other groups go to the
+remaining centers first, so room in those centers is kept for the groups
+that can go nowhere else. A family some of whose members are already at a
+center joins them there when it has room, and, if the family has special
+needs, when that center accepts them.
+
+The assignment itself (``plan_placement``) works on a snapshot of the free
+capacities held in memory: groups largest first, each into the center with
+the least room that still fits it (best-fit decreasing), found by bisecting
+a sorted list of free capacities. Groups that fit nowhere are left
+unplaced and reported; a family is never split.
+
+The snapshot is taken with the centers and evacuees locked
+(``SELECT ... FOR UPDATE``) and the result is written in the same
+transaction: one UPDATE per center for its evacuees, and the occupancy
+counters adjusted with ``models.apply_occupancy_deltas``. As in
+``services.roster``, an UPDATE touching fewer rows than were locked
+(possible on SQLite, which has no row locks) rolls everything back with
+``PlacementConflict``.
+"""
+from bisect import bisect_left, insort
+from collections import Counter, defaultdict, namedtuple
+from datetime import datetime
+
+from sqlalchemy import func, select, update
+
+from app import db
+from models import EvacuationCenter, Evacuee, apply_occupancy_deltas, mark_tables_changed
+
+CHUNK_SIZE = 1000
+# Only people present are given a place; the missing and deceased keep none
+PLACED_STATUS = 'present'
+
+# members: evacuee ids; preferred: center already holding some of the family, if any
+PlacementGroup = namedtuple('PlacementGroup', 'key members special_needs preferred')
+CenterRoom = namedtuple('CenterRoom', 'id room accepts_special_needs')
+
+
+class PlacementConflict(RuntimeError):
+    """Another transaction changed some of the evacuees first; nothing was changed."""
+
+
+class PlacementReport:
+    def __init__(self):
+        self.placed = {}  # group key -> center id
+        self.unplaced = []  # group keys that fit no center
+        self.evacuees = 0
+
+    @property
+    def centers(self):
+        return len(set(self.placed.values()))
+
+    def as_dict(self):
+        return {
+            'groups': len(self.placed),
+            'evacuees': self.evacuees,
+            'centers': self.centers,
+            'unplaced': [list(key) for key in self.unplaced],
+        }
+
+
+def plan_placement(groups, centers):
+    """Assign each of ``groups`` to one of ``centers`` (``CenterRoom``); returns a ``PlacementReport``.
+
+    Pure computation over the snapshot given; nothing is read or written.
+    """
+    report = PlacementReport()
+    # Free room as sorted (room, center id) lists, one per kind of center
+    general = sorted((center.room, center.id) for center in centers
+                     if center.room > 0 and not center.accepts_special_needs)
+    special = sorted((center.room, center.id) for center in centers
+                     if center.room > 0 and center.accepts_special_needs)
+    pools = {center.id: special if center.accepts_special_needs else general for center in centers}
+    room = {center.id: center.room for center in centers}
+    accepting = {center.id for center in centers if center.accepts_special_needs}
+
+    def take(pool, center_id, size):
+        pool.pop(bisect_left(pool, (room[center_id], center_id)))
+        room[center_id] -= size
+        if room[center_id] > 0:
+            insort(pool, (room[center_id], center_id))
+
+    def best_fit(pool, size):
+        index = bisect_left(pool, (size,))
+        return pool[index][1] if index < len(pool) else None
+
+    # Hardest to place first: the largest groups, special needs before the rest
+    for group in sorted(groups, key=lambda group: (-len(group.members), not group.special_needs, group.key)):
+        size = len(group.members)
+        center_id = None
+        if (group.preferred in room and room[group.preferred] >= size
+                and (not group.special_needs or group.preferred in accepting)):
+            center_id = group.preferred
+        elif group.special_needs:
+            center_id = best_fit(special, size)
+        else:
+            center_id = best_fit(general, size) or best_fit(special, size)
+        if center_id is None:
+            report.unplaced.append(group.key)
+            continue
+        take(pools[center_id], center_id, size)
+        report.placed[group.key] = center_id
+        report.evacuees += size
+    return report
+
+
+def _snapshot_centers():
+    rows = db.session.execute(
+        select(EvacuationCenter.id, EvacuationCenter.capacity, EvacuationCenter.occupancy_count,
+               EvacuationCenter.accepts_special_needs)
+        .where(EvacuationCenter.status == 'active').order_by(EvacuationCenter.id).with_for_update()
+    ).all()
+    return [CenterRoom(center_id, capacity - (occupancy or 0), bool(accepts))
+            for center_id, capacity, occupancy, accepts in rows]
+
+
+def _snapshot_groups(family_ids):
+    conditions = [Evacuee.evacuation_center_id.is_(None), Evacuee.status == PLACED_STATUS]
+    if family_ids is not None:
+        conditions.append(Evacuee.family_id.in_(sorted(set(family_ids))))
+    rows = db.session.execute(
+        select(Evacuee.id, Evacuee.family_id, func.coalesce(func.trim(Evacuee.special_needs), '') != '')
+        .where(*conditions).order_by(Evacuee.id).with_for_update()
+    ).all()
+
+    members = defaultdict(list)
+    special_needs = set()
+    for evacuee_id, family_id, needs in rows:
+        key = ('family', family_id) if family_id is not None else ('evacuee', evacuee_id)
+        members[key].append(evacuee_id)
+        if needs:
+            special_needs.add(key)
+
+    # Centers already holding part of a family; the one holding most of it wins
+    family_keys = [family_id for kind, family_id in members if kind == 'family']
+    preferred = {}
+    for start in range(0, len(family_keys), CHUNK_SIZE):
+        placed = db.session.execute(
+            select(Evacuee.family_id, Evacuee.evacuation_center_id, func.count(Evacuee.id))
+            .where(Evacuee.family_id.in_(family_keys[start:start + CHUNK_SIZE]),
+                   Evacuee.evacuation_center_id.isnot(None))
+            .group_by(Evacuee.family_id, Evacuee.evacuation_center_id)
+            .order_by(func.count(Evacuee.id))
+        ).all()
+        preferred.update((('family', family_id), center_id) for family_id, center_id, count in placed)
+
+    return [PlacementGroup(key, ids, key in special_needs, preferred.get(key)) for key, ids in members.items()]
+
+
+def place_evacuees(family_ids=None, dry_run=False):
+    """Give every present evacuee without a center a place; returns a ``PlacementReport``.
+
+    ``family_ids`` limits the placement to those families. With ``dry_run``
+    the plan is made and reported but nothing is written.
+    """
+    try:
+        centers = _snapshot_centers()
+        groups = _snapshot_groups(family_ids)
+        report = plan_placement(groups, centers)
+        if dry_run or not report.placed:
+            db.session.rollback()
+            return report
+
+        members = {group.key: group.members for group in groups}
+        by_center = defaultdict(list)
+        for key, center_id in report.placed.items():
+            by_center[center_id].extend(members[key])
+
+        deltas = defaultdict(Counter)
+        now = datetime.now()
+        for center_id, evacuee_ids in sorted(by_center.items()):
+            for start in range(0, len(evacuee_ids), CHUNK_SIZE):
+                chunk = evacuee_ids[start:start + CHUNK_SIZE]
+                result = db.session.execute(
+                    update(Evacuee)
+                    .where(Evacuee.id.in_(chunk), Evacuee.evacuation_center_id.is_(None),
+                           Evacuee.status == PLACED_STATUS)
+                    .values(evacuation_center_id=center_id, updated_at=now)
+                    .execution_options(synchronize_session=False)
+                )
+                if result.rowcount != len(chunk):
+                    raise PlacementConflict(f'{len(chunk) - result.rowcount} evacuee(s) changed while placing')
+            deltas[center_id]['occupancy_count'] += len(evacuee_ids)
+            deltas[center_id][f'{PLACED_STATUS}_count'] += len(evacuee_ids)
+        apply_occupancy_deltas(db.session, deltas)
+        mark_tables_changed(db.session, Evacuee.__tablename__)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return report
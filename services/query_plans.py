@@ -0,0 +1,126 @@
+"""EXPLAIN checks of the SQL the pages run.
+
+``flask check-query-plans`` requests every GET page as a user of the role it
+belongs to, records the SELECT statements each one runs and passes them through
+the database's EXPLAIN. Statements that read one of ``LARGE_TABLES`` with a full
+table scan are reported and the command fails, so a filter or sort without a
+supporting index is caught before the tables grow.
+
+Run it against a database holding realistic volumes: on near-empty tables
+MySQL (rightly) prefers a scan even where an index exists. A scan that walks
+the table in ORDER BY order under a LIMIT (the lookup lists) stops after a page
+and is not reported.
+"""
+import re
+
+from sqlalchemy import event, func, select
+
+from app import app, db
+from models import User, EvacuationCenter, Evacuee, Family, Donation, InventoryItem
+from services.benchmark import logged_in_client
+
+# Tables expected to grow without bound; scanning the others (centers) is fine
+LARGE_TABLES = {'user', 'evacuee', 'family', 'donation', 'inventory_item', 'stock_movement'}
+
+# Role each blueprint's pages are requested as
+BLUEPRINT_ROLES = {'admin': 'admin', 'volunteer': 'volunteer', 'donor': 'donor', 'lookup': 'volunteer'}
+
+# URL arguments filled in with the id of an existing record
+ID_ARGUMENTS = {
+    'evacuee_id': Evacuee,
+    'family_id': Family,
+    'center_id': EvacuationCenter,
+    'item_id': InventoryItem,
+    'donation_id': Donation,
+    'user_id': User,
+}
+
+# Endpoints that read whole tables on purpose
+SCAN_ALLOWED = {
+    # CSV exports stream every matching row
+    'admin.export_evacuees', 'admin.export_donations', 'admin.export_inventory',
+    'volunteer.export_evacuees', 'volunteer.export_donations', 'volunteer.export_inventory',
+    # Whole-table aggregates, computed once per cache version (services/dashboard.py)
+    'admin.dashboard', 'volunteer.dashboard', 'donor.dashboard',
+    # The family list is not paginated yet
+    'admin.families',
+    # The allocation plan shares out every available line across the centers (services/allocation.py)
+    'volunteer.allocation',
+}
+
+_sqlite_scan = re.compile(r'^SCAN (?:TABLE )?(\w+)(?: AS \w+)?$')
+_postgres_scan = re.compile(r'Seq Scan on (\w+)')
+_alias_suffix = re.compile(r'_\d+$')
+_ordered_limit = re.compile(r'\bORDER BY\b.*\bLIMIT\b', re.IGNORECASE | re.DOTALL)
+
+
+def full_scans(connection, statement, parameters):
+    """Large tables that ``statement`` reads with a full scan, and its plan as text lines."""
+    dialect = connection.dialect.name
+    if dialect == 'sqlite':
+        plan = [row[-1] for row in connection.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters)]
+        tables = [match.group(1) for match in map(_sqlite_scan.match, plan) if match]
+        # SQLite reports a rowid-order walk that stops at the LIMIT as a plain SCAN
+        if _ordered_limit.search(statement) and not any('TEMP B-TREE' in line for line in plan):
+            tables = []
+    elif dialect in ('mysql', 'mariadb'):
+        rows = [row._mapping for row in connection.exec_driver_sql('EXPLAIN ' + statement, parameters)]
+        plan = [f"{row['table']}: type={row['type']} key={row['key']} rows={row['rows']}" for row in rows]
+        # The table column holds the alias; SQLAlchemy aliases a table as <name>_<n>
+        tables = [_alias_suffix.sub('', row['table'] or '') for row in rows if row['type'] == 'ALL']
+    else:
+        plan = [row[0] for row in connection.exec_driver_sql('EXPLAIN ' + statement, parameters)]
+        tables = [match.group(1) for match in map(_postgres_scan.search, plan) if match]
+    return sorted({table for table in tables if table in LARGE_TABLES}), plan
+
+
+def page_urls():
+    """(endpoint, role, url) for every GET page that can be requested without extra input."""
+    ids = {argument: db.session.scalar(select(func.max(model.id))) for argument, model in ID_ARGUMENTS.items()}
+    adapter = app.url_map.bind('localhost')
+    for rule in sorted(app.url_map.iter_rules(), key=lambda rule: rule.rule):
+        role = BLUEPRINT_ROLES.get(rule.endpoint.partition('.')[0])
+        if not role or 'GET' not in rule.methods:
+            continue
+        if not all(ids.get(argument) for argument in rule.arguments):
+            continue
+        yield rule.endpoint, role, adapter.build(rule.endpoint, {argument: ids[argument] for argument in rule.arguments})
+
+
+def check_query_plans():
+    """Request and EXPLAIN every page; returns (pages checked, [(endpoint, url, tables, statement, plan)])."""
+    users = {
+        role: User.query.filter_by(role=role, is_active=True).order_by(User.id).first()
+        for role in set(BLUEPRINT_ROLES.values())
+    }
+    clients = {role: logged_in_client(user) for role, user in users.items() if user}
+
+    statements = []
+
+    def record(connection, cursor, statement, parameters, context, executemany):
+        if not executemany and statement.lstrip().upper().startswith('SELECT'):
+            statements.append((statement, parameters))
+
+    problems = []
+    checked = 0
+    event.listen(db.engine, 'before_cursor_execute', record)
+    try:
+        for endpoint, role, url in list(page_urls()):
+            if role not in clients or endpoint in SCAN_ALLOWED:
+                continue
+            statements.clear()
+            clients[role].get(url)
+            checked += 1
+            # Explained after the request, on a connection of its own
+            seen = set()
+            with db.engine.connect() as connection:
+                for statement, parameters in list(statements):
+                    if statement in seen:
+                        continue
+                    seen.add(statement)
+                    tables, plan = full_scans(connection, statement, parameters)
+                    if tables:
+                        problems.append((endpoint, url, tables, statement, plan))
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', record)
+    return checked, problems
@@ -0,0 +1,74 @@
+"""Changing the status of many evacuees at once (roll calls, relocations).
+
+``set_evacuee_status`` changes every evacuee picked by id, by center or both
+with one ``UPDATE``, instead of loading and flushing each one. The rows are
+locked first (``SELECT ... FOR UPDATE``) and read for their center and
+previous status, from which the centers' per-status counters are adjusted in
+the same transaction (``models.apply_occupancy_deltas``); a status change
+moves people between those counters and leaves the occupancy itself alone.
+
+As in ``services.stock``, if the UPDATE touches fewer rows than were locked
+(possible on SQLite, which has no row locks) the counters would no longer
+match, so the change is rolled back with ``RosterConflict``.
+"""
+from collections import Counter, defaultdict
+from datetime import datetime
+
+from sqlalchemy import select, update
+
+from app import db
+from models import EVACUEE_STATUSES, Evacuee, apply_occupancy_deltas, mark_tables_changed
+
+
+class RosterConflict(RuntimeError):
+    """Another transaction changed some of the evacuees first; nothing was changed."""
+
+
+def set_evacuee_status(status, evacuee_ids=None, center_id=None, current_status=None):
+    """Set ``status`` on the evacuees picked; returns the number of evacuees changed.
+
+    Evacuees are picked by ``evacuee_ids``, by ``center_id`` (a whole
+    center's roster) or both, optionally only those whose status is
+    ``current_status``. Evacuees already in ``status`` are not counted.
+    """
+    if status not in EVACUEE_STATUSES:
+        raise ValueError(f'Unknown evacuee status {status!r}')
+    if evacuee_ids is None and center_id is None:
+        raise ValueError('Pick the evacuees by id or by center')
+
+    conditions = [Evacuee.status.is_distinct_from(status)]
+    if evacuee_ids is not None:
+        conditions.append(Evacuee.id.in_(sorted(set(evacuee_ids))))
+    if center_id is not None:
+        conditions.append(Evacuee.evacuation_center_id == center_id)
+    if current_status:
+        conditions.append(Evacuee.status == current_status)
+
+    rows = db.session.execute(
+        select(Evacuee.evacuation_center_id, Evacuee.status).where(*conditions).order_by(Evacuee.id).with_for_update()
+    ).all()
+    if not rows:
+        return 0
+
+    try:
+        result = db.session.execute(
+            update(Evacuee).where(*conditions).values(status=status, updated_at=datetime.now())
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount != len(rows):
+            raise RosterConflict(f'{len(rows) - result.rowcount} evacuee(s) changed while updating')
+
+        deltas = defaultdict(Counter)
+        for previous_center, previous_status in rows:
+            if previous_center is None:
+                continue
+            if previous_status in EVACUEE_STATUSES:
+                deltas[previous_center][f'{previous_status}_count'] -= 1
+            deltas[previous_center][f'{status}_count'] += 1
+        apply_occupancy_deltas(db.session, deltas)
+        mark_tables_changed(db.session, Evacuee.__tablename__)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return len(rows)
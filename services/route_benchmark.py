@@ -0,0 +1,155 @@
+"""Latency, query count, memory and size of every page, with regression checks.
+
+``flask benchmark-routes`` seeds the database (``services.seed``) at each
+requested number of evacuees, the other tables scaled in proportion, then
+requests every GET page of the admin, volunteer and donor blueprints as each
+role allowed on it (``permissions.py``) through the test client. For each
+page it records the p50 and p95 latency over ``repeat`` requests, the number
+of SQL statements, the peak Python memory allocated while serving it
+(``tracemalloc``, measured on a separate request) and the response size.
+Pages that redirect the role elsewhere are left out.
+
+Results are written as JSON. Given the JSON of an earlier run as a baseline,
+a page regresses when its p95 latency or response size grows by more than
+the threshold (a fraction; latency must also grow by at least
+``MIN_LATENCY_DELTA_MS``, so noise on fast pages is ignored), or when it runs
+more SQL statements than before.
+
+Seeding replaces the data in the database, so run this against a scratch
+database only; ``--no-seed`` measures the data already there instead.
+"""
+import json
+import tracemalloc
+from datetime import datetime
+from statistics import median, quantiles
+from time import perf_counter
+
+from sqlalchemy import event, func, select
+
+from app import app, db
+from models import Evacuee, User
+from services.benchmark import logged_in_client
+from services.query_plans import page_urls
+from services.seed import DEFAULT_COUNTS, Seeder, reset_data
+
+DEFAULT_SCALES = (1000, 10000, 100000)
+DEFAULT_THRESHOLD = 0.25
+MIN_LATENCY_DELTA_MS = 10
+BLUEPRINTS = ('admin', 'volunteer', 'donor')
+SEED = 1
+
+
+def _p95(timings):
+    if len(timings) == 1:
+        return timings[0]
+    return quantiles(timings, n=20, method='inclusive')[-1]
+
+
+def _seed(rows):
+    reset_data()
+    Seeder(SEED, scale=rows / DEFAULT_COUNTS['evacuees']).run()
+
+
+def _pages(clients):
+    """(endpoint, role, url) for every GET page of ``BLUEPRINTS``, once per role allowed on it."""
+    policies = app.extensions['permissions']
+    for endpoint, role, url in page_urls():
+        if endpoint.partition('.')[0] not in BLUEPRINTS:
+            continue
+        for role in sorted(policies[endpoint]):
+            if role in clients:
+                yield endpoint, role, url
+
+
+def _measure(client, url, repeat, statements):
+    def fetch():
+        # The body is read inside the measurement, so streamed exports count in full
+        response = client.get(url)
+        body = response.get_data()
+        response.close()
+        return response.status_code, len(body)
+
+    timings = []
+    for _ in range(repeat):
+        statements.clear()
+        start = perf_counter()
+        status, size = fetch()
+        timings.append((perf_counter() - start) * 1000)
+    queries = len(statements)
+
+    tracemalloc.start()
+    try:
+        fetch()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'status': status,
+        'p50_ms': round(median(timings), 2),
+        'p95_ms': round(_p95(timings), 2),
+        'queries': queries,
+        'peak_kb': round(peak / 1024, 1),
+        'bytes': size,
+    }
+
+
+def benchmark_routes(scales=DEFAULT_SCALES, repeat=10, seed=True):
+    """Yield one result dict per (scale, page, role) as it is measured."""
+    statements = []
+
+    def record(connection, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    for rows in (sorted(scales) if seed else [None]):
+        if rows is not None:
+            _seed(rows)
+        else:
+            rows = db.session.scalar(select(func.count(Evacuee.id)))
+        users = {
+            role: User.query.filter_by(role=role, is_active=True).order_by(User.id).first()
+            for role in ('admin', 'volunteer', 'donor')
+        }
+        clients = {role: logged_in_client(user) for role, user in users.items() if user}
+
+        event.listen(db.engine, 'before_cursor_execute', record)
+        try:
+            for endpoint, role, url in list(_pages(clients)):
+                result = _measure(clients[role], url, repeat, statements)
+                if 300 <= result['status'] < 400:
+                    continue
+                yield dict(rows=rows, role=role, endpoint=endpoint, url=url, **result)
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', record)
+            db.session.remove()
+
+
+def save_results(path, results):
+    with open(path, 'w') as stream:
+        json.dump({'created_at': datetime.now().isoformat(timespec='seconds'), 'results': results}, stream, indent=1)
+
+
+def load_results(path):
+    with open(path) as stream:
+        return json.load(stream)['results']
+
+
+def regressions(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """[(result, baseline result, [reasons])] for every page that got worse than its baseline."""
+    previous = {(result['rows'], result['role'], result['endpoint']): result for result in baseline}
+    found = []
+    for result in results:
+        before = previous.get((result['rows'], result['role'], result['endpoint']))
+        if before is None:
+            continue
+        reasons = []
+        if (result['p95_ms'] > before['p95_ms'] * (1 + threshold)
+                and result['p95_ms'] - before['p95_ms'] >= MIN_LATENCY_DELTA_MS):
+            reasons.append(f'p95 {before["p95_ms"]:.1f} -> {result["p95_ms"]:.1f} ms')
+        if result['queries'] > before['queries']:
+            reasons.append(f'queries {before["queries"]} -> {result["queries"]}')
+        if result['bytes'] > before['bytes'] * (1 + threshold):
+            reasons.append(f'bytes {before["bytes"]} -> {result["bytes"]}')
+        if reasons:
+            found.append((result, before, reasons))
+    return found
@@ -0,0 +1,311 @@
+"""Indexed full-text search over evacuees, families, centers, donations, inventory and users.
+
+Searchable text lives in one shadow table, ``search_document``, with a row per
+indexed record. On SQLite it is an FTS5 virtual table; on MySQL/MariaDB an
+InnoDB table with a FULLTEXT index. Session hooks keep it in step with the
+ORM inside the same transaction; ``flask rebuild-search-index`` rebuilds it
+after data is loaded behind the ORM's back.
+
+Each document id packs the entity code and the record id
+(``code << 32 | id``) so an entity's documents form one primary-key range,
+which both engines can restrict a match to without scanning.
+
+Search terms are split into words and every word is matched as a prefix, so
+``"mar san"`` finds "Maria Santos". Results can be ranked by relevance
+(``search``) or used as an id filter on an existing query (``filter_query``).
+
+Evacuees are also found by how their names sound, for relatives spelling a
+name the way they heard it: the phonetic keys stored on each evacuee
+(``services.phonetic``, kept up to date by the hooks in ``models.py``) are
+compared for equality on their indexes. A record matches when every word of
+the term sounds like its given or surname, when the whole term sounds like
+its surname ("dela krus"), or when the first word sounds like its given name
+and the rest like its surname ("jhon dela krus" for Jon Dela Cruz). Sound-alike
+matches rank after the records spelt as searched.
+"""
+import re
+from difflib import SequenceMatcher
+
+from sqlalchemy import Integer, and_, column, event, inspect, or_, select, text, union
+from sqlalchemy.orm import Session
+
+from app import db
+from models import (User, EvacuationCenter, Evacuee, Family, Donation, InventoryItem, given_name_phonetic,
+                    surname_phonetic)
+from services.phonetic import normalize_name
+
+# entity name -> (code, model, indexed columns)
+ENTITIES = {
+    'evacuee': (1, Evacuee, ('first_name', 'last_name', 'special_needs')),
+    'family': (2, Family, ('family_name',)),
+    'center': (3, EvacuationCenter, ('name', 'address')),
+    'donation': (4, Donation, ('description',)),
+    'inventory': (5, InventoryItem, ('description',)),
+    'user': (6, User, ('username', 'email', 'first_name', 'last_name')),
+}
+ENTITY_BY_MODEL = {model: name for name, (code, model, fields) in ENTITIES.items()}
+
+# model -> (given name, surname, and the columns holding their phonetic keys), for the models whose
+# records filter_query and search also find by sound
+PHONETIC_KEYS = {
+    Evacuee: (Evacuee.first_name, Evacuee.last_name, Evacuee.first_name_phonetic, Evacuee.last_name_phonetic),
+}
+
+ID_BITS = 32
+ID_MASK = (1 << ID_BITS) - 1
+MYSQL_MIN_TOKEN = 3  # innodb_ft_min_token_size; shorter words are matched with LIKE
+REBUILD_CHUNK = 1000
+
+_word = re.compile(r'\w+', re.UNICODE)
+
+
+def tokenize(value):
+    return _word.findall((value or '').lower())
+
+
+def document_body(obj, fields):
+    # Leading space so every word can also be found with LIKE '% word%'
+    return ' ' + ' '.join(word for field in fields for word in tokenize(getattr(obj, field)))
+
+
+def _doc_range(entity):
+    code = ENTITIES[entity][0]
+    return code << ID_BITS, (code << ID_BITS) | ID_MASK
+
+
+def _dialect(bind=None):
+    return (bind or db.engine).dialect.name
+
+
+def create_search_index(bind=None):
+    """Create the shadow table if needed; returns True when it was just created."""
+    bind = bind or db.engine
+    with bind.begin() as connection:
+        dialect = connection.dialect.name
+        if inspect(connection).has_table('search_document'):
+            return False
+        if dialect == 'sqlite':
+            connection.execute(text(
+                "CREATE VIRTUAL TABLE search_document USING fts5("
+                "body, tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+            ))
+        elif dialect in ('mysql', 'mariadb'):
+            connection.execute(text(
+                'CREATE TABLE search_document ('
+                'doc_id BIGINT NOT NULL PRIMARY KEY, body TEXT NOT NULL, '
+                'FULLTEXT KEY ft_search_document_body (body)'
+                ') ENGINE=InnoDB DEFAULT CHARSET=utf8mb4'
+            ))
+        else:
+            connection.execute(text(
+                'CREATE TABLE search_document (doc_id BIGINT NOT NULL PRIMARY KEY, body TEXT NOT NULL)'
+            ))
+    return True
+
+
+def _key_column(dialect):
+    return 'rowid' if dialect == 'sqlite' else 'doc_id'
+
+
+def _write_documents(connection, delete_ids, documents):
+    key = _key_column(connection.dialect.name)
+    ids = list(delete_ids) + [doc_id for doc_id, body in documents]
+    if ids:
+        connection.execute(text(f'DELETE FROM search_document WHERE {key} = :doc_id'),
+                           [{'doc_id': doc_id} for doc_id in ids])
+    if documents:
+        connection.execute(text(f'INSERT INTO search_document ({key}, body) VALUES (:doc_id, :body)'),
+                           [{'doc_id': doc_id, 'body': body} for doc_id, body in documents])
+
+
+def index_rows(connection, model, rows):
+    """(Re)index rows of ``(id, *indexed columns)`` written without the ORM (bulk inserts)."""
+    code = ENTITIES[ENTITY_BY_MODEL[model]][0]
+    documents = [
+        ((code << ID_BITS) | row[0], ' ' + ' '.join(word for value in row[1:] for word in tokenize(value)))
+        for row in rows
+    ]
+    _write_documents(connection, (), documents)
+    return len(documents)
+
+
+def indexed_columns(model):
+    fields = ENTITIES[ENTITY_BY_MODEL[model]][2]
+    return [model.id] + [getattr(model, field) for field in fields]
+
+
+def rebuild_search_index():
+    """Reindex every searchable record; returns the number of documents written."""
+    connection = db.session.connection()
+    connection.execute(text('DELETE FROM search_document'))
+    written = 0
+    for code, model, fields in ENTITIES.values():
+        columns = indexed_columns(model)
+        last_id = 0
+        # Keyset chunks rather than a streamed cursor, since writes share the connection
+        while True:
+            rows = db.session.query(*columns).filter(model.id > last_id).order_by(model.id).limit(REBUILD_CHUNK).all()
+            if not rows:
+                break
+            written += index_rows(connection, model, rows)
+            last_id = rows[-1][0]
+    db.session.commit()
+    return written
+
+
+def init_search_index():
+    """Called at startup: create the index and fill it from existing data the first time."""
+    if create_search_index():
+        rebuild_search_index()
+
+
+@event.listens_for(Session, 'after_flush')
+def _sync_search_documents(session, flush_context):
+    deleted, documents = [], []
+    for obj in session.deleted:
+        entity = ENTITY_BY_MODEL.get(type(obj))
+        if entity:
+            deleted.append((ENTITIES[entity][0] << ID_BITS) | obj.id)
+    for obj in session.new | session.dirty:
+        entity = ENTITY_BY_MODEL.get(type(obj))
+        if not entity or obj in session.deleted:
+            continue
+        code, model, fields = ENTITIES[entity]
+        state = inspect(obj)
+        if obj not in session.new and not any(state.attrs[field].history.has_changes() for field in fields):
+            continue
+        documents.append(((code << ID_BITS) | obj.id, document_body(obj, fields)))
+    if deleted or documents:
+        _write_documents(session.connection(), deleted, documents)
+
+
+def _match(entity, term, dialect):
+    """SQL fragment and parameters selecting the matching documents of ``entity``, or None."""
+    words = tokenize(term)
+    if not words:
+        return None
+    low, high = _doc_range(entity)
+    key = _key_column(dialect)
+    params = {'low': low, 'high': high}
+    conditions = [f'{key} BETWEEN :low AND :high']
+    rank = '0'
+
+    if dialect == 'sqlite':
+        params['match'] = ' '.join(f'"{word}"*' for word in words)
+        conditions.append('search_document MATCH :match')
+        rank = '-bm25(search_document)'
+    else:
+        # Other databases fall back to LIKE over the shadow table
+        long_words = []
+        if dialect in ('mysql', 'mariadb'):
+            long_words = [word for word in words if len(word) >= MYSQL_MIN_TOKEN]
+        if long_words:
+            params['match'] = ' '.join(f'+{word}*' for word in long_words)
+            conditions.append('MATCH (body) AGAINST (:match IN BOOLEAN MODE)')
+            rank = 'MATCH (body) AGAINST (:match IN BOOLEAN MODE)'
+        for index, word in enumerate(word for word in words if word not in long_words):
+            params[f'like_{index}'] = f'% {word}%'
+            conditions.append(f'body LIKE :like_{index}')
+
+    return conditions, params, rank, key
+
+
+def matching_ids(entity, term):
+    """Select of record ids whose document matches every word of ``term`` (None if no words)."""
+    dialect = _dialect()
+    match = _match(entity, term, dialect)
+    if match is None:
+        return None
+    conditions, params, _, key = match
+    statement = text(
+        f'SELECT {key} & {ID_MASK} AS id FROM search_document WHERE ' + ' AND '.join(conditions)
+    ).bindparams(**params)
+    return statement.columns(column('id', Integer))
+
+
+def _sounds_like(model, term, *columns):
+    """UNION of selects of ``columns`` of the records of ``model`` whose names sound like ``term``, or None.
+
+    One select per way of matching, each starting with an equality on a key
+    column, so every one is an index seek (an OR of them would not be on SQLite).
+    """
+    if model not in PHONETIC_KEYS:
+        return None
+    first_key, last_key = PHONETIC_KEYS[model][2:]
+    words = normalize_name(term).split()
+    if not words:
+        return None
+    # A word of silent letters only has the key '', which would match every name without letters
+    conditions = []
+    codes = [surname_phonetic(word) for word in words]
+    if all(codes):
+        others = [or_(first_key == code, last_key == code) for code in set(codes[1:]) - {codes[0]}]
+        conditions += [and_(key == codes[0], *others) for key in (first_key, last_key)]
+    if len(words) > 1:
+        whole = surname_phonetic(' '.join(words))
+        if whole:
+            conditions.append(last_key == whole)
+        given, surname = given_name_phonetic(words[0]), surname_phonetic(' '.join(words[1:]))
+        if given and surname:
+            conditions.append(and_(first_key == given, last_key == surname))
+    if not conditions:
+        return None
+    return union(*(select(*columns).where(condition) for condition in conditions))
+
+
+def filter_query(query, model, term):
+    """Restrict ``query`` on ``model`` to the records matching ``term``."""
+    ids = matching_ids(ENTITY_BY_MODEL[model], term)
+    if ids is None:
+        return query
+    sounds = _sounds_like(model, term, model.id)
+    if sounds is not None:
+        # Both id sets in one derived table, so the filter stays a plain semi-join (MySQL will not
+        # semi-join a UNION or an OR with a subquery; it would test every row)
+        spelt = ids.subquery()
+        matched = union(select(spelt.c.id), *sounds.selects).subquery()
+        ids = select(matched.c.id)
+    return query.filter(model.id.in_(ids))
+
+
+def _sound_alikes(term, sounds, exclude, limit):
+    # Ids of the records of ``sounds`` (id, given name, surname) not in ``exclude``, the names closest
+    # in spelling to the term first. Of a common sound only the first rows the key indexes return are
+    # ranked; no ORDER BY, which could make the database walk the table in that order instead
+    if limit is not None:
+        sounds = sounds.limit(limit + len(exclude))
+    wanted = normalize_name(term)
+    ranked = sorted(
+        (-SequenceMatcher(None, wanted, normalize_name(f'{first} {last}')).ratio(), record_id)
+        for record_id, first, last in db.session.execute(sounds) if record_id not in exclude
+    )
+    ids = [record_id for score, record_id in ranked]
+    return ids if limit is None else ids[:limit - len(exclude)]
+
+
+def search(model, term, limit=20, options=()):
+    """Records of ``model`` matching ``term``, best match first (all of them if ``limit`` is None).
+
+    ``options`` are loader options for the query that fetches the records.
+    """
+    entity = ENTITY_BY_MODEL[model]
+    dialect = _dialect()
+    match = _match(entity, term, dialect)
+    if match is None:
+        return []
+    conditions, params, rank, key = match
+    sql = f'SELECT {key} & {ID_MASK} AS id, {rank} AS score FROM search_document WHERE ' + ' AND '.join(conditions)
+    sql += ' ORDER BY score DESC'
+    if limit is not None:
+        sql += ' LIMIT :limit'
+        params['limit'] = limit
+    rows = db.session.execute(text(sql), params).all()
+    order = {row.id: position for position, row in enumerate(rows)}
+    sounds = _sounds_like(model, term, model.id, *PHONETIC_KEYS[model][:2]) if model in PHONETIC_KEYS else None
+    if sounds is not None and (limit is None or len(rows) < limit):
+        sound_alikes = _sound_alikes(term, sounds, order, limit)
+        order.update((record_id, len(rows) + position) for position, record_id in enumerate(sound_alikes))
+    if not order:
+        return []
+    records = model.query.options(*options).filter(model.id.in_(list(order))).all()
+    return sorted(records, key=lambda record: order[record.id])
@@ -0,0 +1,399 @@
+"""Synthetic data set for capacity planning.
+
+``flask seed`` fills an empty database (apart from admin accounts) with
+evacuation centers, volunteer and donor accounts, families, evacuees,
+donations and inventory items at production-like volumes: by default 1,000
+centers, 60,000 families, 200,000 evacuees and 500,000 donations and
+inventory items. ``--scale`` multiplies every count for a quicker run, and
+the same ``--seed`` always produces the same data (dates are relative to the
+day of the run).
+
+Rows are written with bulk core INSERTs in chunks of ``CHUNK_SIZE``, each
+chunk committed on its own and indexed for search as it goes, like the
+evacuee import. Families are inserted first without a head; the heads are
+linked once their evacuees exist, closing the ``Family.head_of_family_id`` /
+``Evacuee.family_id`` cycle. Occupancy counters are applied as deltas, and
+the available inventory gets opening ledger entries and stock levels.
+
+Every account is created with the password ``SEED_PASSWORD``. Do not run this
+against a database that is in use.
+"""
+import random
+from collections import Counter, defaultdict
+from datetime import date, datetime, time, timedelta
+from itertools import islice
+
+from sqlalchemy import bindparam, delete, func, insert, select, update
+from werkzeug.security import generate_password_hash
+
+from app import db
+from models import (User, EvacuationCenter, Evacuee, Family, Donation, InventoryItem, StockLevel, StockMovement,
+                    DuplicateCandidate, apply_occupancy_deltas, mark_tables_changed)
+from services.ledger import open_balances
+from services.search import index_rows, indexed_columns, rebuild_search_index
+
+DEFAULT_COUNTS = {
+    'centers': 1000,
+    'volunteers': 200,
+    'donors': 5000,
+    'families': 60000,
+    'evacuees': 200000,
+    'donations': 500000,
+    'inventory': 500000,
+}
+CHUNK_SIZE = 5000
+SEED_PASSWORD = 'password'
+FAMILY_MEMBER_SHARE = 0.9  # evacuees registered with a family; the rest came alone
+
+FIRST_NAMES = {
+    'male': ('Juan', 'Jose', 'Pedro', 'Mark', 'John Paul', 'Ramon', 'Carlo', 'Miguel', 'Antonio', 'Rafael',
+             'Jericho', 'Paolo', 'Danilo', 'Ernesto', 'Francis', 'Gabriel', 'Noel', 'Rodel', 'Vicente', 'Andres'),
+    'female': ('Maria', 'Ana', 'Rosa', 'Kristine', 'Angelica', 'Liza', 'Joy', 'Carmela', 'Teresa', 'Marites',
+               'Jasmine', 'Patricia', 'Rowena', 'Lourdes', 'Divina', 'Grace', 'Camille', 'Nina', 'Elena', 'Luz'),
+}
+LAST_NAMES = ('Dela Cruz', 'Santos', 'Reyes', 'Garcia', 'Mendoza', 'Bautista', 'Villanueva', 'Ramos', 'Aquino',
+              'Castillo', 'Flores', 'Gonzales', 'Rivera', 'Torres', 'Lopez', 'Aguilar', 'Navarro', 'Domingo',
+              'Salazar', 'Mercado', 'Soriano', 'Pascual', 'Francisco', 'Valdez', 'Manalo', 'Cruz', 'Adona',
+              'Tolentino', 'Dizon', 'Ocampo', 'Fernandez', 'Marquez', 'Morales', 'Perez', 'Sison', 'Tan')
+BARANGAYS = ('San Isidro', 'Poblacion', 'Santo Nino', 'San Roque', 'Bagong Silang', 'Malanday', 'Tumana',
+             'Nangka', 'Concepcion', 'San Jose', 'Santa Cruz', 'Banaba', 'Dalig', 'Mayamot', 'Kalawaan',
+             'Maybunga', 'Rosario', 'Ugong', 'Pinagbuhatan', 'Bagumbayan', 'Calumpang', 'Santolan')
+CITIES = ('Marikina', 'Pasig', 'Cainta', 'Taytay', 'San Mateo', 'Antipolo', 'Quezon City', 'Montalban')
+CENTER_KINDS = ('Elementary School', 'National High School', 'Covered Court', 'Barangay Hall', 'Gymnasium',
+                'Parish Church', 'Multi-Purpose Hall')
+# Centers seeded as unable to take evacuees with special needs
+OPEN_AIR_CENTER_KINDS = ('Covered Court',)
+SPECIAL_NEEDS = ('Wheelchair user', 'Diabetic, needs insulin', 'Pregnant', 'Hypertension maintenance',
+                 'Asthma', 'Infant formula needed', 'Hearing impaired', 'Bedridden senior')
+
+# Evacuee status weights
+STATUS_WEIGHTS = {'present': 80, 'relocated': 12, 'missing': 6, 'deceased': 2}
+# (description, units, quantity range, shelf life in days)
+FOOD_ITEMS = (
+    ('Rice', ('kg', 'sacks'), (5, 250), 365),
+    ('Canned sardines', ('cans', 'boxes'), (24, 480), 730),
+    ('Instant noodles', ('packs', 'boxes'), (24, 600), 180),
+    ('Bottled water', ('bottles', 'liters'), (12, 500), 365),
+    ('Corned beef', ('cans',), (12, 240), 730),
+    ('Biscuits', ('packs', 'boxes'), (10, 300), 120),
+    ('Powdered milk', ('packs', 'cans'), (6, 120), 365),
+    ('Bread', ('loaves', 'packs'), (10, 200), 5),
+    ('Fresh vegetables', ('kg',), (5, 100), 7),
+    ('Coffee sachets', ('packs',), (20, 400), 540),
+)
+NON_FOOD_ITEMS = (
+    ('Blankets', ('pcs',), (10, 300)),
+    ('Sleeping mats', ('pcs',), (10, 200)),
+    ('Hygiene kits', ('kits', 'boxes'), (10, 250)),
+    ('Face masks', ('pcs', 'boxes'), (50, 2000)),
+    ('Tarpaulins', ('pcs', 'rolls'), (5, 100)),
+    ('Flashlights', ('pcs',), (5, 100)),
+    ('Used clothing', ('bags', 'boxes'), (5, 150)),
+    ('Diapers', ('packs',), (10, 200)),
+)
+DONATION_STATUS_WEIGHTS = {'pending': 15, 'received': 45, 'distributed': 40}
+
+
+class SeedError(RuntimeError):
+    """The database cannot be seeded as asked."""
+
+
+def _chunks(rows, size=CHUNK_SIZE):
+    rows = iter(rows)
+    while chunk := list(islice(rows, size)):
+        yield chunk
+
+
+def reset_data():
+    """Delete every row the seeder writes, keeping admin accounts."""
+    session = db.session
+    session.execute(update(Family).values(head_of_family_id=None))
+    models = (DuplicateCandidate, StockMovement, StockLevel, InventoryItem, Donation, Evacuee, Family,
+              EvacuationCenter)
+    for model in models:
+        session.execute(delete(model))
+    session.execute(delete(User).where(User.role != 'admin'))
+    mark_tables_changed(session, *(model.__tablename__ for model in models + (User,)))
+    session.commit()
+    rebuild_search_index()
+
+
+class Seeder:
+    def __init__(self, seed, counts=None, scale=1.0):
+        self.random = random.Random(seed)
+        counts = dict(DEFAULT_COUNTS, **(counts or {}))
+        self.counts = {name: max(1, round(count * scale)) for name, count in counts.items()}
+        self.today = date.today()
+        self.now = datetime.combine(self.today, time(8))
+        self.written = Counter()
+
+    # Helpers
+
+    def _insert(self, model, rows):
+        """Insert ``rows`` (dicts) in committed chunks; returns the new ids in insertion order."""
+        session = db.session
+        ids = []
+        for chunk in _chunks(rows):
+            connection = session.connection()
+            last_id = connection.execute(select(func.max(model.id))).scalar() or 0
+            connection.execute(insert(model.__table__), chunk)
+            # Single writer: the new rows are the ones above the previous maximum, in order
+            written = connection.execute(
+                select(*indexed_columns(model)).where(model.id > last_id).order_by(model.id)
+            ).all()
+            index_rows(connection, model, written)
+            ids.extend(row[0] for row in written)
+            mark_tables_changed(session, model.__tablename__)
+            session.commit()
+        self.written[model.__tablename__] += len(ids)
+        return ids
+
+    def _weighted(self, weights):
+        return self.random.choices(list(weights), weights=list(weights.values()))[0]
+
+    def _phone(self):
+        return '09' + ''.join(self.random.choice('0123456789') for _ in range(9))
+
+    def _address(self, barangay=None):
+        return (f'{self.random.randint(1, 999)} {self.random.choice(LAST_NAMES)} St., '
+                f'Brgy. {barangay or self.random.choice(BARANGAYS)}, {self.random.choice(CITIES)}')
+
+    def _moment(self, days_back):
+        return self.now - timedelta(days=self.random.uniform(0, days_back))
+
+    def _birth_date(self, adult=False):
+        age = self.random.randint(18, 75) if adult else min(int(self.random.expovariate(1 / 28)), 95)
+        return self.today - timedelta(days=age * 365 + self.random.randint(0, 364))
+
+    # Stages
+
+    def seed_centers(self):
+        seen = Counter()
+        rows = []
+        for _ in range(self.counts['centers']):
+            barangay = self.random.choice(BARANGAYS)
+            kind = self.random.choice(CENTER_KINDS)
+            name = f'{barangay} {kind}'
+            seen[name] += 1
+            stamp = self._moment(365)
+            rows.append({
+                'name': name if seen[name] == 1 else f'{name} {seen[name]}',
+                'address': self._address(barangay),
+                'capacity': self.random.choice((80, 120, 150, 200, 250, 300, 400, 600)),
+                'status': 'active' if self.random.random() < 0.9 else 'closed',
+                'accepts_special_needs': kind not in OPEN_AIR_CENTER_KINDS,
+                'contact_person': f'{self.random.choice(FIRST_NAMES["female"])} {self.random.choice(LAST_NAMES)}',
+                'contact_number': self._phone(),
+                'created_at': stamp,
+                'updated_at': stamp,
+            })
+        self.center_ids = self._insert(EvacuationCenter, rows)
+        # Evacuees are spread over the active centers in proportion to their capacity
+        active = [(center_id, row['capacity']) for center_id, row in zip(self.center_ids, rows)
+                  if row['status'] == 'active'] or [(self.center_ids[0], 1)]
+        self.active_center_ids = [center_id for center_id, capacity in active]
+        self.active_center_weights = [capacity for center_id, capacity in active]
+
+    def seed_users(self):
+        password_hash = generate_password_hash(SEED_PASSWORD)  # hashed once; hashing is slow on purpose
+
+        def accounts(role, count):
+            for number in range(1, count + 1):
+                gender = self.random.choice(('male', 'female'))
+                stamp = self._moment(365)
+                yield {
+                    'username': f'{role}{number:05d}',
+                    'email': f'{role}{number:05d}@example.com',
+                    'password_hash': password_hash,
+                    'role': role,
+                    'first_name': self.random.choice(FIRST_NAMES[gender]),
+                    'last_name': self.random.choice(LAST_NAMES),
+                    'phone': self._phone(),
+                    'is_active': self.random.random() < 0.95,
+                    'created_at': stamp,
+                }
+
+        self._insert(User, accounts('volunteer', self.counts['volunteers']))
+        self.donor_ids = self._insert(User, accounts('donor', self.counts['donors']))
+
+    def seed_families_and_evacuees(self):
+        evacuee_count = self.counts['evacuees']
+        members = int(evacuee_count * FAMILY_MEMBER_SHARE)
+        family_count = min(self.counts['families'], members)
+
+        # Every family has at least one member; the rest are spread at random
+        sizes = [1] * family_count
+        for index in self.random.choices(range(family_count), k=members - family_count):
+            sizes[index] += 1
+
+        families = []
+        for _ in range(family_count):
+            stamp = self._moment(60)
+            families.append({
+                'family_name': self.random.choice(LAST_NAMES),
+                'address': self._address(),
+                'contact_number': self._phone() if self.random.random() < 0.8 else None,
+                'created_at': stamp,
+                'updated_at': stamp,
+            })
+        family_ids = self._insert(Family, families)
+
+        heads = []  # (family index, evacuee position)
+        deltas = defaultdict(Counter)
+
+        def evacuee(last_name, center_id, family_id, stamp, adult=False):
+            gender = self.random.choice(('male', 'female'))
+            status = self._weighted(STATUS_WEIGHTS)
+            deltas[center_id]['occupancy_count'] += 1
+            deltas[center_id][f'{status}_count'] += 1
+            return {
+                'first_name': self.random.choice(FIRST_NAMES[gender]),
+                'last_name': last_name,
+                'date_of_birth': self._birth_date(adult) if self.random.random() < 0.95 else None,
+                'gender': gender,
+                'status': status,
+                'special_needs': self.random.choice(SPECIAL_NEEDS) if self.random.random() < 0.08 else None,
+                'family_id': family_id,
+                'evacuation_center_id': center_id,
+                'created_at': stamp,
+                'updated_at': stamp,
+            }
+
+        def evacuees():
+            position = 0
+            for index, (family, size) in enumerate(zip(families, sizes)):
+                # A family shelters together
+                center_id = self.random.choices(self.active_center_ids, weights=self.active_center_weights)[0]
+                heads.append((index, position))
+                for member in range(size):
+                    yield evacuee(family['family_name'], center_id, family_ids[index], family['created_at'],
+                                  adult=member == 0)
+                    position += 1
+            for _ in range(evacuee_count - members):
+                center_id = self.random.choices(self.active_center_ids, weights=self.active_center_weights)[0]
+                yield evacuee(self.random.choice(LAST_NAMES), center_id, None, self._moment(60), adult=True)
+
+        evacuee_ids = self._insert(Evacuee, evacuees())
+
+        # Close the cycle: link each family to its (first, adult) member
+        table = Family.__table__
+        statement = update(table).where(table.c.id == bindparam('family')).values(head_of_family_id=bindparam('head'))
+        for chunk in _chunks(heads):
+            db.session.connection().execute(statement, [
+                {'family': family_ids[index], 'head': evacuee_ids[position]} for index, position in chunk
+            ])
+            db.session.commit()
+
+        apply_occupancy_deltas(db.session, deltas)
+        db.session.commit()
+
+    def _goods(self, food):
+        if food:
+            description, units, (low, high), shelf_life = self.random.choice(FOOD_ITEMS)
+        else:
+            (description, units, (low, high)), shelf_life = self.random.choice(NON_FOOD_ITEMS), None
+        return description, self.random.choice(units), self.random.randint(low, high), shelf_life
+
+    def _inventory_row(self, item_type, description, quantity, unit, expiry_date, donation_id, center_id,
+                       distributed, stamp):
+        if distributed:
+            status = 'distributed'
+        elif expiry_date and expiry_date < self.today:
+            status = 'expired'  # as the expiry sweep (services/expiry.py) leaves them
+        else:
+            status = 'available'
+        return {
+            'type': item_type,
+            'description': description,
+            'quantity': quantity,
+            'unit': unit,
+            'expiry_date': expiry_date,
+            'donation_id': donation_id,
+            'evacuation_center_id': center_id,
+            'status': status,
+            'created_at': stamp,
+            'updated_at': stamp,
+        }
+
+    def seed_donations_and_inventory(self):
+        donation_count = self.counts['donations']
+        inventory_count = self.counts['inventory']
+        # Received and distributed donations become inventory items, as many as the target allows
+        handled_share = (DONATION_STATUS_WEIGHTS['received'] + DONATION_STATUS_WEIGHTS['distributed']) / sum(
+            DONATION_STATUS_WEIGHTS.values())
+        from_donation = min(1.0, inventory_count / (donation_count * handled_share))
+        stocked = 0
+
+        for chunk in _chunks(range(donation_count)):
+            donations = []
+            for _ in chunk:
+                food = self.random.random() < 0.6
+                description, unit, quantity, shelf_life = self._goods(food)
+                stamp = self._moment(180)
+                expiry_date = None
+                if food:
+                    # Shelf life from the day it was donated, +/- a quarter
+                    days = shelf_life * self.random.uniform(0.75, 1.25)
+                    expiry_date = (stamp + timedelta(days=days)).date()
+                donations.append({
+                    'type': 'food' if food else 'non-food',
+                    'description': description,
+                    'quantity': quantity,
+                    'unit': unit,
+                    'expiry_date': expiry_date,
+                    'donor_id': self.random.choice(self.donor_ids) if self.random.random() < 0.9 else None,
+                    'evacuation_center_id': self.random.choice(self.center_ids),
+                    'status': self._weighted(DONATION_STATUS_WEIGHTS),
+                    'created_at': stamp,
+                    'updated_at': stamp,
+                })
+            donation_ids = self._insert(Donation, donations)
+
+            items = []
+            for donation_id, donation in zip(donation_ids, donations):
+                if donation['status'] == 'pending' or stocked >= inventory_count:
+                    continue
+                if self.random.random() >= from_donation:
+                    continue
+                stamp = donation['created_at'] + timedelta(hours=self.random.uniform(1, 72))
+                items.append(self._inventory_row(
+                    donation['type'], donation['description'], donation['quantity'], donation['unit'],
+                    donation['expiry_date'], donation_id,
+                    donation['evacuation_center_id'],
+                    donation['status'] == 'distributed', stamp
+                ))
+                stocked += 1
+            self._insert(InventoryItem, items)
+
+        # Stock bought or transferred outside the donation records
+        def purchased():
+            for _ in range(inventory_count - stocked):
+                food = self.random.random() < 0.6
+                description, unit, quantity, shelf_life = self._goods(food)
+                stamp = self._moment(180)
+                expiry_date = None
+                if food:
+                    expiry_date = (stamp + timedelta(days=shelf_life * self.random.uniform(0.75, 1.25))).date()
+                yield self._inventory_row(
+                    'food' if food else 'non-food', description, quantity, unit, expiry_date, None,
+                    self.random.choice(self.center_ids), self.random.random() < 0.3, stamp
+                )
+
+        self._insert(InventoryItem, purchased())
+
+        # Opening ledger entries and stock levels for the available lines
+        self.written[StockMovement.__tablename__] += open_balances()
+        mark_tables_changed(db.session, StockMovement.__tablename__, StockLevel.__tablename__)
+        db.session.commit()
+
+    def run(self):
+        if db.session.scalar(select(func.count(EvacuationCenter.id))) or \
+                db.session.scalar(select(func.count(Evacuee.id))):
+            raise SeedError('The database already holds centers or evacuees; seed with --reset to replace them.')
+        if db.session.scalar(select(func.count(User.id)).where(User.role != 'admin')):
+            raise SeedError('The database already holds volunteer or donor accounts; seed with --reset.')
+        self.seed_centers()
+        self.seed_users()
+        self.seed_families_and_evacuees()
+        self.seed_donations_and_inventory()
+        return self.written
@@ -0,0 +1,142 @@
+"""Receiving donations into inventory and distributing inventory, one item or many at once.
+
+Each call is one transaction whatever the number of ids: the rows to process
+are locked (``SELECT ... FOR UPDATE``), their status changes with one
+set-based UPDATE per table, and received donations become inventory items
+through a single ``INSERT ... SELECT`` from the donation rows, indexed for
+search straight after (``services.search.index_rows``). Both are entered in
+the inventory ledger (``services.ledger``); distributing here always takes
+whole lines.
+
+On MySQL and PostgreSQL the row locks make a second volunteer processing the
+same donations wait for the first and then find them no longer pending, so
+they are skipped rather than received twice. SQLite has no row locks and lets
+one writer in at a time. The second writer either waits for the first to
+commit, and then its status UPDATE (which repeats the status condition)
+touches fewer rows than were selected, or it gives up after the busy timeout
+with "database is locked". Either way the whole batch is refused with
+``StockConflict``.
+"""
+from datetime import datetime
+
+from sqlalchemy import func, insert, literal, select, update
+from sqlalchemy.exc import OperationalError
+
+from app import db
+from models import Donation, InventoryItem, mark_tables_changed, record_stock_movements
+from services.ledger import LINE_COLUMNS, line_movements
+from services.search import index_rows, indexed_columns
+
+
+class StockConflict(RuntimeError):
+    """Another transaction processed some of the rows first; nothing was changed."""
+
+
+def _lock(model, ids, status):
+    """Ids among ``ids`` whose status is ``status``, locked until the transaction ends."""
+    # Locked in id order, so two overlapping batches cannot deadlock
+    return db.session.scalars(
+        select(model.id).where(model.id.in_(sorted(set(ids))), model.status == status)
+        .order_by(model.id).with_for_update()
+    ).all()
+
+
+def _locked_out(error):
+    # SQLite: another transaction held the write lock for longer than the busy timeout
+    return isinstance(error, OperationalError) and 'database is locked' in str(error.orig)
+
+
+def _set_status(model, ids, current, new):
+    table = model.__table__
+    result = db.session.execute(
+        update(table).where(table.c.id.in_(ids), table.c.status == current)
+        .values(status=new, updated_at=datetime.now())
+    )
+    if result.rowcount != len(ids):
+        raise StockConflict(f'{len(ids) - result.rowcount} {table.name} row(s) changed while processing')
+    mark_tables_changed(db.session, table.name)
+
+
+def receive_donations(donation_ids):
+    """Receive the pending donations among ``donation_ids`` into inventory.
+
+    Returns ``(ids received, ids without a center)``: a pending donation with
+    no evacuation center (its center was deleted) has nowhere to be stocked
+    and is left pending; ids of donations that are missing or not pending are
+    skipped. Raises ``StockConflict`` (after rolling back) if another
+    transaction received some of them first.
+    """
+    try:
+        # Locked in id order, as in _lock
+        pending = db.session.execute(
+            select(Donation.id, Donation.evacuation_center_id)
+            .where(Donation.id.in_(sorted(set(donation_ids))), Donation.status == 'pending')
+            .order_by(Donation.id).with_for_update()
+        ).all()
+        ids = [donation_id for donation_id, center_id in pending if center_id is not None]
+        without_center = [donation_id for donation_id, center_id in pending if center_id is None]
+        if not ids:
+            db.session.rollback()
+            return [], without_center
+
+        _set_status(Donation, ids, 'pending', 'received')
+
+        donations = Donation.__table__
+        items = InventoryItem.__table__
+        connection = db.session.connection()
+        last_id = connection.execute(select(func.max(items.c.id))).scalar() or 0
+        now = datetime.now()
+        connection.execute(insert(items).from_select(
+            ['type', 'description', 'quantity', 'unit', 'expiry_date', 'donation_id',
+             'evacuation_center_id', 'status', 'created_at', 'updated_at'],
+            select(donations.c.type, donations.c.description, donations.c.quantity, donations.c.unit,
+                   donations.c.expiry_date, donations.c.id, donations.c.evacuation_center_id,
+                   literal('available'), literal(now), literal(now))
+            .where(donations.c.id.in_(ids))
+        ))
+        # The donations are locked, so their new items are the only ones added for them
+        written = connection.execute(
+            select(*indexed_columns(InventoryItem))
+            .where(items.c.donation_id.in_(ids), items.c.id > last_id)
+        ).all()
+        index_rows(connection, InventoryItem, written)
+        mark_tables_changed(db.session, items.name)
+        lines = connection.execute(select(*LINE_COLUMNS).where(items.c.id.in_([row[0] for row in written]))).all()
+        record_stock_movements(db.session, line_movements('receive', lines))
+        db.session.commit()
+    except Exception as error:
+        db.session.rollback()
+        if _locked_out(error):
+            raise StockConflict('another transaction is writing the donations') from error
+        raise
+    return ids, without_center
+
+
+def distribute_items(item_ids):
+    """Mark the available inventory items among ``item_ids`` distributed, and their donations too.
+
+    Returns the ids distributed; ids of items that are missing or not
+    available are skipped. Raises ``StockConflict`` (after rolling back) if
+    another transaction changed some of them first.
+    """
+    try:
+        ids = _lock(InventoryItem, item_ids, 'available')
+        if not ids:
+            return []
+        lines = db.session.execute(select(*LINE_COLUMNS).where(InventoryItem.id.in_(ids))).all()
+        _set_status(InventoryItem, ids, 'available', 'distributed')
+        record_stock_movements(db.session, line_movements('distribute', lines, sign=-1))
+        donations = Donation.__table__
+        db.session.execute(
+            update(donations)
+            .where(donations.c.id.in_(select(InventoryItem.donation_id).where(InventoryItem.id.in_(ids))))
+            .values(status='distributed', updated_at=datetime.now())
+        )
+        mark_tables_changed(db.session, donations.name)
+        db.session.commit()
+    except Exception as error:
+        db.session.rollback()
+        if _locked_out(error):
+            raise StockConflict('another transaction is writing the inventory') from error
+        raise
+    return ids
@@ -0,0 +1,61 @@
+"""Cached user loader for Flask-Login.
+
+Flask-Login calls the user loader on every request of a logged-in user, which
+was one ``SELECT`` from the user table per page, AJAX lookup and dialog.
+``load_user`` keeps a small snapshot of each user in the stats cache instead,
+for at most ``USER_CACHE_TTL`` seconds (default 60).
+
+The entries are keyed on the version of the user table, like every other
+stats-cache entry, and the session hooks in ``models.py`` bump that version
+whenever a commit changes a user. Editing a user's role, or activating or
+deactivating an account, therefore invalidates the cached snapshots at once,
+in every worker sharing the cache. Deactivated accounts are not loaded, so
+their open sessions end on their next request.
+"""
+from flask import current_app
+from flask_login import UserMixin
+
+from app import db
+from models import User
+from services.cache import stats_cache
+
+DEFAULT_TTL = 60  # seconds
+USER_TABLES = (User.__tablename__,)
+
+
+class UserSnapshot(UserMixin):
+    """The fields of an active ``User`` that requests read from ``current_user``."""
+
+    def __init__(self, user):
+        self.id = user.id
+        self.username = user.username
+        self.email = user.email
+        self.role = user.role
+        self.first_name = user.first_name
+        self.last_name = user.last_name
+
+    def __repr__(self):
+        return f'<User {self.username}>'
+
+    @property
+    def full_name(self):
+        return f"{self.first_name} {self.last_name}"
+
+
+def _snapshot(user_id):
+    user = db.session.get(User, user_id)
+    if user is None or not user.is_active:
+        return None
+    return UserSnapshot(user)
+
+
+def load_user(user_id):
+    try:
+        user_id = int(user_id)
+    except (TypeError, ValueError):
+        return None
+    # Misses are cached too, so a session of a deleted account costs no query either
+    return stats_cache.get_or_set(
+        f'user:{user_id}', USER_TABLES, lambda: _snapshot(user_id),
+        ttl=current_app.config['USER_CACHE_TTL']
+    )
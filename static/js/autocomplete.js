@@ -0,0 +1,45 @@
+// Typeahead for record selects (templates/macros/autocomplete.html).
+// The search box above each select fetches matching records from its lookup endpoint
+// and replaces the select's options; the current choice and the blank option are kept.
+// Listeners are delegated so selects inside rows and modals loaded later work too.
+(function() {
+    let timer = null;
+
+    function loadOptions(input) {
+        const select = document.getElementById(input.dataset.autocompleteFor);
+        if (!select) {
+            return;
+        }
+        const url = new URL(input.dataset.autocomplete, window.location.origin);
+        url.searchParams.set('q', input.value.trim());
+
+        fetch(url, { headers: { 'Accept': 'application/json' }, credentials: 'same-origin' })
+            .then(response => response.json())
+            .then(json => {
+                const keep = Array.from(select.options).filter(option => option.value === '0' || option.selected);
+                select.innerHTML = '';
+                keep.forEach(option => select.appendChild(option));
+                json.results.forEach(item => {
+                    if (!keep.some(option => option.value === String(item.id))) {
+                        select.appendChild(new Option(item.text, item.id));
+                    }
+                });
+            });
+    }
+
+    document.addEventListener('input', function(event) {
+        if (event.target.matches('input[data-autocomplete]')) {
+            clearTimeout(timer);
+            timer = setTimeout(() => loadOptions(event.target), 250);
+        }
+    });
+
+    // First focus lists the latest records so short lists can be picked without typing
+    document.addEventListener('focusin', function(event) {
+        const input = event.target;
+        if (input.matches('input[data-autocomplete]') && !input.dataset.loaded) {
+            input.dataset.loaded = 'true';
+            loadOptions(input);
+        }
+    });
+})();
@@ -0,0 +1,62 @@
+// Row dialogs (edit, delete, status) are not rendered with the list. Buttons carry a
+// data-modal-url; clicking one fetches that HTML fragment into the shared #remoteModal
+// shell in base.html and shows it. The click listener is delegated so rows added later
+// by server-side tables work too.
+(function() {
+    // validation.js binds forms on page load, so fragments are bound here when inserted
+    function bindForms(container) {
+        container.querySelectorAll('.needs-validation').forEach(form => {
+            form.addEventListener('submit', event => {
+                if (!form.checkValidity()) {
+                    event.preventDefault();
+                    event.stopPropagation();
+                }
+                form.classList.add('was-validated');
+            }, false);
+        });
+
+        // Expiry date is only asked for food items
+        container.querySelectorAll('.donation-form').forEach(form => {
+            const typeSelect = form.querySelector('select[name="type"]');
+            const expiryDateField = form.querySelector('input[name="expiry_date"]');
+            if (!typeSelect || !expiryDateField) {
+                return;
+            }
+            const expiryDateGroup = expiryDateField.closest('.mb-3');
+            typeSelect.addEventListener('change', function() {
+                if (this.value === 'food') {
+                    expiryDateGroup.style.display = 'block';
+                    expiryDateField.setAttribute('required', '');
+                } else {
+                    expiryDateGroup.style.display = 'none';
+                    expiryDateField.removeAttribute('required');
+                    expiryDateField.value = '';
+                }
+            });
+        });
+    }
+
+    document.addEventListener('click', function(event) {
+        const button = event.target.closest('[data-modal-url]');
+        if (!button) {
+            return;
+        }
+        event.preventDefault();
+
+        const element = document.getElementById('remoteModal');
+        const content = element.querySelector('.modal-content');
+        fetch(button.dataset.modalUrl, { credentials: 'same-origin' })
+            .then(response => {
+                if (!response.ok) {
+                    throw new Error(response.statusText);
+                }
+                return response.text();
+            })
+            .then(html => {
+                content.innerHTML = html;
+                bindForms(content);
+                bootstrap.Modal.getOrCreateInstance(element).show();
+            })
+            .catch(() => alert('Could not load this dialog. Please try again.'));
+    });
+})();
@@ -1,6 +1,9 @@
 document.addEventListener('DOMContentLoaded', function() {
+    // Tables backed by a keyset-paginated JSON endpoint load their rows page by page
+    document.querySelectorAll('table[data-source]').forEach(initKeysetTable);
+    
     // Initialize DataTables if any tables with the 'datatable' class exist
-    const tables = document.querySelectorAll('.datatable');
+    const tables = document.querySelectorAll('.datatable:not([data-source])');
     
     tables.forEach(table => {
         new DataTable(table, {
@@ -14,32 +17,114 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     });
     
-    // Add event listeners for any status update buttons
-    const statusForms = document.querySelectorAll('.status-update-form');
+    // Status update and delete confirmations are delegated so rows loaded later by
+    // server-side tables get the same behaviour
+    document.addEventListener('change', function(event) {
+        const select = event.target;
+        const form = select.closest('.status-update-form');
+        if (!form || select.tagName !== 'SELECT') {
+            return;
+        }
+        if (confirm('Are you sure you want to update this status?')) {
+            form.submit();
+        } else {
+            // Reset to previous value if canceled
+            select.value = select.getAttribute('data-original-value');
+        }
+    });
     
-    statusForms.forEach(form => {
-        const select = form.querySelector('select');
-        select.addEventListener('change', function() {
-            if (confirm('Are you sure you want to update this status?')) {
-                form.submit();
-            } else {
-                // Reset to previous value if canceled
-                select.value = select.getAttribute('data-original-value');
+    document.addEventListener('click', function(event) {
+        const button = event.target.closest('.delete-btn');
+        if (button && !confirm('Are you sure you want to delete this item? This action cannot be undone.')) {
+            event.preventDefault();
+        }
+    });
+});
+
+// Server-side processing for keyset-paginated tables.
+// The first page is rendered with the page itself; every other page is fetched from
+// the table's data-source URL using the cursor returned with the previous page.
+function initKeysetTable(table) {
+    const headers = Array.from(table.querySelectorAll('thead th'));
+    const columns = headers.map(th => ({
+        name: th.dataset.sort || '',
+        orderable: Boolean(th.dataset.sort)
+    }));
+    const sortIndex = headers.findIndex(th => th.dataset.sort === table.dataset.defaultSort);
+
+    // cursors[n] is the "after" cursor that fetches page n
+    let cursors = { 0: null, 1: table.dataset.nextCursor || null };
+
+    new DataTable(table, {
+        serverSide: true,
+        processing: true,
+        searching: false,
+        info: false,
+        responsive: true,
+        pagingType: 'simple',
+        pageLength: parseInt(table.dataset.pageLength || '25', 10),
+        lengthMenu: [10, 25, 50, 100],
+        deferLoading: parseInt(table.dataset.records || '0', 10),
+        order: sortIndex >= 0 ? [[sortIndex, table.dataset.defaultDir || 'desc']] : [],
+        columns: columns,
+        language: { emptyTable: table.dataset.empty || 'No records found.' },
+        dom: 'Blrtip',
+        buttons: exportButtons(table),
+        ajax: function(params, callback) {
+            const page = Math.floor(params.start / params.length);
+            if (page === 0) {
+                cursors = { 0: null };
             }
-        });
+
+            const url = new URL(table.dataset.source, window.location.origin);
+            const order = params.order[0];
+            if (order && columns[order.column].name) {
+                url.searchParams.set('sort', columns[order.column].name);
+                url.searchParams.set('dir', order.dir);
+            }
+            url.searchParams.set('per_page', params.length);
+            url.searchParams.set('start', params.start);
+            url.searchParams.set('draw', params.draw);
+            if (cursors[page]) {
+                url.searchParams.set('after', cursors[page]);
+            }
+
+            fetch(url, { headers: { 'Accept': 'application/json' }, credentials: 'same-origin' })
+                .then(response => response.json())
+                .then(json => {
+                    cursors[page + 1] = json.next_cursor;
+                    callback({
+                        draw: json.draw,
+                        recordsTotal: json.recordsTotal,
+                        recordsFiltered: json.recordsFiltered,
+                        data: rowsFromHtml(json.html)
+                    });
+                });
+        }
     });
-    
-    // Add event listeners for delete confirmation
-    const deleteButtons = document.querySelectorAll('.delete-btn');
-    
-    deleteButtons.forEach(button => {
-        button.addEventListener('click', function(event) {
-            if (!confirm('Are you sure you want to delete this item? This action cannot be undone.')) {
-                event.preventDefault();
+}
+
+// Copy/print act on the loaded page; CSV downloads every matching row from the
+// server-side export, with the same filters as the table
+function exportButtons(table) {
+    const buttons = ['copy', 'print'];
+    if (table.dataset.export) {
+        buttons.push({
+            text: 'CSV',
+            action: function() {
+                window.location = table.dataset.export;
             }
         });
-    });
-});
+    }
+    return buttons;
+}
+
+// Turn server-rendered <tr> markup into the cell arrays DataTables expects
+function rowsFromHtml(html) {
+    const body = document.createElement('tbody');
+    body.innerHTML = html;
+    return Array.from(body.rows).map(row => Array.from(row.cells).map(cell => cell.innerHTML));
+}
 
 // Function to filter tables
 function filterTable(inputId, tableId, columnIndex) {
@@ -0,0 +1,90 @@
+"""Shared fixtures: the application on an in-memory SQLite database.
+
+``app.py`` builds the application when it is first imported, so the database
+and cache settings are put in the environment before that. Every test starts
+from an empty database holding only the admin account; ``sample_data`` adds
+a few rows of each kind for the tests that request pages.
+"""
+import os
+
+os.environ['DATABASE_URL'] = 'sqlite://'
+os.environ['STATS_CACHE_BACKEND'] = 'lru'
+
+from datetime import date, timedelta
+from types import SimpleNamespace
+
+import pytest
+from werkzeug.security import generate_password_hash
+
+from app import app as flask_app, db
+from models import Donation, EvacuationCenter, Evacuee, Family, InventoryItem, User
+from services.benchmark import logged_in_client
+from services.seed import reset_data
+
+
+@pytest.fixture
+def app():
+    flask_app.config.update(TESTING=True, WTF_CSRF_ENABLED=False)
+    with flask_app.app_context():
+        yield flask_app
+        db.session.rollback()
+        reset_data()
+        db.session.remove()
+
+
+def add_user(role, username=None):
+    user = User(username=username or role, email=f'{username or role}@example.com',
+                password_hash=generate_password_hash('password'), role=role,
+                first_name=role.title(), last_name='Tester', is_active=True)
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+@pytest.fixture
+def client_for(app):
+    """``client_for(role)``: a test client logged in as the first active user of that role."""
+    def client(role):
+        user = User.query.filter_by(role=role, is_active=True).order_by(User.id).first() or add_user(role)
+        return logged_in_client(user)
+    return client
+
+
+@pytest.fixture
+def sample_data(app):
+    """Three centers, a family with its head, a dozen evacuees, and donations received into inventory."""
+    volunteer, donor = add_user('volunteer'), add_user('donor')
+    centers = [EvacuationCenter(name=f'Center {index}', address='Poblacion', capacity=50) for index in range(3)]
+    db.session.add_all(centers)
+    db.session.commit()
+
+    family = Family(family_name='Dela Cruz', address='Poblacion')
+    db.session.add(family)
+    db.session.flush()
+    evacuees = [
+        Evacuee(first_name=f'Juan{index}', last_name='Dela Cruz', status='present', family_id=family.id,
+                evacuation_center_id=centers[index % 3].id, date_of_birth=date(1990, 1, 1 + index))
+        for index in range(12)
+    ]
+    db.session.add_all(evacuees)
+    db.session.flush()
+    family.head_of_family_id = evacuees[0].id
+
+    donations = [
+        Donation(type='food', description=f'Rice {index}', quantity=10, unit='kg', donor_id=donor.id,
+                 evacuation_center_id=centers[0].id, status='received',
+                 expiry_date=date.today() + timedelta(days=30 * (index + 1)))
+        for index in range(3)
+    ]
+    db.session.add_all(donations)
+    db.session.flush()
+    items = [
+        InventoryItem(type=donation.type, description=donation.description, quantity=donation.quantity,
+                      unit=donation.unit, expiry_date=donation.expiry_date, donation_id=donation.id,
+                      evacuation_center_id=donation.evacuation_center_id)
+        for donation in donations
+    ]
+    db.session.add_all(items)
+    db.session.commit()
+    return SimpleNamespace(volunteer=volunteer, donor=donor, centers=centers, family=family,
+                           evacuees=evacuees, donations=donations, items=items)
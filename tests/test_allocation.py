@@ -0,0 +1,81 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from services.allocation import (INFANT_WEIGHTS, NEED_WEIGHTS, AllocationSnapshot, capped_shares, plan_allocation,
+                                 propose_transfers, synthetic_snapshot, whole_units)
+from services.ledger import transfer_many
+
+
+def _snapshot(heads, lines, weights=NEED_WEIGHTS['non-food']):
+    """One item; ``heads`` adults per center and ``lines`` as (center index, quantity, expiry day)."""
+    centers, quantities, expiry = zip(*lines)
+    return AllocationSnapshot(
+        np.arange(1, len(heads) + 1), np.array([[0, 0, count, 0] for count in heads], dtype=float),
+        [('rice', 'kg')], np.array([weights], dtype=float),
+        np.arange(1, len(lines) + 1), np.array(centers), np.zeros(len(lines), dtype=np.int64),
+        np.array(quantities), np.array(expiry),
+    )
+
+
+def test_capped_shares():
+    supply = np.array([100.0])
+    shares = capped_shares(supply, np.array([[8.0], [1.0], [1.0]]), 0.5)
+    # The largest need is capped at half; the rest goes to the others in proportion
+    assert shares[:, 0].tolist() == pytest.approx([50, 25, 25])
+    # Nobody needs it: nothing is shared out
+    assert capped_shares(supply, np.zeros((3, 1)), 0.5).sum() == 0
+    # Fewer rows than the cap allows for: an equal split, all of it used
+    assert capped_shares(supply, np.array([[9.0], [1.0]]), 0.3)[:, 0].tolist() == pytest.approx([50, 50])
+
+
+def test_whole_units_keep_the_totals():
+    shares = np.array([[3.4, 0.5], [3.3, 0.5], [3.3, 9.0]])
+    units = whole_units(shares, np.array([10, 10]))
+    assert units.sum(axis=0).tolist() == [10, 10]
+    assert units[:, 0].tolist() == [4, 3, 3]
+    assert np.abs(units - shares).max() < 1
+
+
+def test_surplus_moves_to_the_short_center_earliest_expiry_first():
+    snapshot = _snapshot([10, 10], [(0, 8, 200), (0, 12, 100)])
+    lines, destinations, quantities = plan_allocation(snapshot)
+    assert (lines.tolist(), destinations.tolist(), quantities.tolist()) == ([1], [1], [10])
+
+
+def test_surplus_spans_lines():
+    snapshot = _snapshot([10, 10, 10], [(0, 20, 300), (0, 4, 100), (0, 6, 200)])
+    lines, destinations, quantities = plan_allocation(snapshot)
+    # The two earlier lines go whole; the latest gives only the rest
+    assert np.bincount(lines, quantities, 3).tolist() == [10, 4, 6]
+    assert np.bincount(destinations, quantities, 3).tolist() == [0, 10, 10]
+
+
+def test_stock_roughly_in_place_stays():
+    # 11 and 9 against a share of 10 each: within the tolerance
+    assert len(plan_allocation(_snapshot([10, 10], [(0, 11, 100), (1, 9, 100)]))[2]) == 0
+    # Infant goods where there are no infants stay too
+    assert len(plan_allocation(_snapshot([10, 10], [(0, 20, 100)], INFANT_WEIGHTS))[2]) == 0
+
+
+def test_synthetic_plan_keeps_every_line_within_its_stock():
+    snapshot = synthetic_snapshot(centers=30, items=20)
+    lines, destinations, quantities = plan_allocation(snapshot)
+    assert len(quantities)
+    taken = np.bincount(lines, quantities, len(snapshot.line_ids))
+    assert (taken <= snapshot.line_quantities).all()
+    assert (destinations != snapshot.line_centers[lines]).all()
+
+
+def test_propose_and_carry_out_transfers(sample_data):
+    # Every center has four adults and all the rice is at the first
+    first = sample_data.centers[0].id
+    proposals = propose_transfers()
+    assert {proposal.from_center_id for proposal in proposals} == {first}
+    assert {proposal.to_center_id for proposal in proposals} == {center.id for center in sample_data.centers[1:]}
+    for item in sample_data.items:
+        sent = [proposal.quantity for proposal in proposals if proposal.item_id == item.id]
+        assert sorted(sent) == [3, 3]
+    assert transfer_many([(proposal.item_id, proposal.to_center_id, proposal.quantity)
+                          for proposal in proposals]) == len(proposals)
+    assert propose_transfers() == []
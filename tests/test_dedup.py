@@ -0,0 +1,76 @@
+from datetime import date
+
+import pytest
+
+from app import db
+from models import DuplicateCandidate, Evacuee, Family
+from services.dedup import (MATCH_THRESHOLD, DedupError, dismiss_candidate, flag_duplicates, merge_evacuees,
+                            scan_duplicates, score_pair)
+
+BORN = date(1987, 3, 14)
+
+
+def _record(given, surname, born=BORN, gender='female', evacuee_id=1):
+    return (evacuee_id, given, surname, born.toordinal() if born else None, gender)
+
+
+def test_score_pair():
+    original = _record('kristine', 'villanueva')
+    assert score_pair(original, _record('kristine', 'villanueva', evacuee_id=2)) == 1.0
+    assert score_pair(original, _record('christine', 'villanueva', evacuee_id=2)) >= MATCH_THRESHOLD
+    # Given and surname entered the wrong way round
+    assert score_pair(original, _record('villanueva', 'kristine', evacuee_id=2)) == 1.0
+    assert score_pair(original, _record('maria', 'santos', evacuee_id=2)) < MATCH_THRESHOLD
+    # A different gender rules the pair out; a different birth date lowers the score
+    assert score_pair(original, _record('kristine', 'villanueva', gender='male', evacuee_id=2)) is None
+    assert score_pair(original, _record('kristine', 'villanueva', born=date(1987, 3, 15))) == pytest.approx(0.9)
+    # Unknown details count against nobody
+    assert score_pair(original, _record('kristine', 'villanueva', born=None, gender=None)) == 1.0
+
+
+def _evacuee(given, surname, **fields):
+    fields = {'status': 'present', 'date_of_birth': BORN, 'gender': 'Female', **fields}
+    evacuee = Evacuee(first_name=given, last_name=surname, **fields)
+    db.session.add(evacuee)
+    db.session.commit()
+    return evacuee
+
+
+def test_flag_and_scan(app):
+    original = _evacuee('Kristine', 'Villanueva')
+    _evacuee('Maria', 'Santos')
+    misspelt = _evacuee('Christine', 'Villanueva')
+    swapped = _evacuee('Villanueva', 'Kristine')
+    assert flag_duplicates([misspelt.id]) == {misspelt.id: [original.id, swapped.id]}
+    assert DuplicateCandidate.query.count() == 2
+    # The scan finds the pair it had not been asked about, and queues nothing twice
+    assert scan_duplicates(workers=1) == (3, 1, 0)
+    assert scan_duplicates(workers=1) == (3, 0, 0)
+
+
+def test_merge_and_dismiss(app):
+    keep = _evacuee('Kristine', 'Villanueva', gender=None, special_needs='asthma')
+    drop = _evacuee('Christine', 'Villanueva', special_needs='Asthma')
+    family = Family(family_name='Villanueva', head_of_family_id=drop.id)
+    db.session.add(family)
+    db.session.commit()
+    flag_duplicates([drop.id])
+    candidate = DuplicateCandidate.query.one()
+    drop_id = drop.id
+
+    with pytest.raises(DedupError, match='Keep one'):
+        merge_evacuees(candidate.id, 999999)
+    merge_evacuees(candidate.id, keep.id)
+    assert db.session.get(Evacuee, drop_id) is None
+    assert (keep.gender, keep.special_needs) == ('Female', 'asthma')
+    assert db.session.get(Family, family.id).head_of_family_id == keep.id
+    with pytest.raises(DedupError, match='already been reviewed'):
+        merge_evacuees(candidate.id, keep.id)
+
+    other = _evacuee('Kristin', 'Villanueva')
+    flag_duplicates([other.id])
+    candidate = DuplicateCandidate.query.one()
+    assert dismiss_candidate(candidate.id).status == 'dismissed'
+    # A dismissed pair is not queued again
+    flag_duplicates([other.id])
+    assert DuplicateCandidate.query.count() == 1
@@ -0,0 +1,99 @@
+import pytest
+from sqlalchemy import func, select
+
+from app import db
+from models import Donation, InventoryItem, StockLevel, StockMovement
+from services.ledger import LedgerError, distribute, spoil, stock_on_hand, transfer, transfer_many
+
+
+def _ledger_matches_levels():
+    """The ledger of every center and item sums to its stock level."""
+    key = (StockMovement.evacuation_center_id, StockMovement.item, StockMovement.unit)
+    ledger = {tuple(row[:3]): row[3] for row in db.session.execute(
+        select(*key, func.sum(StockMovement.quantity)).group_by(*key)
+    )}
+    levels = {(level.evacuation_center_id, level.item, level.unit): level.quantity
+              for level in StockLevel.query if level.quantity}
+    return {key: total for key, total in ledger.items() if total} == levels
+
+
+def test_partial_distribution_keeps_the_line_open(sample_data):
+    item, center = sample_data.items[0], sample_data.centers[0]
+    assert distribute(item.id, 4) == 4
+    db.session.refresh(item)
+    assert (item.quantity, item.status) == (6, 'available')
+    assert stock_on_hand(center.id, 'Rice 0', 'kg') == 6
+    assert _ledger_matches_levels()
+
+
+def test_distributing_the_rest_closes_the_line_and_its_donation(sample_data):
+    item = sample_data.items[0]
+    distribute(item.id, 4)
+    assert distribute(item.id) == 6
+    db.session.refresh(item)
+    assert (item.quantity, item.status) == (6, 'distributed')  # the last quantity stays on the line
+    assert db.session.get(Donation, item.donation_id).status == 'distributed'
+    assert stock_on_hand(sample_data.centers[0].id, 'Rice 0', 'kg') == 0
+    assert _ledger_matches_levels()
+    with pytest.raises(LedgerError, match='distributed, not available'):
+        distribute(item.id, 1)
+
+
+def test_spoil(sample_data):
+    item = sample_data.items[1]
+    spoil(item.id, 3, note='wet')
+    assert stock_on_hand(sample_data.centers[0].id, 'Rice 1', 'kg') == 7
+    spoil(item.id)
+    db.session.refresh(item)
+    assert item.status == 'expired'
+    assert db.session.get(Donation, item.donation_id).status == 'received'
+    kinds = [movement.kind for movement in StockMovement.query.filter_by(inventory_item_id=item.id)]
+    assert kinds.count('spoil') == 2
+    assert _ledger_matches_levels()
+
+
+def test_quantity_is_checked(sample_data):
+    item = sample_data.items[0]
+    for quantity in (0, 11):
+        with pytest.raises(LedgerError, match='between 1 and 10'):
+            distribute(item.id, quantity)
+    with pytest.raises(LedgerError, match='not found'):
+        spoil(999999)
+
+
+def test_partial_transfer_splits_the_line(sample_data):
+    item, source, destination = sample_data.items[0], sample_data.centers[0], sample_data.centers[1]
+    moved_id = transfer(item.id, destination.id, 4)
+    assert moved_id != item.id
+    moved = db.session.get(InventoryItem, moved_id)
+    assert (moved.evacuation_center_id, moved.quantity, moved.description) == (destination.id, 4, 'Rice 0')
+    db.session.refresh(item)
+    assert (item.evacuation_center_id, item.quantity) == (source.id, 6)
+    assert stock_on_hand(source.id, 'Rice 0', 'kg') == 6
+    assert stock_on_hand(destination.id, 'Rice 0', 'kg') == 4
+    assert _ledger_matches_levels()
+
+
+def test_whole_transfer_moves_the_line(sample_data):
+    item, destination = sample_data.items[0], sample_data.centers[2]
+    assert transfer(item.id, destination.id) == item.id
+    db.session.refresh(item)
+    assert item.evacuation_center_id == destination.id
+    assert stock_on_hand(sample_data.centers[0].id, 'Rice 0', 'kg') == 0
+    assert stock_on_hand(destination.id, 'Rice 0', 'kg') == 10
+    with pytest.raises(LedgerError, match='already at this center'):
+        transfer(item.id, destination.id)
+
+
+def test_transfer_many_is_all_or_nothing(sample_data):
+    first, second = sample_data.items[:2]
+    destination = sample_data.centers[1]
+    with pytest.raises(LedgerError):
+        transfer_many([(first.id, destination.id, 5), (second.id, destination.id, 50)])
+    assert stock_on_hand(destination.id, 'Rice 0', 'kg') == 0
+    assert InventoryItem.query.count() == 3
+
+    assert transfer_many([(first.id, destination.id, 5), (second.id, destination.id, 10)]) == 2
+    assert stock_on_hand(destination.id, 'Rice 0', 'kg') == 5
+    assert stock_on_hand(destination.id, 'Rice 1', 'kg') == 10
+    assert _ledger_matches_levels()
@@ -0,0 +1,31 @@
+import pytest
+from flask import Response
+
+from app import db
+from models import Family
+from services import nplusone
+from services.nplusone import NPlusOneError, check_n_plus_one
+
+
+@pytest.fixture
+def families(sample_data):
+    """Families whose heads are not loaded with them unless a list asks for it."""
+    for index in range(3):
+        db.session.add(Family(family_name=f'Family {index}', head_of_family_id=sample_data.evacuees[index].id))
+    db.session.commit()
+    db.session.expunge_all()
+
+
+def test_no_page_lazy_loads_per_row(families):
+    checked, found = check_n_plus_one()
+    assert checked
+    assert found == []
+
+
+def test_lazy_loads_per_row_fail_the_request(app, families):
+    with app.test_request_context('/admin/families'):
+        nplusone._start_request()
+        names = [family.head_of_family.first_name for family in Family.query.all()]
+        assert len(names) == 4
+        with pytest.raises(NPlusOneError, match='Family.head_of_family lazy-loaded'):
+            nplusone._finish_request(Response())
@@ -0,0 +1,49 @@
+import pytest
+
+from permissions import PUBLIC, missing_policies
+
+HOME_PAGES = {'admin': '/admin/dashboard', 'volunteer': '/volunteer/dashboard', 'donor': '/donor/dashboard'}
+
+
+def test_every_endpoint_has_a_policy(app):
+    assert missing_policies(app) == []
+
+
+def test_blueprint_policies(app):
+    policies = app.extensions['permissions']
+    assert policies['auth.login'] is PUBLIC
+    assert policies['admin.dashboard'] == {'admin'}
+    assert policies['volunteer.evacuees'] == {'admin', 'volunteer'}
+    assert policies['lookup.centers'] == {'admin', 'volunteer'}
+    assert policies['donor.donations'] == {'admin', 'donor'}
+    assert policies['donor.dashboard'] == {'donor'}  # narrowed with allow_roles
+
+
+@pytest.mark.parametrize('role, url, allowed', [
+    ('admin', '/admin/users', True),
+    ('admin', '/volunteer/evacuees', True),
+    ('admin', '/donor/donations', True),
+    ('volunteer', '/volunteer/evacuees', True),
+    ('volunteer', '/lookup/centers', True),
+    ('volunteer', '/admin/users', False),
+    ('volunteer', '/donor/donations', False),
+    ('donor', '/donor/donations', True),
+    ('donor', '/volunteer/evacuees', False),
+    ('donor', '/lookup/centers', False),
+])
+def test_role_access(sample_data, client_for, role, url, allowed):
+    response = client_for(role).get(url)
+    if allowed:
+        assert response.status_code == 200
+    else:
+        assert response.status_code == 302
+        assert response.location.endswith(HOME_PAGES[role])
+
+
+def test_anonymous_users_are_sent_to_login(app):
+    client = app.test_client()
+    assert client.get('/auth/login').status_code == 200
+    response = client.get('/admin/dashboard')
+    assert response.status_code == 302
+    assert '/auth/login' in response.location
+
@@ -0,0 +1,80 @@
+import pytest
+from sqlalchemy import update
+
+from app import db
+from migrations import MIGRATIONS
+from models import Evacuee, given_name_phonetic, surname_phonetic
+from services.phonetic import KEY_LENGTH, normalize_name, phonetic_key
+from services.search import search
+
+
+@pytest.mark.parametrize('written, heard', [
+    ('Cristine', 'Kristine'),
+    ('Christine', 'Kristine'),
+    ('Juan', 'Huan'),
+    ('Jose', 'Hose'),
+    ('Jhon', 'Jon'),
+    ('Guillermo', 'Giyermo'),
+    ('Miguel', 'Migel'),
+    ('Villanueva', 'Bilyanueba'),
+    ('Chavez', 'Tsabes'),
+    ('Maria', 'Marya'),
+    ('Eduardo', 'Edwardo'),
+    ('Quezon', 'Kison'),
+    ('Jennifer', 'Jenifer'),
+    ('Ybanez', 'Ibanez'),
+])
+def test_spellings_by_ear_share_a_key(written, heard):
+    assert phonetic_key(written) == phonetic_key(heard)
+
+
+def test_keys():
+    assert phonetic_key('Cristine') == 'KRSTN'
+    assert phonetic_key('Juan') == 'HWN'
+    assert phonetic_key('Guillermo') == 'KYRM'
+    assert phonetic_key('Villanueva') == 'BYNWB'
+    assert phonetic_key('Carmell') == phonetic_key('Carmel') == 'KRML'
+    assert phonetic_key('Santos') != phonetic_key('Santiago')
+    assert len(phonetic_key('Constantinopolitana Villafranca')) == KEY_LENGTH
+    assert phonetic_key('') == phonetic_key('123') == ''
+
+
+def test_normalize_name():
+    assert normalize_name("  Peñafiel-O'Brien ") == 'penafiel o brien'
+    assert normalize_name(None) == ''
+
+
+def test_given_name_and_surname_keys():
+    assert given_name_phonetic('Maria Luisa') == given_name_phonetic('Marya') == 'MRY'
+    assert surname_phonetic('Dela Cruz') == surname_phonetic('de la Kruz') == surname_phonetic('Delacruz')
+    assert surname_phonetic('De Jesus') == surname_phonetic('Dejesus')
+
+
+def test_search_finds_names_that_sound_alike(app):
+    db.session.add_all([
+        Evacuee(first_name='Juan', last_name='Dela Cruz', status='present'),
+        Evacuee(first_name='Guillermo', last_name='Villanueva', status='present'),
+        Evacuee(first_name='Maria', last_name='Santos', status='present'),
+    ])
+    db.session.commit()
+
+    def found(term):
+        return [f'{evacuee.first_name} {evacuee.last_name}' for evacuee in search(Evacuee, term)]
+    assert found('huan dela krus') == ['Juan Dela Cruz']
+    assert found('giyermo bilyanueba') == ['Guillermo Villanueva']
+    assert found('bilyanueba') == ['Guillermo Villanueva']
+
+
+def test_stale_keys_are_recomputed(app):
+    evacuee = Evacuee(first_name='Juan', last_name='Villanueva', status='present')
+    db.session.add(evacuee)
+    db.session.commit()
+    # Keys as the earlier rules made them
+    db.session.execute(update(Evacuee).where(Evacuee.id == evacuee.id)
+                       .values(first_name_phonetic='JWN', last_name_phonetic='BLNWB'))
+    db.session.commit()
+    recompute = {version: function for version, name, function in MIGRATIONS}[7]
+    with db.engine.begin() as connection:
+        recompute(connection)
+    db.session.refresh(evacuee)
+    assert (evacuee.first_name_phonetic, evacuee.last_name_phonetic) == ('HWN', 'BYNWB')
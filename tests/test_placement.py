@@ -0,0 +1,85 @@
+from app import db
+from models import EvacuationCenter, Evacuee, Family
+from services.placement import CenterRoom, PlacementGroup, place_evacuees, plan_placement
+
+
+def _group(key, size, special_needs=False, preferred=None):
+    return PlacementGroup(key, list(range(size)), special_needs, preferred)
+
+
+def test_groups_go_whole_into_the_tightest_fit():
+    centers = [CenterRoom(1, 10, False), CenterRoom(2, 4, False), CenterRoom(3, 6, False)]
+    report = plan_placement([_group('a', 5), _group('b', 4), _group('c', 3)], centers)
+    # Largest first: 5 into the 6, 4 into the 4, 3 into the 10
+    assert report.placed == {'a': 3, 'b': 2, 'c': 1}
+    assert (report.evacuees, report.centers, report.unplaced) == (12, 3, [])
+
+
+def test_groups_that_fit_nowhere_are_reported():
+    report = plan_placement([_group('a', 7), _group('b', 3)], [CenterRoom(1, 6, False), CenterRoom(2, 0, False)])
+    assert report.placed == {'b': 1}
+    assert report.unplaced == ['a']
+    assert report.as_dict() == {'groups': 1, 'evacuees': 3, 'centers': 1, 'unplaced': [['a']]}
+
+
+def test_special_needs_only_go_to_centers_that_accept_them():
+    centers = [CenterRoom(1, 10, False), CenterRoom(2, 3, True)]
+    report = plan_placement([_group('a', 2, special_needs=True), _group('b', 2, special_needs=True)], centers)
+    assert list(report.placed.values()) == [2]
+    assert len(report.unplaced) == 1
+
+
+def test_other_groups_keep_room_in_special_needs_centers():
+    centers = [CenterRoom(1, 4, True), CenterRoom(2, 4, False)]
+    report = plan_placement([_group('a', 3), _group('b', 3, special_needs=True)], centers)
+    assert report.placed == {'a': 2, 'b': 1}
+    # Only when the other centers are full do they use it
+    report = plan_placement([_group('a', 3)], [CenterRoom(1, 4, True), CenterRoom(2, 2, False)])
+    assert report.placed == {'a': 1}
+
+
+def test_family_joins_the_center_holding_its_members():
+    centers = [CenterRoom(1, 3, False), CenterRoom(2, 20, False)]
+    assert plan_placement([_group('a', 3, preferred=2)], centers).placed == {'a': 2}
+    # Unless that center has no room left for it
+    assert plan_placement([_group('a', 3, preferred=2)], [CenterRoom(1, 3, False), CenterRoom(2, 2, False)]).placed \
+        == {'a': 1}
+
+
+def test_special_needs_family_skips_a_preferred_center_that_does_not_accept_them():
+    centers = [CenterRoom(1, 20, False), CenterRoom(2, 5, True)]
+    report = plan_placement([_group('a', 3, special_needs=True, preferred=1)], centers)
+    assert report.placed == {'a': 2}
+    # With no accepting center with room, it is left unplaced rather than sent there
+    report = plan_placement([_group('a', 3, special_needs=True, preferred=1)], [CenterRoom(1, 20, False)])
+    assert report.unplaced == ['a']
+
+
+def test_place_evacuees(sample_data):
+    general, accepting = sample_data.centers[:2]
+    general.accepts_special_needs = False
+    accepting.accepts_special_needs = True
+    family = Family(family_name='Santos', address='Poblacion')
+    db.session.add(family)
+    db.session.flush()
+    db.session.add_all([
+        Evacuee(first_name='Ana', last_name='Santos', status='present', family_id=family.id,
+                evacuation_center_id=general.id),
+        Evacuee(first_name='Ben', last_name='Santos', status='present', family_id=family.id,
+                special_needs='wheelchair'),
+        Evacuee(first_name='Carla', last_name='Reyes', status='present'),
+        Evacuee(first_name='Dan', last_name='Reyes', status='missing'),
+    ])
+    db.session.commit()
+
+    report = place_evacuees()
+    assert report.placed[('family', family.id)] == accepting.id
+    assert report.evacuees == 2
+    assert Evacuee.query.filter_by(first_name='Ben').one().evacuation_center_id == accepting.id
+    assert Evacuee.query.filter_by(first_name='Dan').one().evacuation_center_id is None
+    counts = {center.id: center.occupancy_count for center in EvacuationCenter.query}
+    actual = {center.id: Evacuee.query.filter_by(evacuation_center_id=center.id).count()
+              for center in EvacuationCenter.query}
+    assert counts == actual
+    # Nobody is left to place
+    assert place_evacuees().placed == {}
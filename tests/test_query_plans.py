@@ -0,0 +1,15 @@
+from migrations import MIGRATIONS, migration_status
+from services.benchmark import _fill_evacuees
+from services.query_plans import check_query_plans
+
+
+def test_new_database_is_stamped_up_to_date(app):
+    assert [applied for version, name, applied in migration_status()] == [True] * len(MIGRATIONS)
+
+
+def test_pages_do_not_scan_large_tables(sample_data):
+    # Enough rows that SQLite prefers an index wherever one fits
+    _fill_evacuees(3000, sample_data.centers[0].id)
+    checked, problems = check_query_plans()
+    assert checked
+    assert [(endpoint, tables) for endpoint, url, tables, statement, plan in problems] == []
@@ -0,0 +1,29 @@
+from services.route_benchmark import MIN_LATENCY_DELTA_MS, benchmark_routes, regressions
+
+
+def _result(**figures):
+    result = dict(rows=1000, role='admin', endpoint='admin.evacuees', url='/admin/evacuees', status=200,
+                  p50_ms=20.0, p95_ms=30.0, queries=4, peak_kb=500.0, bytes=20000)
+    result.update(figures)
+    return result
+
+
+def test_every_page_is_measured(app):
+    results = list(benchmark_routes(scales=(200,), repeat=2))
+    measured = {(result['role'], result['endpoint']) for result in results}
+    assert ('admin', 'admin.evacuees') in measured
+    assert ('volunteer', 'volunteer.evacuees') in measured
+    assert ('donor', 'donor.donations') in measured
+    assert all(result['status'] < 500 for result in results)
+    assert all(result['rows'] == 200 for result in results)
+    # Measured again unchanged, nothing regresses
+    assert regressions(results, results) == []
+
+
+def test_regressions():
+    baseline = [_result()]
+    assert regressions([_result(p95_ms=36.0)], baseline) == []  # within the threshold
+    assert regressions([_result(p95_ms=38.0 + MIN_LATENCY_DELTA_MS)], baseline)[0][2] == ['p95 30.0 -> 48.0 ms']
+    assert regressions([_result(queries=5)], baseline)[0][2] == ['queries 4 -> 5']
+    assert regressions([_result(bytes=30000)], baseline)[0][2] == ['bytes 20000 -> 30000']
+    assert regressions([_result(endpoint='admin.users', queries=50)], baseline) == []  # no baseline to compare